@@ -1,12 +1,19 @@
 from flask import Blueprint, jsonify, request, send_file
 import logging
-import time
 import os
 from datetime import datetime
 
 from api.utils.generate_analysis import analyze_video, process_analysis_result
 from api.utils.twelvelabs_api import list_videos, get_video_info
-from api.utils.csv_utils import save_analysis_result, save_detailed_analysis_result, generate_structured_csv_report
+from api.utils.csv_utils import (
+    save_analysis_result, save_detailed_analysis_result,
+    structured_report_writer, write_structured_csv_reports
+)
+from api.utils.report_registry import get_latest_report, list_reports
+from api.utils.streaming import get_stream_mode, stream_events, SUMMARY_INTERVAL
+from api.utils.batch_analysis import (
+    analyze_and_record, start_batch_analysis_job, stop_batch_analysis_job, get_batch_analysis_status
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +25,17 @@ def api_analyze_video(video_id):
     data = request.get_json() or {}
     prompt = data.get('prompt')
     use_lambda = data.get('use_lambda', True)
+    force = data.get('force', False)
     
     video_info = get_video_info(video_id)
     filename = video_info.get("user_metadata", {}).get("filename", "Unknown") if video_info else "Unknown"
     
     try:
         logger.info(f"Analyzing video {video_id} ({filename})")
-        result = analyze_video(video_id, prompt, use_lambda)
+        result = analyze_video(video_id, prompt, use_lambda, force)
         
         # Process the result and update metadata
-        success, processed_result = process_analysis_result(video_id, result)
+        success, processed_result = process_analysis_result(video_id, result, video_info=video_info)
         
         if success:
             status = "success"
@@ -69,6 +77,7 @@ def api_batch_analyze():
     prompt = data.get('prompt')
     use_lambda = data.get('use_lambda', True)
     limit = data.get('limit')
+    force = data.get('force', False)
     
     if not video_ids:
         # If no video IDs provided, fetch videos from the index
@@ -82,116 +91,187 @@ def api_batch_analyze():
     if limit and isinstance(limit, int) and limit > 0:
         video_ids = video_ids[:limit]
     
+    stream_mode = get_stream_mode(request, data)
+    if stream_mode:
+        return stream_events(_stream_batch_analyze(video_ids, prompt, use_lambda, force), stream_mode)
+    
     results = []
-    successful_results = []
+    successful_count = 0
     
     # Process each video
     for video_id in video_ids:
-        try:
-            video_info = get_video_info(video_id)
-            
-            # Analyze the video
-            result = analyze_video(video_id, prompt, use_lambda)
-            
-            # Process the result and update metadata
-            success, processed_result = process_analysis_result(video_id, result)
-            
-            # Save results to CSV
-            filename = video_info.get("user_metadata", {}).get("filename", "Unknown") if video_info else "Unknown"
-            
-            if success:
-                status = "success"
-                save_analysis_result(video_id, filename, status)
-                save_detailed_analysis_result(video_id, filename, status, result.get('structured_data'))
-            else:
-                status = "failure"
-                save_analysis_result(video_id, filename, status, processed_result)
-                save_detailed_analysis_result(video_id, filename, status, None, processed_result)
-            
-            current_result = {
-                "video_id": video_id,
-                "video_info": video_info,
-                "success": success,
-                "analysis": result,
-                "timestamp": int(time.time()),
-                "metadata_update": "Success" if success else processed_result
-            }
-            
-            results.append(current_result)
-            
-            if success:
-                successful_results.append(current_result)
-            
-        except Exception as e:
-            logger.error(f"Error analyzing video {video_id}: {str(e)}")
-            
-            # Get video info if not already fetched
-            if 'video_info' not in locals() or video_info is None:
-                try:
-                    video_info = get_video_info(video_id)
-                except:
-                    video_info = {"_id": video_id}
-            
-            # Save error to CSV
-            filename = video_info.get("user_metadata", {}).get("filename", "Unknown") if video_info else "Unknown"
-            save_analysis_result(video_id, filename, "error", str(e))
-            
-            results.append({
-                "video_id": video_id,
-                "video_info": video_info,
-                "success": False,
-                "timestamp": int(time.time()),
-                "error": f"Error analyzing video: {str(e)}"
-            })
+        current_result = analyze_and_record(video_id, prompt, use_lambda, force)
+        results.append(current_result)
+        
+        if current_result["success"]:
+            successful_count += 1
     
     # Generate CSV reports for the tracking
-    if successful_results:
-        try:
-            successful_csv = generate_structured_csv_report(successful_results)
-            
-            timestamp = int(time.time())
-            with open(f"successful_analyses_{timestamp}.csv", "w") as f:
-                f.write(successful_csv.getvalue())
-        except Exception as e:
-            logger.error(f"Error generating CSV for successful analyses: {str(e)}")
-    
     try:
-        all_csv = generate_structured_csv_report(results)
-
-        timestamp = int(time.time())
-        with open(f"all_analyses_{timestamp}.csv", "w") as f:
-            f.write(all_csv.getvalue())
+        write_structured_csv_reports(results)
     except Exception as e:
-        logger.error(f"Error generating complete CSV report: {str(e)}")
+        logger.error(f"Error generating CSV reports: {str(e)}")
     
     return jsonify({
         "success": True,
         "total": len(video_ids),
         "processed": len(results),
-        "successful": len(successful_results),
+        "successful": successful_count,
         "results": results
     })
 
+# Per-video event without the full video info and raw analysis text
+def _compact_result(result):
+
+    video_info = result.get("video_info") or {}
+    analysis = result.get("analysis") or {}
+    
+    event = {
+        "video_id": result["video_id"],
+        "filename": video_info.get("user_metadata", {}).get("filename", "Unknown"),
+        "success": result["success"],
+        "cached": analysis.get("cached", False),
+        "structured_data": analysis.get("structured_data"),
+        "timestamp": result["timestamp"]
+    }
+    
+    if "error" in result:
+        event["error"] = result["error"]
+    elif not result["success"]:
+        event["error"] = result.get("metadata_update")
+    
+    return event
+
+# Analyze videos one at a time, writing report rows and emitting events as
+# each finishes, so nothing accumulates in memory for the whole batch
+def _stream_batch_analyze(video_ids, prompt, use_lambda, force):
+
+    summary = {"total": len(video_ids), "processed": 0, "successful": 0, "failed": 0}
+    
+    yield "start", {"total": len(video_ids)}
+    
+    with structured_report_writer() as write_report_row:
+        for video_id in video_ids:
+            result = analyze_and_record(video_id, prompt, use_lambda, force)
+            write_report_row(result)
+            
+            summary["processed"] += 1
+            summary["successful" if result["success"] else "failed"] += 1
+            
+            yield "video", _compact_result(result)
+            
+            if summary["processed"] % SUMMARY_INTERVAL == 0:
+                yield "summary", dict(summary)
+    
+    yield "done", {"success": True, **summary}
+
+# Resumable batch analysis over the whole index, run in the background
+@analysis_bp.route('/batch-analyze/job', methods=['POST'])
+def api_start_batch_analysis_job():
+
+    data = request.get_json() or {}
+    
+    try:
+        page_size = min(50, int(data.get('page_size', 50)))
+        delay_seconds = float(data.get('delay_seconds', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "page_size and delay_seconds must be numbers"}), 400
+    if page_size < 1 or delay_seconds < 0:
+        return jsonify({"error": "page_size must be at least 1 and delay_seconds not negative"}), 400
+    
+    started = start_batch_analysis_job(
+        prompt=data.get('prompt'),
+        use_lambda=data.get('use_lambda', True),
+        force=data.get('force', False),
+        page_size=page_size,
+        prioritize_unanalyzed=data.get('prioritize_unanalyzed', True),
+        skip_analyzed=data.get('skip_analyzed', True),
+        delay_seconds=delay_seconds,
+        resume=data.get('resume', True)
+    )
+    
+    if not started:
+        return jsonify({"error": "A batch analysis job is already running"}), 409
+    
+    return jsonify({"success": True, "message": "Batch analysis job started"}), 202
+
+@analysis_bp.route('/batch-analyze/job', methods=['GET'])
+def api_batch_analysis_job_status():
+
+    return jsonify(get_batch_analysis_status())
+
+@analysis_bp.route('/batch-analyze/job', methods=['DELETE'])
+def api_stop_batch_analysis_job():
+
+    if not stop_batch_analysis_job():
+        return jsonify({"error": "No batch analysis job is running"}), 404
+    
+    return jsonify({"success": True, "message": "Batch analysis job stopping after the current video"})
+
 @analysis_bp.route('/download/report', methods=['GET'])
 def download_latest_report():
 
     report_type = request.args.get('type', 'all')
-
-    if report_type == 'successful':
-        prefix = 'successful_analyses_'
-    else:
-        prefix = 'all_analyses_'
+    if report_type != 'successful':
+        report_type = 'all'
     
-    report_files = [f for f in os.listdir('.') if f.startswith(prefix) and f.endswith('.csv')]
+    entry, path = get_latest_report(report_type)
     
-    if not report_files:
+    if not entry:
         return jsonify({"error": "No report files found"}), 404
     
-    latest_report = sorted(report_files, reverse=True)[0]
+    # Range and conditional (ETag / If-Modified-Since) requests are handled by send_file
+    response = send_file(
+        os.path.abspath(path),
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name=entry["filename"],
+        conditional=True,
+        etag=True
+    )
+    # "latest" moves when a new report is written, so clients must revalidate
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Report-Rows'] = str(entry["rows"])
+    return response
 
+# Analysis results or embedding status as Parquet / Arrow IPC, exported incrementally
+@analysis_bp.route('/export/<dataset>', methods=['GET'])
+def api_export_dataset(dataset):
+    from api.utils.columnar_export import is_export_available, build_export_file, DATASETS, FORMATS
+    
+    export_format = request.args.get('format', 'parquet')
+    since = request.args.get('since')
+    
+    if not is_export_available():
+        return jsonify({"error": "Columnar export requires pyarrow"}), 501
+    if dataset not in DATASETS:
+        return jsonify({"error": f"Unknown dataset, expected one of: {', '.join(DATASETS)}"}), 404
+    if export_format not in FORMATS:
+        return jsonify({"error": f"Unknown format, expected one of: {', '.join(FORMATS)}"}), 400
+    
+    try:
+        path = build_export_file(dataset, export_format, since)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting {dataset}: {str(e)}")
+        return jsonify({"error": f"Error exporting {dataset}: {str(e)}"}), 500
+    
+    if not path:
+        return jsonify({"error": "No rows to export"}), 404
+    
     return send_file(
-        latest_report,
-        mimetype='text/csv',
+        os.path.abspath(path),
+        mimetype=FORMATS[export_format]["mimetype"],
         as_attachment=True,
-        download_name=latest_report
-    )
\ No newline at end of file
+        download_name=os.path.basename(path),
+        conditional=True
+    )
+
+@analysis_bp.route('/reports', methods=['GET'])
+def api_list_reports():
+
+    return jsonify({
+        "success": True,
+        "reports": list_reports(request.args.get('type'))
+    })
\ No newline at end of file
@@ -0,0 +1,91 @@
+from flask import Blueprint, jsonify, request
+import logging
+
+from api.utils.catalog_index import (
+    search_catalog,
+    get_catalog_stats,
+    get_facet_counts,
+    start_catalog_backfill,
+    FACETS
+)
+
+logger = logging.getLogger(__name__)
+
+catalog_bp = Blueprint('catalog', __name__)
+
+
+def _get_facet_filters():
+
+    # "time" is accepted as a shorter alias for time_of_day
+    filters = {facet: request.args.get(facet) for facet in FACETS}
+    if not filters.get('time_of_day') and request.args.get('time'):
+        filters['time_of_day'] = request.args.get('time')
+    return filters
+
+
+# Keyword and facet search over the local index of Pegasus analysis fields
+@catalog_bp.route('/catalog/search', methods=['GET'])
+def api_catalog_search():
+
+    query = request.args.get('q', '').strip()
+    limit = min(100, request.args.get('limit', 20, type=int))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    filters = _get_facet_filters()
+    
+    try:
+        result = search_catalog(query, filters, limit, offset)
+        return jsonify({
+            "success": True,
+            "query": query,
+            "filters": {k: v for k, v in filters.items() if v},
+            "total": result["total"],
+            "results": result["results"]
+        })
+    except Exception as e:
+        logger.error(f"Error searching catalog: {str(e)}")
+        return jsonify({"error": f"Failed to search catalog: {str(e)}"}), 500
+
+
+# Value counts for the analysis facets. Any facet given as a query parameter
+# is treated as a current selection and the counts are computed for it.
+@catalog_bp.route('/facets', methods=['GET'])
+def api_facets():
+
+    filters = _get_facet_filters()
+    requested = request.args.get('facets')
+    facets = [f.strip() for f in requested.split(',')] if requested else None
+    limit = request.args.get('limit', type=int)
+    
+    unknown = [f for f in facets or [] if f not in FACETS]
+    if unknown:
+        return jsonify({"error": f"Unknown facets: {', '.join(unknown)}", "facets": list(FACETS)}), 400
+    
+    try:
+        result = get_facet_counts(filters, facets, limit)
+        return jsonify({
+            "success": True,
+            "filters": {k: v for k, v in filters.items() if v},
+            "total": result["total"],
+            "facets": result["facets"]
+        })
+    except Exception as e:
+        logger.error(f"Error computing facet counts: {str(e)}")
+        return jsonify({"error": f"Failed to compute facet counts: {str(e)}"}), 500
+
+
+@catalog_bp.route('/catalog/stats', methods=['GET'])
+def api_catalog_stats():
+
+    return jsonify(get_catalog_stats())
+
+
+# Rebuild the catalog from the metadata of every video in the index (runs in the background)
+@catalog_bp.route('/catalog/backfill', methods=['POST'])
+def api_catalog_backfill():
+
+    data = request.get_json(silent=True) or {}
+    
+    if not start_catalog_backfill(min(50, data.get('page_size', 50))):
+        return jsonify({"error": "A catalog backfill is already running"}), 409
+    
+    return jsonify({"success": True, "message": "Catalog backfill started"}), 202
@@ -1,10 +1,12 @@
 from flask import Blueprint, jsonify, request, send_file
 import logging
+import os
 import time
 
 from api.utils.twelvelabs_api import list_videos, get_video_embedding
 from api.utils.weaviate_api import store_video_embedding
 from api.utils.csv_utils import track_embedding_status, get_embedding_status
+from api.utils.streaming import get_stream_mode, stream_events, SUMMARY_INTERVAL
 from config.settings import EMBEDDING_STATUS_FILE
 
 logger = logging.getLogger(__name__)
@@ -54,7 +56,6 @@ def api_batch_embed_videos():
             except Exception as e:
                 logger.error(f"Error checking existing embeddings: {str(e)}")
         
-        all_results = []
         summary_report = {
             "total": 0,
             "skipped": 0,
@@ -63,104 +64,14 @@ def api_batch_embed_videos():
             "failed": 0,
         }
         
-        for current_page in range(1, total_pages + 1):
-            logger.info(f"Processing page {current_page} of {total_pages}")
-            
-            if current_page == 1:
-                videos_response = initial_response
-            else:
-                if current_page > 1 and delay_between_pages > 0:
-                    time.sleep(delay_between_pages)
-                
-                videos_response = list_videos(page=current_page, page_limit=page_size)
-            
-            if not videos_response or 'data' not in videos_response:
-                logger.error(f"Failed to retrieve videos for page {current_page}")
-                continue
-            
-            video_ids = [video['_id'] for video in videos_response['data']]
-            page_results = []
-            
-            # Process each video in the page
-            for video_id in video_ids:
-                summary_report["total"] += 1
-                
-                if video_id in already_embedded:
-                    logger.info(f"Skipping video {video_id} - already embedded")
-                    track_embedding_status(video_id, "skipped", None, "Already embedded")
-                    page_results.append({
-                        "video_id": video_id,
-                        "status": "skipped",
-                        "reason": "Already embedded"
-                    })
-                    summary_report["skipped"] += 1
-                    continue
-                    
-                try:
-                    # Get embeddings for the video
-                    embedding_data = get_video_embedding(video_id)
-                    
-                    if embedding_data.get("status") == "ready":
-                        # Store embeddings in Weaviate
-                        success = store_video_embedding(video_id, embedding_data)
-                        
-                        status = "stored" if success else "failed"
-                        track_embedding_status(
-                            video_id, 
-                            status, 
-                            video_id, 
-                            None if success else "Failed to store in Weaviate"
-                        )
-                        
-                        page_results.append({
-                            "video_id": video_id,
-                            "status": status
-                        })
-                        
-                        if success:
-                            summary_report["stored"] += 1
-                        else:
-                            summary_report["failed"] += 1
-                            
-                    else:
-                        # Track status for videos not ready
-                        track_embedding_status(
-                            video_id, 
-                            embedding_data.get("status", "unknown"), 
-                            None, 
-                            embedding_data.get("error")
-                        )
-                        
-                        page_results.append({
-                            "video_id": video_id,
-                            "status": embedding_data.get("status", "unknown"),
-                            "error": embedding_data.get("error")
-                        })
-                        
-                        if embedding_data.get("status") == "processing":
-                            summary_report["processing"] += 1
-                        else:
-                            summary_report["failed"] += 1
-                            
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.error(f"Error processing video {video_id}: {error_msg}")
-                    track_embedding_status(video_id, "error", None, error_msg)
-                    page_results.append({
-                        "video_id": video_id,
-                        "status": "error",
-                        "error": error_msg
-                    })
-                    summary_report["failed"] += 1
-            
-            all_results.extend(page_results)
-            
-            logger.info(f"Completed page {current_page}/{total_pages}: " +
-                       f"Processed {len(page_results)} videos, " +
-                       f"Total progress: {summary_report['stored']} stored, " +
-                       f"{summary_report['skipped']} skipped, " +
-                       f"{summary_report['processing']} processing, " +
-                       f"{summary_report['failed']} failed")
+        events = _iter_batch_embed(initial_response, total_pages, page_size, delay_between_pages,
+                                   already_embedded, summary_report)
+        
+        stream_mode = get_stream_mode(request, data)
+        if stream_mode:
+            return stream_events(_stream_batch_embed(events, summary_report, total_pages), stream_mode)
+        
+        all_results = [payload for event, payload in events if event == "video"]
         
         return jsonify({
             "success": True,
@@ -176,6 +87,129 @@ def api_batch_embed_videos():
         return jsonify({"error": f"Batch embedding failed: {str(e)}"}), 500
 
 
+# Embed every video page by page, yielding one event per video and one per page
+def _iter_batch_embed(initial_response, total_pages, page_size, delay_between_pages, already_embedded, summary_report):
+
+    for current_page in range(1, total_pages + 1):
+        logger.info(f"Processing page {current_page} of {total_pages}")
+        
+        if current_page == 1:
+            videos_response = initial_response
+        else:
+            if current_page > 1 and delay_between_pages > 0:
+                time.sleep(delay_between_pages)
+            
+            videos_response = list_videos(page=current_page, page_limit=page_size)
+        
+        if not videos_response or 'data' not in videos_response:
+            logger.error(f"Failed to retrieve videos for page {current_page}")
+            continue
+        
+        video_ids = [video['_id'] for video in videos_response['data']]
+        page_processed = 0
+        
+        # Process each video in the page
+        for video_id in video_ids:
+            summary_report["total"] += 1
+            page_processed += 1
+            
+            if video_id in already_embedded:
+                logger.info(f"Skipping video {video_id} - already embedded")
+                track_embedding_status(video_id, "skipped", None, "Already embedded")
+                summary_report["skipped"] += 1
+                yield "video", {
+                    "video_id": video_id,
+                    "status": "skipped",
+                    "reason": "Already embedded"
+                }
+                continue
+                
+            try:
+                # Get embeddings for the video
+                embedding_data = get_video_embedding(video_id)
+                
+                if embedding_data.get("status") == "ready":
+                    # Store embeddings in Weaviate
+                    success = store_video_embedding(video_id, embedding_data)
+                    
+                    status = "stored" if success else "failed"
+                    track_embedding_status(
+                        video_id, 
+                        status, 
+                        video_id, 
+                        None if success else "Failed to store in Weaviate"
+                    )
+                    
+                    page_result = {
+                        "video_id": video_id,
+                        "status": status
+                    }
+                    
+                    if success:
+                        summary_report["stored"] += 1
+                    else:
+                        summary_report["failed"] += 1
+                        
+                else:
+                    # Track status for videos not ready
+                    track_embedding_status(
+                        video_id, 
+                        embedding_data.get("status", "unknown"), 
+                        None, 
+                        embedding_data.get("error")
+                    )
+                    
+                    page_result = {
+                        "video_id": video_id,
+                        "status": embedding_data.get("status", "unknown"),
+                        "error": embedding_data.get("error")
+                    }
+                    
+                    if embedding_data.get("status") == "processing":
+                        summary_report["processing"] += 1
+                    else:
+                        summary_report["failed"] += 1
+                        
+            except Exception as e:
+                error_msg = str(e)
+                logger.error(f"Error processing video {video_id}: {error_msg}")
+                track_embedding_status(video_id, "error", None, error_msg)
+                page_result = {
+                    "video_id": video_id,
+                    "status": "error",
+                    "error": error_msg
+                }
+                summary_report["failed"] += 1
+            
+            yield "video", page_result
+        
+        logger.info(f"Completed page {current_page}/{total_pages}: " +
+                   f"Processed {page_processed} videos, " +
+                   f"Total progress: {summary_report['stored']} stored, " +
+                   f"{summary_report['skipped']} skipped, " +
+                   f"{summary_report['processing']} processing, " +
+                   f"{summary_report['failed']} failed")
+        
+        yield "page", {"page": current_page, "total_pages": total_pages, **summary_report}
+
+
+def _stream_batch_embed(events, summary_report, total_pages):
+
+    yield "start", {"total_pages": total_pages}
+    
+    processed = 0
+    for event, payload in events:
+        if event == "video":
+            processed += 1
+            yield event, payload
+            if processed % SUMMARY_INTERVAL == 0:
+                yield "summary", dict(summary_report)
+        else:
+            yield "summary", payload
+    
+    yield "done", {"success": True, "summary": summary_report, "pages_processed": total_pages}
+
+
 # Status of embedding operations
 @embedding_bp.route('/embedding-status', methods=['GET'])
 def api_embedding_status():
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+
+from api.utils.startup_status import get_startup_status
+
+health_bp = Blueprint('health', __name__)
+
+
+# Liveness: the process is up and serving, whatever state the dependencies are in
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+
+    status = get_startup_status()
+    return jsonify({"status": "live", **status})
+
+
+# Readiness: 503 until the background startup (Weaviate connect, schema check) has succeeded
+@health_bp.route('/healthz/ready', methods=['GET'])
+def healthz_ready():
+
+    status = get_startup_status()
+    return jsonify({"status": "ready" if status["ready"] else "not_ready", **status}), 200 if status["ready"] else 503
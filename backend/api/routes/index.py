@@ -1,46 +1,40 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
+import time
+
+from config.settings import API_CACHE_TTL_INDEX
 
 index_bp = Blueprint('index', __name__)
 
 @index_bp.route('/index', methods=['GET'])
 def api_get_index_info():
     from api.utils.twelvelabs_api import get_index_info
+    from api.utils.http_cache import get_cached_response, cache_response, conditional_json
     
-    index_info = get_index_info()
+    index_info = get_cached_response("index")
+    if index_info is None:
+        index_info = get_index_info()
+        if index_info:
+            cache_response("index", index_info, API_CACHE_TTL_INDEX)
     if index_info:
-        return jsonify(index_info)
+        return conditional_json(index_info, API_CACHE_TTL_INDEX)
     return jsonify({"error": "Failed to retrieve index information"}), 500
 
+# Dependency status from the background health monitor; ?fresh=1 probes now
 @index_bp.route('/test', methods=['GET'])
 def test_connection():
-    from api.utils.s3_utils import test_s3_connection
-    from api.utils.weaviate_api import get_weaviate_client
-    from api.utils.twelvelabs_api import get_index_info
-    
-    # Test S3 connection
-    s3_status = test_s3_connection()
+    from api.utils.health_monitor import probe_dependencies, get_last_health
     
-    # Test Weaviate connection
-    weaviate_client = get_weaviate_client()
-    weaviate_status = weaviate_client is not None and weaviate_client.is_ready()
+    fresh = request.args.get('fresh', '').lower() in ('1', 'true')
     
-    # Test TwelveLabs
-    twelvelabs_status = get_index_info() is not None
+    health = None if fresh else get_last_health()
+    source = "monitor"
+    if health is None:
+        # Probed on demand, concurrently and with the probe timeout
+        health = probe_dependencies()
+        source = "probe"
     
     return jsonify({
-        "connections": {
-            "twelvelabs_api": {
-                "status": "connected" if twelvelabs_status else "disconnected",
-                "message": "Successfully connected to TwelveLabs API" if twelvelabs_status else "Failed to connect to TwelveLabs API"
-            },
-            "s3": {
-                "status": "connected" if s3_status else "disconnected",
-                "message": "Successfully connected to S3" if s3_status else "Failed to connect to S3"
-            },
-            "weaviate": {
-                "status": "connected" if weaviate_status else "disconnected",
-                "message": "Successfully connected to Weaviate" if weaviate_status else "Failed to connect to Weaviate"
-            }
-        },
-        "all_services_available": all([twelvelabs_status, s3_status, weaviate_status])
-    })
\ No newline at end of file
+        **health,
+        "age_seconds": round(max(0.0, time.time() - health["checked_at"]), 1),
+        "source": source
+    })
@@ -0,0 +1,13 @@
+from flask import Blueprint, Response
+
+from api.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+# Prometheus scrape endpoint: upstream latency, errors and bytes per operation,
+# cache hit ratios and per-route request timing, summed over all worker processes
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,13 +1,97 @@
 from flask import Blueprint, jsonify, request
 import logging
+import base64
+import json
+import time
 
-from api.utils.twelvelabs_api import search_videos, search_by_page_token, get_video_info
+from api.utils.twelvelabs_api import search_videos, search_by_page_token, get_video_infos
 from api.utils.s3_utils import get_video_path
+from api.utils.suggest_index import suggest, record_query, is_built
+from config.settings import SEARCH_ENGINE
 
 logger = logging.getLogger(__name__)
 
 search_bp = Blueprint('search', __name__)
 
+SEARCH_ENGINES = ("twelvelabs", "local")
+LOCAL_PAGE_TOKEN_PREFIX = "local:"
+
+
+def _encode_local_page_token(query_text, offset, page_limit):
+
+    payload = json.dumps({"q": query_text, "offset": offset, "limit": page_limit})
+    return LOCAL_PAGE_TOKEN_PREFIX + base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_local_page_token(page_token):
+
+    payload = base64.urlsafe_b64decode(page_token[len(LOCAL_PAGE_TOKEN_PREFIX):].encode("ascii"))
+    return json.loads(payload)
+
+
+# Text search without the TwelveLabs search API: the query is embedded once
+# (cached per normalized query) and matched against the visual-text vectors
+# in Weaviate. Results have the same shape as the TwelveLabs engine, with the
+# filename and thumbnail taken from the same TwelveLabs video info; pages are
+# continued through /search/next with a "local:" page token. The total is not
+# known, so total_results is null and total_results_lower_bound is given.
+def _local_search_response(query_text, page_limit, offset=0):
+
+    from api.utils.query_embeddings import get_query_embedding
+    from api.utils.weaviate_api import search_by_vector
+
+    started = time.perf_counter()
+    
+    vector = get_query_embedding(query_text)
+    if vector is None:
+        return None
+    
+    matches = search_by_vector(vector, limit=page_limit, offset=offset)
+    if matches is None:
+        return None
+    
+    video_infos = get_video_infos(match["video_id"] for match in matches)
+    
+    results = []
+    for match in matches:
+        score = round(match["certainty"] * 100, 2) if match["certainty"] is not None else None
+        video_info = video_infos.get(match["video_id"]) or {}
+        # Same source as the TwelveLabs engine; the stored name only when the info is unavailable
+        filename = video_info.get("system_metadata", {}).get("filename") or match.get("filename")
+        thumbnail_urls = (video_info.get("hls") or {}).get("thumbnail_urls") or []
+        results.append({
+            "video_id": match["video_id"],
+            "score": score,
+            "filename": filename,
+            "video_url": f"/api/video/{filename}" if filename else None,
+            "thumbnail_url": thumbnail_urls[0] if thumbnail_urls else None,
+            "clips": [{
+                "start": match.get("start_time"),
+                "end": match.get("end_time"),
+                "score": score,
+                "confidence": None,
+                "thumbnail_url": None
+            }]
+        })
+    
+    has_more = len(matches) == page_limit
+    page = offset // page_limit + 1 if page_limit else 1
+    pagination = {
+        "total_results": None,
+        "total_results_lower_bound": offset + len(results),
+        "limit_per_page": page_limit,
+        "next_page_token": _encode_local_page_token(query_text, offset + page_limit, page_limit) if has_more else None,
+        "prev_page_token": _encode_local_page_token(query_text, offset - page_limit, page_limit) if offset > 0 else None,
+        "has_more": has_more,
+        "total_pages": page + 1 if has_more else page
+    }
+    
+    return {
+        "results": results,
+        "pagination": pagination,
+        "took_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
 @search_bp.route('/search', methods=['POST'])
 def api_search_videos():
 
@@ -17,13 +101,35 @@ def api_search_videos():
     search_options = data.get('options', ['visual'])
     page_limit = data.get('page_limit', 15)  
     threshold = data.get('threshold', 'high')
+    engine = data.get('engine', SEARCH_ENGINE)
     
     if not query_text:
         return jsonify({"error": "Search query text is required"}), 400
     
+    if engine not in SEARCH_ENGINES:
+        return jsonify({"error": f"Unknown search engine '{engine}', expected one of {', '.join(SEARCH_ENGINES)}"}), 400
+    
+    # The local engine only has visual-text embeddings and no confidence levels
+    if engine == "local" and (list(search_options) != ['visual'] or 'threshold' in data):
+        return jsonify({"error": "The local search engine supports only options ['visual'] and no threshold"}), 400
+    
     try:
-        logger.info(f"Search request received: query={query_text}, options={search_options}")
+        logger.info(f"Search request received: query={query_text}, options={search_options}, engine={engine}")
+        record_query(query_text)
         
+        if engine == "local":
+            local_response = _local_search_response(query_text, page_limit)
+            if local_response is None:
+                return jsonify({"error": "Search failed"}), 500
+            return jsonify({
+                "success": True,
+                "query": query_text,
+                "options": search_options,
+                "engine": engine,
+                **local_response
+            })
+        
+        started = time.perf_counter()
         search_results = search_videos(query_text, search_options, page_limit, threshold)
         
         if not search_results:
@@ -31,6 +137,10 @@ def api_search_videos():
         
         results = []
         
+        # Fetch additional video information for the whole page at once
+        video_ids = [getattr(video, 'id', None) or getattr(video, 'video_id', None) for video in search_results.data]
+        video_infos = get_video_infos(video_id for video_id in video_ids if video_id)
+        
         # Process each video in the search results
         for video in search_results.data:
             video_id = getattr(video, 'id', None) or getattr(video, 'video_id', None)
@@ -38,8 +148,7 @@ def api_search_videos():
             if not video_id:
                 continue
             
-            # Get additional video information
-            video_info = get_video_info(video_id)
+            video_info = video_infos.get(video_id)
             
             if video_info:
                 # Create S3 streaming URL 
@@ -115,8 +224,10 @@ def api_search_videos():
             "success": True,
             "query": query_text,
             "options": search_options,
+            "engine": engine,
             "results": results,
-            "pagination": pagination
+            "pagination": pagination,
+            "took_ms": round((time.perf_counter() - started) * 1000, 1)
         })
         
     except Exception as e:
@@ -125,6 +236,31 @@ def api_search_videos():
         logger.error(traceback.format_exc())
         return jsonify({"error": f"Failed to search videos: {str(e)}"}), 500
 
+# Search-as-you-type suggestions from analysis metadata and past queries
+@search_bp.route('/suggest', methods=['GET'])
+def api_suggest():
+
+    prefix = request.args.get('q', '')
+    limit = min(20, request.args.get('limit', 8, type=int))
+    
+    started = time.perf_counter()
+    suggestions = suggest(prefix, limit)
+    
+    return jsonify({
+        "query": prefix,
+        "suggestions": suggestions,
+        # False while the index is still being built in the background
+        "ready": is_built(),
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@search_bp.route('/search/embedding-cache', methods=['GET'])
+def api_query_embedding_cache_stats():
+
+    from api.utils.query_embeddings import get_query_embedding_stats
+    
+    return jsonify(get_query_embedding_stats())
+
 @search_bp.route('/search/next', methods=['POST'])
 def api_search_next_page():
 
@@ -136,6 +272,17 @@ def api_search_next_page():
         return jsonify({"error": "Page token is required"}), 400
     
     try:
+        if page_token.startswith(LOCAL_PAGE_TOKEN_PREFIX):
+            try:
+                token = _decode_local_page_token(page_token)
+                query_text, page_limit, offset = token["q"], int(token["limit"]), max(0, int(token["offset"]))
+            except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+                return jsonify({"error": "Invalid page token"}), 400
+            local_response = _local_search_response(query_text, page_limit, offset)
+            if local_response is None:
+                return jsonify({"error": "Failed to retrieve next page"}), 500
+            return jsonify({"success": True, "engine": "local", **local_response})
+        
         search_results = search_by_page_token(page_token)
         
         if not search_results:
@@ -143,6 +290,10 @@ def api_search_next_page():
         
         results = []
         
+        # Fetch additional video information for the whole page at once
+        video_ids = [getattr(video, 'id', None) or getattr(video, 'video_id', None) for video in search_results.data]
+        video_infos = get_video_infos(video_id for video_id in video_ids if video_id)
+        
         # Process each video in the search results
         for video in search_results.data:
             video_id = getattr(video, 'id', None) or getattr(video, 'video_id', None)
@@ -150,8 +301,7 @@ def api_search_next_page():
             if not video_id:
                 continue
             
-            # Get additional video information
-            video_info = get_video_info(video_id)
+            video_info = video_infos.get(video_id)
             
             if video_info:
                 # Create S3 streaming URL 
@@ -1,5 +1,8 @@
-from flask import Blueprint, jsonify, request, Response
+from flask import Blueprint, jsonify, request, Response, redirect
 import logging
+import time
+
+from config.settings import VIDEO_DELIVERY_MODE, API_CACHE_TTL_VIDEOS, API_CACHE_TTL_VIDEO_INFO
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +14,7 @@ video_bp = Blueprint('video', __name__)
 @video_bp.route('/videos', methods=['GET'])
 def api_list_videos():
     from api.utils.twelvelabs_api import list_videos
+    from api.utils.http_cache import get_cached_response, cache_response, conditional_json
     
     page = request.args.get('page', 1, type=int)
     page_limit = request.args.get('limit', 50, type=int)
@@ -18,9 +22,14 @@ def api_list_videos():
     sort_option = request.args.get('sort_option', 'desc')
     filename = request.args.get('filename')
     
-    videos = list_videos(page, page_limit, sort_by, sort_option, filename)
+    cache_key = f"videos:{page}:{page_limit}:{sort_by}:{sort_option}:{filename}"
+    videos = get_cached_response(cache_key)
+    if videos is None:
+        videos = list_videos(page, page_limit, sort_by, sort_option, filename)
+        if videos:
+            cache_response(cache_key, videos, API_CACHE_TTL_VIDEOS)
     if videos:
-        return jsonify(videos)
+        return conditional_json(videos, API_CACHE_TTL_VIDEOS)
     return jsonify({"error": "Failed to retrieve videos"}), 500
 
 
@@ -29,58 +38,102 @@ def api_list_videos():
 def api_get_video_info(video_id):
 
     from api.utils.twelvelabs_api import get_video_info
-    from api.utils.s3_utils import get_video_path
+    from api.utils.s3_utils import video_path_from_metadata
+    from api.utils.http_cache import get_cached_response, cache_response, conditional_json
     
     include_embeddings = request.args.get('include_embeddings', 'false').lower() == 'true'
     
-    video_info = get_video_info(video_id, include_embeddings)
+    cache_key = f"video:{video_id}:{include_embeddings}"
+    video_info = get_cached_response(cache_key)
+    if video_info is None:
+        video_info = get_video_info(video_id, include_embeddings)
+        if video_info:
+            cache_response(cache_key, video_info, API_CACHE_TTL_VIDEO_INFO)
     if video_info:
-        # If S3 streaming is enabled, add stream URL
-        video_path = get_video_path(video_id)
+        # If S3 streaming is enabled, add stream URL, from the cached
+        # user metadata rather than another TwelveLabs lookup
+        video_path = video_path_from_metadata(video_id, video_info.get("user_metadata"))
         stream_url = f"/api/video/{video_path}"
         
-        if "hls" not in video_info:
-            video_info["hls"] = {}
-        
-        # Replace the video URL with our streaming URL
-        video_info["hls"]["video_url"] = stream_url
+        # Replace the video URL with our streaming URL, on a copy: the cached
+        # dict is shared by concurrent requests
+        video_info = {**video_info, "hls": {**(video_info.get("hls") or {}), "video_url": stream_url}}
         
-        return jsonify(video_info)
+        return conditional_json(video_info, API_CACHE_TTL_VIDEO_INFO)
     return jsonify({"error": "Failed to retrieve video information"}), 500
 
 
 # Stream a video file from S3
 @video_bp.route('/video/<path:filename>', methods=['GET'])
 def api_stream_video(filename):
-    from api.utils.s3_utils import stream_video_from_s3
+    from api.utils.s3_utils import (
+        stream_video_from_s3, resolve_video_object, get_presigned_video_url, PRESIGNED_URL_MARGIN_SECONDS
+    )
+    
+    # Delivery mode can be chosen per request with ?mode=proxy|redirect|json
+    mode = request.args.get('mode', VIDEO_DELIVERY_MODE)
+    if mode not in ('proxy', 'redirect', 'json'):
+        return jsonify({"error": f"Unknown delivery mode '{mode}', expected proxy, redirect or json"}), 400
+    
+    # Simple filenames (JU231212_0147.mp4) and full keys are resolved through
+    # the S3 key index; pattern guessing is only a fallback for unindexed files
+    s3_key, object_info = resolve_video_object(filename)
+    if s3_key != filename.lstrip('/'):
+        logger.info(f"Resolved {filename} to S3 key {s3_key}")
+    
+    if mode == 'proxy':
+        return stream_video_from_s3(s3_key, object_info)
+    
+    # Redirect and JSON modes hand the client a presigned S3 URL, so the
+    # video bytes never pass through this server
+    try:
+        url, expires_at = get_presigned_video_url(s3_key)
+    except Exception as e:
+        logger.error(f"Error presigning {s3_key}: {str(e)}")
+        return jsonify({"error": "Could not create video URL"}), 500
+    
+    if url is None:
+        return jsonify({"error": "S3 client not initialized"}), 500
+    
+    if mode == 'json':
+        return jsonify({
+            "url": url,
+            "key": s3_key,
+            "size": object_info['size'] if object_info else None,
+            "expires_at": expires_at
+        })
     
+    # Clients may reuse the redirect only while the URL is still valid
+    rv = redirect(url, code=302)
+    rv.headers['Cache-Control'] = f"private, max-age={max(0, expires_at - int(time.time()) - PRESIGNED_URL_MARGIN_SECONDS)}"
+    return rv
 
-    if '/' not in filename and filename.endswith('.mp4'):
-        logger.info(f"Received simple filename: {filename}, trying to construct S3 path...")
-        
-        # Try common S3 path patterns based on the filename
-        # Pattern: JU231212_0147.mp4 -> JU/JU231212/q4/JU231212_0147.mp4
-        if filename.startswith('JU') and '_' in filename:
-            # Extract the prefix (e.g., "JU231212" from "JU231212_0147.mp4")
-            prefix = filename.split('_')[0]
-            # Try the pattern: JU/JU231212/q4/JU231212_0147.mp4
-            likely_path = f"JU/{prefix}/q4/{filename}"
-            logger.info(f"Trying likely S3 path: {likely_path}")
-            
-            # Test if this path exists in S3
-            try:
-                from api.utils.s3_utils import s3_client
-                from config.settings import S3_BUCKET_NAME
-                s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=likely_path)
-                logger.info(f"Found video at path: {likely_path}")
-                return stream_video_from_s3(likely_path)
-            except Exception as e:
-                logger.warning(f"Path {likely_path} not found in S3: {str(e)}")
-        
-        # If pattern matching fails, try the original filename
-        logger.warning(f"Could not find video with filename: {filename}")
+
+# Hit rate and size of the local video block cache
+@video_bp.route('/video-cache', methods=['GET'])
+def api_video_cache_stats():
+    from api.utils.video_block_cache import get_block_cache_stats
     
-    return stream_video_from_s3(filename)
+    return jsonify(get_block_cache_stats())
+
+
+# Status of the filename -> S3 key index
+@video_bp.route('/s3-index', methods=['GET'])
+def api_s3_index_status():
+    from api.utils.s3_key_index import get_s3_key_index_status
+    
+    return jsonify(get_s3_key_index_status())
+
+
+# Re-crawl the bucket in the background
+@video_bp.route('/s3-index/refresh', methods=['POST'])
+def api_refresh_s3_index():
+    from api.utils.s3_key_index import start_crawl
+    
+    if not start_crawl():
+        return jsonify({"error": "An S3 crawl is already running"}), 409
+    
+    return jsonify({"success": True, "message": "S3 crawl started"}), 202
 
 
 # Get metadata for a specific video
@@ -113,6 +166,28 @@ def api_update_metadata(video_id):
     return jsonify({"error": "Failed to update metadata", "details": result}), 500
 
 
+# Pending metadata writes when write-behind is enabled
+@video_bp.route('/metadata-queue', methods=['GET'])
+def api_metadata_queue_status():
+    from api.utils.metadata_writer import get_write_behind_status
+    
+    return jsonify(get_write_behind_status())
+
+
+# Flush pending metadata writes, for one video or all of them
+@video_bp.route('/metadata-queue/flush', methods=['POST'])
+def api_flush_metadata_queue():
+    from api.utils.metadata_writer import flush_metadata_updates
+    
+    data = request.get_json(silent=True) or {}
+    result = flush_metadata_updates(data.get('video_id'))
+    
+    return jsonify({
+        "success": not result["failed"],
+        **result
+    })
+
+
 # Update a single field in the metadata for a specific video
 @video_bp.route('/metadata/<video_id>/field', methods=['PUT'])
 def api_update_metadata_field(video_id):
@@ -1,12 +1,21 @@
 from flask import Blueprint, jsonify, request
 import logging
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Create blueprint
 weaviate_bp = Blueprint('weaviate', __name__)
 
 logger = logging.getLogger(__name__)
 
+# similar_videos_str writes run off the response path on a small pool rather
+# than a thread per request. One write per video is pending at a time; the
+# same result requested again meanwhile is not queued twice.
+_store_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="similar-videos-store")
+_storing = set()
+_storing_lock = threading.Lock()
+
 
 # Recreate the Weaviate schema for video embeddings
 @weaviate_bp.route('/recreate-schema', methods=['POST'])
@@ -59,13 +68,16 @@ def api_recreate_schema():
 def api_get_similar_videos(video_id):
     import json
     from api.utils.twelvelabs_api import get_video_info, update_video_metadata
-    from api.utils.weaviate_api import find_similar_videos
-
+    from api.utils.weaviate_api import find_similar_videos, FILTER_PROPERTIES
+    from api.utils.metadata_writer import is_write_behind_enabled
 
     limit = request.args.get('limit', 6, type=int)
+    
+    # Property filters, e.g. ?position=underwater. Filtered results are not cached in metadata.
+    filters = {name: request.args.get(name) for name in FILTER_PROPERTIES if request.args.get(name)}
 
     # Step 1 - Check metadata cache (using `similar_videos_str` which is a key)
-    video_info = get_video_info(video_id)
+    video_info = get_video_info(video_id) if not filters else None
     if video_info and 'user_metadata' in video_info:
         user_metadata = video_info['user_metadata']
         if 'similar_videos_str' in user_metadata:
@@ -91,7 +103,7 @@ def api_get_similar_videos(video_id):
                 logger.warning(f"Failed to parse similar_videos_str from metadata: {str(e)}")
 
     # Step 2 - Cache miss or error — do Weaviate search
-    similar_videos = find_similar_videos(video_id, limit=limit)
+    similar_videos = find_similar_videos(video_id, limit=limit, filters=filters)
 
     for video in similar_videos:
         if isinstance(video, dict):
@@ -101,23 +113,103 @@ def api_get_similar_videos(video_id):
                 if filename:
                     video['video_url'] = f"/api/video/{filename}"
 
-    # Step 3 - Store results as JSON string in metadata
-    if similar_videos:
-        try:
-            similar_videos_str = json.dumps(similar_videos)
-            update_video_metadata(video_id, {
-                "similar_videos_str": similar_videos_str
-            })
-        except Exception as e:
-            logger.warning(f"Failed to store similar_videos_str in metadata: {str(e)}")
+    # Step 3 - Store results as JSON string in metadata, off the response path
+    if similar_videos and not filters:
+        similar_videos_str = json.dumps(similar_videos)
+
+        def store_similar_videos():
+            try:
+                update_video_metadata(video_id, {
+                    "similar_videos_str": similar_videos_str
+                })
+            except Exception as e:
+                logger.warning(f"Failed to store similar_videos_str in metadata: {str(e)}")
+            finally:
+                with _storing_lock:
+                    _storing.discard(video_id)
+
+        if is_write_behind_enabled():
+            # Only queues the write; the metadata writer flushes it
+            store_similar_videos()
+        else:
+            with _storing_lock:
+                queued = video_id in _storing
+                _storing.add(video_id)
+            if not queued:
+                _store_executor.submit(store_similar_videos)
 
     return jsonify({
         "success": True,
         "video_id": video_id,
         "similar_videos": similar_videos,
+        "filters": filters,
         "source": "weaviate"
     })
 
+
+# Hybrid keyword (BM25 over the analysis text) + vector search
+@weaviate_bp.route('/hybrid-search', methods=['GET', 'POST'])
+def api_hybrid_search():
+
+    from api.utils.weaviate_api import hybrid_search, FILTER_PROPERTIES
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args
+    
+    query_text = (data.get('query') or data.get('q') or '').strip()
+    if not query_text:
+        return jsonify({"error": "Search query is required"}), 400
+    
+    try:
+        alpha = float(data.get('alpha', 0.5))
+        limit = int(data.get('limit', 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "alpha must be a number and limit an integer"}), 400
+    
+    if not 0 <= alpha <= 1:
+        return jsonify({"error": "alpha must be between 0 (keyword) and 1 (vector)"}), 400
+    
+    filters = data.get('filters') if isinstance(data.get('filters'), dict) else {
+        name: data.get(name) for name in FILTER_PROPERTIES if data.get(name)
+    }
+    
+    try:
+        result = hybrid_search(query_text, alpha, min(100, limit), filters)
+        if result is None:
+            return jsonify({"error": "Weaviate client not initialized"}), 500
+        
+        for video in result["results"]:
+            if video.get("filename"):
+                video["video_url"] = f"/api/video/{video['filename']}"
+        
+        return jsonify({
+            "success": True,
+            "query": query_text,
+            "alpha": result["alpha"],
+            "filters": filters,
+            "results": result["results"]
+        })
+    except Exception as e:
+        logger.error(f"Error in hybrid search: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return jsonify({"error": f"Hybrid search failed: {str(e)}"}), 500
+
+
+# Copy analysis fields from the local catalog onto existing Weaviate objects
+@weaviate_bp.route('/sync-analysis-properties', methods=['POST'])
+def api_sync_analysis_properties():
+
+    from api.utils.weaviate_api import sync_analysis_properties
+    
+    result = sync_analysis_properties()
+    if "error" in result:
+        return jsonify(result), 500
+    
+    return jsonify({"success": True, **result})
+
 @weaviate_bp.route('/debug-similar-videos/<video_id>', methods=['GET'])
 def api_debug_similar_videos(video_id):
 
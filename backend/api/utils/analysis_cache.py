@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+import logging
+import time
+
+from config.settings import ANALYSIS_CACHE_DIR, ANALYSIS_MODEL_NAME
+from api.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+# Hash of the prompt text, so that a prompt edit invalidates earlier results
+def get_prompt_hash(prompt):
+
+    return hashlib.sha256((prompt or "").encode("utf-8")).hexdigest()
+
+
+# The Pegasus model is fixed by the TwelveLabs index and is not sent with the
+# request, so the model name is a cache-version label: change
+# ANALYSIS_MODEL_NAME by hand when the index's model changes (or to discard
+# every cached analysis)
+def get_cache_key(video_id, prompt, model=None):
+
+    model = model or ANALYSIS_MODEL_NAME
+    raw_key = f"{video_id}:{get_prompt_hash(prompt)}:{model}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def _cache_path(cache_key):
+
+    return os.path.join(ANALYSIS_CACHE_DIR, cache_key[:2], f"{cache_key}.json")
+
+
+# Look up a previous successful analysis for this video, prompt and model
+def get_cached_analysis(video_id, prompt, model=None):
+
+    path = _cache_path(get_cache_key(video_id, prompt, model))
+    if not os.path.isfile(path):
+        record_cache("analysis", False)
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        logger.info(f"Analysis cache hit for video {video_id}")
+        record_cache("analysis", True)
+        return entry
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable analysis cache entry {path}: {str(e)}")
+        record_cache("analysis", False)
+        return None
+
+
+# Store the raw and structured result of a successful analysis
+def save_cached_analysis(video_id, prompt, result, model=None):
+
+    if result.get('statusCode') != 200 or 'structured_data' not in result:
+        return False
+
+    model = model or ANALYSIS_MODEL_NAME
+    path = _cache_path(get_cache_key(video_id, prompt, model))
+
+    entry = {
+        "video_id": video_id,
+        "prompt_hash": get_prompt_hash(prompt),
+        "model": model,
+        "cached_at": int(time.time()),
+        "data": result.get('data'),
+        "structured_data": result.get('structured_data')
+    }
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        logger.error(f"Error writing analysis cache for video {video_id}: {str(e)}")
+        return False
@@ -0,0 +1,166 @@
+import re
+
+# Declarative description of a Pegasus analysis. Both the JSON normaliser and
+# the plain-text parser are driven by it.
+#
+#   name      - canonical key in the structured result
+#   header    - section header in plain-text responses (matched as "<header>:")
+#   wrap_key  - for grouped fields, key used when the value is not a dict
+#   fields    - for grouped fields, (key, vocabulary) pairs filled from the
+#               section text; a vocabulary of None takes the whole section
+ANALYSIS_SCHEMA = (
+    {"name": "Shot", "header": "shot"},
+    {
+        "name": "Subject",
+        "header": "subject",
+        "wrap_key": "Identification",
+        "fields": (
+            ("Type", ("animal", "human", "object")),
+            ("Classification", ("mammal", "bird", "reptile", "amphibian", "fish", "insect")),
+            ("Species", ("primate", "feline", "canine", "bovine", "equine")),
+            ("Count", ("single", "multiple", "pair", "group")),
+            ("Identification", None),
+            ("Color", ("black", "white", "brown", "grey", "gray", "red", "blue", "green", "yellow")),
+        )
+    },
+    {"name": "Action", "header": "action"},
+    {
+        "name": "Environment",
+        "header": "environment",
+        "wrap_key": "Description",
+        "fields": (
+            ("Time", ("day", "night", "dusk", "dawn", "morning", "evening")),
+            ("Location", ("forest", "urban", "indoor", "outdoor", "rural", "jungle", "desert",
+                          "mountain", "beach", "ocean", "river", "lake", "rainforest")),
+            ("Weather", ("sunny", "rainy", "cloudy", "snowy", "foggy", "clear")),
+            ("Position", ("topside", "underwater", "aerial", "ground")),
+            ("Climate", ("tropical", "temperate", "arctic", "desert", "mediterranean")),
+        )
+    },
+    {"name": "Narrative Flow", "header": "narrative flow"},
+    {"name": "Additional Details", "header": "additional details"},
+)
+
+
+def _normalize_key(key):
+
+    return re.sub(r"[\s_]", "", str(key)).lower()
+
+
+# Compiled once: one pattern for every section header, and for grouped
+# fields a single word -> [(key, rank)] lookup. When several words of the same
+# vocabulary appear, the one listed last wins.
+#
+# The header pattern is anchored on the colon, so the regex engine can skip
+# straight to colons and only then check which header precedes it.
+_HEADER_PATTERN = re.compile(":(?:" + "|".join(
+    f"(?<={re.escape(spec['header'])}:)(?P<h{i}>)" for i, spec in enumerate(ANALYSIS_SCHEMA)
+) + ")")
+_HEADER_BY_GROUP = {f"h{i}": (spec["name"], len(spec["header"])) for i, spec in enumerate(ANALYSIS_SCHEMA)}
+_SPEC_BY_KEY = {_normalize_key(spec["name"]): spec for spec in ANALYSIS_SCHEMA}
+
+
+def _build_word_index(fields):
+
+    index = {}
+    for key, words in fields:
+        for rank, word in enumerate(words or ()):
+            index.setdefault(word, []).append((key, rank))
+    return {word: tuple(hits) for word, hits in index.items()}
+
+
+_WORD_INDEX = {spec["name"]: _build_word_index(spec["fields"]) for spec in ANALYSIS_SCHEMA if "fields" in spec}
+_VOCABULARIES = {
+    spec["name"]: frozenset(word for _, words in spec["fields"] for word in (words or ()))
+    for spec in ANALYSIS_SCHEMA if "fields" in spec
+}
+_SECTION_KEYS = {
+    spec["name"]: tuple(key for key, words in spec["fields"] if words is None)
+    for spec in ANALYSIS_SCHEMA if "fields" in spec
+}
+_EMPTY_RESULT = {
+    spec["name"]: {key: "" for key, _ in spec["fields"]} if "fields" in spec else ""
+    for spec in ANALYSIS_SCHEMA
+}
+
+
+# Map a JSON response onto the canonical keys, accepting any casing or spacing
+# of the key names ("Narrative Flow", "narrative flow", "NarrativeFlow", ...).
+# Valid JSON that is not an object (a bare string, a list) is not an analysis:
+# strings go through the text parser, anything else yields no fields.
+def normalize_structured_data(data):
+
+    if not isinstance(data, dict):
+        return parse_unstructured_response(data) if isinstance(data, str) else {}
+
+    found = {}
+    for key, value in data.items():
+        spec = _SPEC_BY_KEY.get(_normalize_key(key))
+        if spec is None:
+            continue
+        # An exact canonical key takes precedence over a variant
+        if spec["name"] in found and key != spec["name"]:
+            continue
+        found[spec["name"]] = value
+
+    normalized = {}
+    for spec in ANALYSIS_SCHEMA:
+        if spec["name"] not in found:
+            continue
+        value = found[spec["name"]]
+        if "wrap_key" in spec and not isinstance(value, dict):
+            value = {spec["wrap_key"]: value}
+        normalized[spec["name"]] = value
+
+    return normalized
+
+
+# Parse a plain-text response in a single pass: the text is lowercased once,
+# every section header is located with one regex scan, and each section is
+# tokenised once and looked up in the vocabularies.
+def parse_unstructured_response(text):
+
+    result = {name: value.copy() if isinstance(value, dict) else value for name, value in _EMPTY_RESULT.items()}
+
+    if not text:
+        return result
+
+    lowered = text.lower()
+
+    # A section runs from the first occurrence of its header to the end of
+    # that line, or to a repeat of the same header on that line
+    bounds = {}
+    for match in _HEADER_PATTERN.finditer(lowered):
+        name, header_length = _HEADER_BY_GROUP[match.lastgroup]
+        if name in bounds:
+            start, end = bounds[name]
+            header_start = match.start() - header_length
+            if header_start < end:
+                bounds[name] = (start, header_start)
+            continue
+        end = lowered.find("\n", match.end())
+        bounds[name] = (match.end(), end if end != -1 else len(lowered))
+
+    for name, (start, end) in bounds.items():
+        section = lowered[start:end]
+        word_index = _WORD_INDEX.get(name)
+        if word_index is None:
+            result[name] = section.strip()
+            continue
+
+        group = result[name]
+        for key in _SECTION_KEYS[name]:
+            group[key] = section.strip()
+
+        matched = _VOCABULARIES[name].intersection(section.split())
+        if not matched:
+            continue
+        ranks = {}
+        for word in matched:
+            for key, rank in word_index[word]:
+                if rank >= ranks.get(key, (-1, None))[0]:
+                    ranks[key] = (rank, word)
+        for key, (_, word) in ranks.items():
+            group[key] = word.capitalize()
+
+    return result
@@ -0,0 +1,338 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+import traceback
+
+from config.settings import BATCH_ANALYSIS_CHECKPOINT_DIR
+from api.utils.twelvelabs_api import list_videos, get_video_info
+from api.utils.generate_analysis import analyze_video, process_analysis_result
+from api.utils.csv_utils import save_analysis_result, save_detailed_analysis_result
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.path.join(BATCH_ANALYSIS_CHECKPOINT_DIR, "state.json")
+COMPLETED_FILE = os.path.join(BATCH_ANALYSIS_CHECKPOINT_DIR, "completed.txt")
+# Held by whichever process (gunicorn worker or CLI) is running the batch;
+# the stop file asks that process to stop at the next video
+JOB_LOCK_FILE = os.path.join(BATCH_ANALYSIS_CHECKPOINT_DIR, "job.lock")
+STOP_FILE = os.path.join(BATCH_ANALYSIS_CHECKPOINT_DIR, "stop")
+
+# Phases of a run. With prioritisation the index is walked first for videos
+# that were never analysed; the pass over everything else only runs when
+# already analysed videos are not skipped.
+PHASE_UNANALYZED = "unanalyzed"
+PHASE_ALL = "all"
+
+
+class _StopFile:
+
+    def is_set(self):
+        return os.path.exists(STOP_FILE)
+
+
+# Analyze one video, update its metadata and record the outcome in the CSVs
+def analyze_and_record(video_id, prompt=None, use_lambda=True, force=False, video_info=None):
+
+    if video_info is None:
+        video_info = get_video_info(video_id)
+    filename = video_info.get("user_metadata", {}).get("filename", "Unknown") if video_info else "Unknown"
+
+    try:
+        result = analyze_video(video_id, prompt, use_lambda, force)
+        success, processed_result = process_analysis_result(video_id, result, video_info=video_info)
+
+        if success:
+            save_analysis_result(video_id, filename, "success")
+            save_detailed_analysis_result(video_id, filename, "success", result.get('structured_data'))
+        else:
+            save_analysis_result(video_id, filename, "failure", processed_result)
+            save_detailed_analysis_result(video_id, filename, "failure", None, processed_result)
+
+        return {
+            "video_id": video_id,
+            "video_info": video_info,
+            "success": success,
+            "analysis": result,
+            "timestamp": int(time.time()),
+            "metadata_update": "Success" if success else processed_result
+        }
+    except Exception as e:
+        logger.error(f"Error analyzing video {video_id}: {str(e)}")
+        save_analysis_result(video_id, filename, "error", str(e))
+        return {
+            "video_id": video_id,
+            "video_info": video_info,
+            "success": False,
+            "timestamp": int(time.time()),
+            "error": f"Error analyzing video: {str(e)}"
+        }
+
+
+def _new_state(options):
+
+    return {
+        "status": "running",
+        "phase": PHASE_UNANALYZED if options.get("prioritize_unanalyzed") else PHASE_ALL,
+        "page": 1,
+        "total_pages": None,
+        "options": options,
+        "counts": {"processed": 0, "successful": 0, "failed": 0, "skipped": 0},
+        "started_at": int(time.time()),
+        "updated_at": int(time.time()),
+        "error": None
+    }
+
+
+def load_checkpoint():
+
+    if not os.path.isfile(STATE_FILE):
+        return None
+
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Could not read batch analysis checkpoint: {str(e)}")
+        return None
+
+
+def save_checkpoint(state):
+
+    os.makedirs(BATCH_ANALYSIS_CHECKPOINT_DIR, exist_ok=True)
+    state["updated_at"] = int(time.time())
+    tmp_path = f"{STATE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, STATE_FILE)
+
+
+# Videos a resumed run does not need to touch again. Failures are recorded
+# too, but left out here so that the next run retries them.
+def load_completed_ids():
+
+    completed = set()
+    if os.path.isfile(COMPLETED_FILE):
+        with open(COMPLETED_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                video_id, _, status = line.strip().partition("\t")
+                if video_id and status != "failure":
+                    completed.add(video_id)
+    return completed
+
+
+def _mark_completed(video_id, status):
+
+    os.makedirs(BATCH_ANALYSIS_CHECKPOINT_DIR, exist_ok=True)
+    with open(COMPLETED_FILE, "a", encoding="utf-8") as f:
+        f.write(f"{video_id}\t{status}\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def reset_checkpoint():
+
+    for path in (STATE_FILE, COMPLETED_FILE):
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def _is_analyzed(video):
+
+    return bool(video.get("user_metadata", {}).get("analysis_complete"))
+
+
+# Page through the whole index, analysing each video once and checkpointing
+# after every video so that a restart resumes where the last run stopped.
+def run_batch_analysis(prompt=None, use_lambda=True, force=False, page_size=50,
+                       prioritize_unanalyzed=True, skip_analyzed=True,
+                       delay_seconds=0, resume=True, stop_event=None):
+
+    options = {
+        "prompt": prompt,
+        "use_lambda": use_lambda,
+        "force": force,
+        "page_size": page_size,
+        "prioritize_unanalyzed": prioritize_unanalyzed,
+        "skip_analyzed": skip_analyzed,
+        "delay_seconds": delay_seconds
+    }
+
+    # Stop requests arrive through the stop file from any process
+    stop_event = stop_event or _StopFile()
+
+    state = load_checkpoint() if resume else None
+    if state and state.get("status") != "completed":
+        logger.info(f"Resuming batch analysis at phase '{state['phase']}', page {state['page']}")
+        options = state.get("options", options)
+        completed = load_completed_ids()
+    else:
+        reset_checkpoint()
+        state = _new_state(options)
+        completed = set()
+    # Failed this run; retried by the next run, not by the second pass
+    failed = set()
+
+    state["status"] = "running"
+    save_checkpoint(state)
+
+    try:
+        while True:
+            if stop_event and stop_event.is_set():
+                state["status"] = "stopped"
+                save_checkpoint(state)
+                logger.info("Batch analysis stopped, progress is checkpointed")
+                return state
+
+            # Oldest first, so videos added during the run land on later pages
+            # instead of shifting the pages that were already processed.
+            videos_response = list_videos(page=state["page"], page_limit=options["page_size"],
+                                          sort_by="created_at", sort_option="asc")
+            if not videos_response or 'data' not in videos_response:
+                raise RuntimeError(f"Failed to retrieve videos for page {state['page']}")
+
+            state["total_pages"] = videos_response.get('page_info', {}).get('total_page', state["total_pages"])
+
+            for video in videos_response['data']:
+                video_id = video['_id']
+                if video_id in completed or video_id in failed:
+                    continue
+
+                analyzed = _is_analyzed(video)
+                if state["phase"] == PHASE_UNANALYZED and analyzed:
+                    continue
+
+                if options["skip_analyzed"] and analyzed and not options["force"]:
+                    state["counts"]["skipped"] += 1
+                    _mark_completed(video_id, "skipped")
+                    completed.add(video_id)
+                    continue
+
+                if stop_event and stop_event.is_set():
+                    break
+
+                result = analyze_and_record(video_id, options["prompt"], options["use_lambda"], options["force"])
+
+                status = "success" if result["success"] else "failure"
+                state["counts"]["processed"] += 1
+                state["counts"]["successful" if result["success"] else "failed"] += 1
+
+                _mark_completed(video_id, status)
+                (completed if result["success"] else failed).add(video_id)
+                save_checkpoint(state)
+
+                if options["delay_seconds"] > 0:
+                    time.sleep(options["delay_seconds"])
+
+            if stop_event and stop_event.is_set():
+                continue
+
+            if state["total_pages"] and state["page"] < state["total_pages"]:
+                state["page"] += 1
+            elif state["phase"] == PHASE_UNANALYZED and (not options["skip_analyzed"] or options["force"]):
+                logger.info("All unanalyzed videos processed, starting pass over remaining videos")
+                state["phase"] = PHASE_ALL
+                state["page"] = 1
+            else:
+                break
+
+            save_checkpoint(state)
+            logger.info(f"Batch analysis progress: phase '{state['phase']}', page {state['page']}/{state['total_pages']}, " +
+                        f"{state['counts']['successful']} successful, {state['counts']['failed']} failed")
+
+        state["status"] = "completed"
+        save_checkpoint(state)
+        logger.info(f"Batch analysis completed: {state['counts']}")
+        return state
+
+    except Exception as e:
+        logger.error(f"Batch analysis interrupted: {str(e)}")
+        logger.error(traceback.format_exc())
+        state["status"] = "failed"
+        state["error"] = str(e)
+        save_checkpoint(state)
+        return state
+
+
+def _try_lock():
+
+    os.makedirs(BATCH_ANALYSIS_CHECKPOINT_DIR, exist_ok=True)
+    lock_file = open(JOB_LOCK_FILE, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+# Exclusive lock on the checkpoint directory, or None when another process
+# already runs a batch. Released by release_job_lock or on process exit.
+def acquire_job_lock():
+
+    lock_file = _try_lock()
+    if lock_file is not None and os.path.exists(STOP_FILE):
+        os.remove(STOP_FILE)
+    return lock_file
+
+
+def release_job_lock(lock_file):
+
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+
+def is_job_running():
+
+    lock_file = _try_lock()
+    if lock_file is None:
+        return True
+    release_job_lock(lock_file)
+    return False
+
+
+def _run_locked(lock_file, kwargs):
+
+    try:
+        run_batch_analysis(**kwargs)
+    finally:
+        release_job_lock(lock_file)
+
+
+# Background job, started from the API. Only one runner may be active across
+# all worker processes and the CLI, so any worker can start, stop or report it.
+def start_batch_analysis_job(**kwargs):
+
+    lock_file = acquire_job_lock()
+    if lock_file is None:
+        return False
+
+    threading.Thread(
+        target=_run_locked,
+        args=(lock_file, kwargs),
+        name="batch-analysis",
+        daemon=True
+    ).start()
+    return True
+
+
+def stop_batch_analysis_job():
+
+    if not is_job_running():
+        return False
+    os.makedirs(BATCH_ANALYSIS_CHECKPOINT_DIR, exist_ok=True)
+    with open(STOP_FILE, "w", encoding="utf-8") as f:
+        f.write(str(int(time.time())))
+    return True
+
+
+def get_batch_analysis_status():
+
+    return {
+        "running": is_job_running(),
+        "checkpoint": load_checkpoint()
+    }
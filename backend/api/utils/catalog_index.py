@@ -0,0 +1,416 @@
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+
+from config.settings import CATALOG_DB_FILE
+
+logger = logging.getLogger(__name__)
+
+# Facet columns and the user_metadata keys they are read from, first non-empty wins
+FACET_SOURCES = {
+    "shot": ("analysis_shot",),
+    "species": (
+        "analysis_subject_specific_identification",
+        "analysis_subject_speciescategory",
+        "analysis_subject_species",
+        "analysis_subject_identification"
+    ),
+    "subject_type": ("analysis_subject_type",),
+    "classification": ("analysis_subject_classification",),
+    "location": ("analysis_environment_location",),
+    "time_of_day": ("analysis_environment_time",),
+    "position": ("analysis_environment_position",),
+    "weather": ("analysis_environment_weather", "analysis_environment_weatherconditions"),
+    "climate": ("analysis_environment_climate",),
+}
+
+# Free-text columns indexed for keyword search
+TEXT_SOURCES = {
+    "summary": "analysis_summary",
+    "action": "analysis_action",
+    "subject": "analysis_subject",
+    "environment": "analysis_environment",
+    "narrative": "analysis_narrativeflow",
+    "details": "analysis_additionaldetails",
+}
+
+FACETS = tuple(FACET_SOURCES)
+TEXT_COLUMNS = tuple(TEXT_SOURCES)
+
+_lock = threading.RLock()
+_connection = None
+_fts_enabled = True
+_backfill_thread = None
+_backfill_status = {"running": False, "indexed": 0, "pages": 0, "error": None, "finished_at": None}
+
+
+def _get_connection():
+
+    global _connection, _fts_enabled
+
+    if _connection is None:
+        directory = os.path.dirname(CATALOG_DB_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(CATALOG_DB_FILE, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        columns = ", ".join(f"{name} TEXT" for name in FACETS + TEXT_COLUMNS)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS catalog (video_id TEXT PRIMARY KEY, filename TEXT, {columns}, updated_at INTEGER)"
+        )
+        for facet in FACETS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_catalog_{facet} ON catalog({facet} COLLATE NOCASE)")
+
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5("
+                f"video_id UNINDEXED, filename, {', '.join(FACETS + TEXT_COLUMNS)}, "
+                "tokenize='porter unicode61')"
+            )
+        except sqlite3.OperationalError as e:
+            _fts_enabled = False
+            logger.warning(f"SQLite FTS5 not available, catalog search falls back to LIKE: {str(e)}")
+
+        # Facet value counts, kept in step with the catalog on every write
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS facet_counts ("
+            "facet TEXT NOT NULL, value TEXT NOT NULL COLLATE NOCASE, count INTEGER NOT NULL, "
+            "PRIMARY KEY (facet, value))"
+        )
+
+        conn.commit()
+        _connection = conn
+
+        # Catalogs created before facet counts existed are counted once
+        has_counts = conn.execute("SELECT 1 FROM facet_counts LIMIT 1").fetchone()
+        if not has_counts and conn.execute("SELECT 1 FROM catalog LIMIT 1").fetchone():
+            rebuild_facet_counts()
+
+    return _connection
+
+
+def _first_value(user_metadata, keys):
+
+    for key in keys:
+        value = user_metadata.get(key)
+        if value:
+            return str(value)
+    return None
+
+
+def build_catalog_row(video_id, user_metadata):
+
+    row = {"video_id": video_id, "filename": user_metadata.get("filename")}
+    for facet, keys in FACET_SOURCES.items():
+        row[facet] = _first_value(user_metadata, keys)
+    for column, key in TEXT_SOURCES.items():
+        value = user_metadata.get(key)
+        row[column] = str(value) if value else None
+    return row
+
+
+# Add or refresh a video from its user_metadata. Videos without a completed analysis are removed.
+def index_video_metadata(video_id, user_metadata):
+
+    if not user_metadata or not user_metadata.get("analysis_complete"):
+        remove_video(video_id)
+        return False
+
+    row = build_catalog_row(video_id, user_metadata)
+    columns = ("video_id", "filename") + FACETS + TEXT_COLUMNS
+
+    with _lock:
+        conn = _get_connection()
+        with _write_transaction(conn):
+            _adjust_facet_counts(conn, video_id, row)
+            conn.execute(
+                f"INSERT OR REPLACE INTO catalog ({', '.join(columns)}, updated_at) "
+                f"VALUES ({', '.join('?' for _ in columns)}, ?)",
+                [row[c] for c in columns] + [int(time.time())]
+            )
+            if _fts_enabled:
+                conn.execute("DELETE FROM catalog_fts WHERE video_id = ?", (video_id,))
+                conn.execute(
+                    f"INSERT INTO catalog_fts ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    [row[c] for c in columns]
+                )
+
+    return True
+
+
+def remove_video(video_id):
+
+    with _lock:
+        conn = _get_connection()
+        with _write_transaction(conn):
+            _adjust_facet_counts(conn, video_id, None)
+            conn.execute("DELETE FROM catalog WHERE video_id = ?", (video_id,))
+            if _fts_enabled:
+                conn.execute("DELETE FROM catalog_fts WHERE video_id = ?", (video_id,))
+
+
+# Take the database write lock before reading the old row, so another process
+# indexing the same video cannot adjust the facet counts from the same old row
+@contextmanager
+def _write_transaction(conn):
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# Move the facet counts from the video's current row (if any) to its new row
+# (None when the video is removed). Runs inside the caller's write transaction.
+def _adjust_facet_counts(conn, video_id, new_row):
+
+    old_row = conn.execute(
+        f"SELECT {', '.join(FACETS)} FROM catalog WHERE video_id = ?", (video_id,)
+    ).fetchone()
+
+    for facet in FACETS:
+        old_value = old_row[facet] if old_row else None
+        new_value = new_row[facet] if new_row else None
+        if old_value == new_value:
+            continue
+        if old_value:
+            conn.execute(
+                "UPDATE facet_counts SET count = count - 1 WHERE facet = ? AND value = ?", (facet, old_value)
+            )
+            conn.execute("DELETE FROM facet_counts WHERE facet = ? AND value = ? AND count <= 0", (facet, old_value))
+        if new_value:
+            conn.execute(
+                "INSERT INTO facet_counts (facet, value, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (facet, value) DO UPDATE SET count = count + 1",
+                (facet, new_value)
+            )
+
+
+# Recount every facet from the catalog, used after a bulk sync
+def rebuild_facet_counts():
+
+    with _lock:
+        conn = _get_connection()
+        conn.execute("DELETE FROM facet_counts")
+        for facet in FACETS:
+            conn.execute(
+                f"INSERT INTO facet_counts (facet, value, count) "
+                f"SELECT ?, {facet}, COUNT(*) FROM catalog WHERE {facet} IS NOT NULL AND {facet} != '' "
+                f"GROUP BY {facet} COLLATE NOCASE",
+                (facet,)
+            )
+        conn.commit()
+
+
+def _facet_filter_clause(filters, exclude=None):
+
+    where = []
+    params = []
+    for facet, value in filters.items():
+        if facet == exclude:
+            continue
+        where.append(f"{facet} LIKE ?")
+        params.append(f"%{value}%")
+    return where, params
+
+
+# Value counts per facet. Without filters they come straight from the
+# maintained counts table; with filters each facet is counted over the videos
+# matching the selections on the *other* facets, so the UI can show how many
+# results each alternative value would give.
+def get_facet_counts(filters=None, facets=None, limit=None):
+
+    filters = {k: v for k, v in (filters or {}).items() if k in FACETS and v}
+    facets = [f for f in (facets or FACETS) if f in FACETS]
+    counts = {}
+
+    with _lock:
+        conn = _get_connection()
+
+        if not filters:
+            total = conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+            for facet in facets:
+                sql = "SELECT value, count FROM facet_counts WHERE facet = ? ORDER BY count DESC, value"
+                params = [facet]
+                if limit:
+                    sql += " LIMIT ?"
+                    params.append(limit)
+                counts[facet] = {row["value"]: row["count"] for row in conn.execute(sql, params)}
+            return {"total": total, "facets": counts}
+
+        where, params = _facet_filter_clause(filters)
+        total = conn.execute(f"SELECT COUNT(*) FROM catalog WHERE {' AND '.join(where)}", params).fetchone()[0]
+
+        for facet in facets:
+            where, params = _facet_filter_clause(filters, exclude=facet)
+            where.append(f"{facet} IS NOT NULL AND {facet} != ''")
+            sql = (
+                f"SELECT {facet} AS value, COUNT(*) AS count FROM catalog WHERE {' AND '.join(where)} "
+                f"GROUP BY {facet} COLLATE NOCASE ORDER BY count DESC, value"
+            )
+            if limit:
+                sql += " LIMIT ?"
+                params.append(limit)
+            counts[facet] = {row["value"]: row["count"] for row in conn.execute(sql, params)}
+
+    return {"total": total, "facets": counts}
+
+
+# Quote each word so user input cannot inject FTS5 query syntax; words are ANDed, last one as a prefix
+def _fts_query(query):
+
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+# Keyword search plus facet filters. Facet filters match case-insensitively on
+# a substring, so species=monkey finds "Capuchin Monkey".
+def search_catalog(query=None, filters=None, limit=20, offset=0):
+
+    filters = {k: v for k, v in (filters or {}).items() if k in FACETS and v}
+    where = []
+    params = []
+
+    for facet, value in filters.items():
+        where.append(f"c.{facet} LIKE ?")
+        params.append(f"%{value}%")
+
+    fts_query = _fts_query(query) if query else None
+
+    with _lock:
+        conn = _get_connection()
+
+        if fts_query and _fts_enabled:
+            sql = (
+                "SELECT c.*, bm25(catalog_fts) AS rank, "
+                "snippet(catalog_fts, -1, '[', ']', '...', 12) AS snippet "
+                "FROM catalog_fts JOIN catalog c ON c.video_id = catalog_fts.video_id "
+                "WHERE catalog_fts MATCH ?"
+            )
+            params.insert(0, fts_query)
+            if where:
+                sql += " AND " + " AND ".join(where)
+            order = " ORDER BY rank"
+        else:
+            sql = "SELECT c.*, NULL AS rank, NULL AS snippet FROM catalog c"
+            if query:
+                words = re.findall(r"\w+", query)
+                for word in words:
+                    where.append("(" + " OR ".join(f"c.{col} LIKE ?" for col in ("filename",) + FACETS + TEXT_COLUMNS) + ")")
+                    params.extend([f"%{word}%"] * (1 + len(FACETS) + len(TEXT_COLUMNS)))
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            order = " ORDER BY c.updated_at DESC"
+
+        count_sql = f"SELECT COUNT(*) FROM ({sql})"
+        total = conn.execute(count_sql, params).fetchone()[0]
+        rows = conn.execute(sql + order + " LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+
+    results = []
+    for row in rows:
+        results.append({
+            "video_id": row["video_id"],
+            "filename": row["filename"],
+            "video_url": f"/api/video/{row['filename']}" if row["filename"] else None,
+            "summary": row["summary"],
+            "action": row["action"],
+            "facets": {facet: row[facet] for facet in FACETS},
+            "score": -row["rank"] if row["rank"] is not None else None,
+            "snippet": row["snippet"]
+        })
+
+    return {"total": total, "results": results}
+
+
+def iter_catalog_rows():
+
+    with _lock:
+        conn = _get_connection()
+        rows = conn.execute("SELECT * FROM catalog ORDER BY video_id").fetchall()
+    for row in rows:
+        yield dict(row)
+
+
+def get_catalog_stats():
+
+    with _lock:
+        conn = _get_connection()
+        total = conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+        last_update = conn.execute("SELECT MAX(updated_at) FROM catalog").fetchone()[0]
+
+    return {"videos": total, "fts_enabled": _fts_enabled, "last_update": last_update, "backfill": dict(_backfill_status)}
+
+
+# Rebuild the catalog from the user_metadata of every video in the index
+def backfill_catalog(page_size=50):
+
+    from api.utils.twelvelabs_api import list_videos
+
+    _backfill_status.update({"running": True, "indexed": 0, "pages": 0, "error": None, "finished_at": None})
+    try:
+        page = 1
+        seen = set()
+        while True:
+            videos_response = list_videos(page=page, page_limit=page_size)
+            if not videos_response or 'data' not in videos_response:
+                raise RuntimeError(f"Failed to retrieve videos for page {page}")
+
+            for video in videos_response['data']:
+                seen.add(video['_id'])
+                if index_video_metadata(video['_id'], video.get('user_metadata') or {}):
+                    _backfill_status["indexed"] += 1
+
+            _backfill_status["pages"] = page
+            total_pages = videos_response.get('page_info', {}).get('total_page', page)
+            if page >= total_pages:
+                break
+            page += 1
+
+        # A complete sync also drops videos that are no longer in the index
+        with _lock:
+            conn = _get_connection()
+            stale = [row[0] for row in conn.execute("SELECT video_id FROM catalog") if row[0] not in seen]
+        for video_id in stale:
+            remove_video(video_id)
+
+        rebuild_facet_counts()
+        logger.info(f"Catalog backfill indexed {_backfill_status['indexed']} videos from {page} pages")
+    except Exception as e:
+        logger.error(f"Catalog backfill failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        _backfill_status["error"] = str(e)
+    finally:
+        _backfill_status["running"] = False
+        _backfill_status["finished_at"] = int(time.time())
+
+    return dict(_backfill_status)
+
+
+def start_catalog_backfill(page_size=50):
+
+    global _backfill_thread
+
+    with _lock:
+        if _backfill_thread is not None and _backfill_thread.is_alive():
+            return False
+        _backfill_thread = threading.Thread(
+            target=backfill_catalog, kwargs={"page_size": page_size}, name="catalog-backfill", daemon=True
+        )
+        _backfill_thread.start()
+        return True
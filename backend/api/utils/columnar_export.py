@@ -0,0 +1,268 @@
+import os
+import io
+import csv
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+from config.settings import (
+    EXPORT_DIR,
+    EMBEDDING_STATUS_FILE,
+    DETAILED_ANALYSIS_RESULTS_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    logger.warning("pyarrow not installed, columnar export will not be available")
+
+FORMATS = {
+    "parquet": {"extension": "parquet", "mimetype": "application/vnd.apache.parquet"},
+    "arrow": {"extension": "arrow", "mimetype": "application/vnd.apache.arrow.file"}
+}
+
+STATE_FILE = os.path.join(EXPORT_DIR, "state.json")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_lock = threading.Lock()
+
+
+def is_export_available():
+
+    return pa is not None
+
+
+def _parse_timestamp(value):
+
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+# Undo the "Key: value | Key: value" flattening of save_detailed_analysis_result
+def _parse_flattened(value):
+
+    if not value:
+        return []
+    pairs = []
+    for part in value.split(" | "):
+        key, sep, item = part.partition(": ")
+        if sep:
+            pairs.append((key, item))
+        else:
+            pairs.append(("Description", part))
+    return pairs
+
+
+def _analysis_schema():
+
+    return pa.schema([
+        ("timestamp", pa.timestamp("s")),
+        ("video_id", pa.string()),
+        ("filename", pa.string()),
+        ("status", pa.string()),
+        ("shot", pa.string()),
+        ("subject", pa.map_(pa.string(), pa.string())),
+        ("action", pa.string()),
+        ("environment", pa.map_(pa.string(), pa.string())),
+        ("narrative_flow", pa.string()),
+        ("additional_details", pa.string()),
+        ("summary", pa.string()),
+        ("error", pa.string())
+    ])
+
+
+def _embedding_status_schema():
+
+    return pa.schema([
+        ("timestamp", pa.timestamp("s")),
+        ("video_id", pa.string()),
+        ("status", pa.string()),
+        ("task_id", pa.string()),
+        ("error", pa.string())
+    ])
+
+
+def _analysis_row(row):
+
+    return {
+        "timestamp": _parse_timestamp(row.get("timestamp")),
+        "video_id": row.get("video_id"),
+        "filename": row.get("filename"),
+        "status": row.get("status"),
+        "shot": row.get("shot") or None,
+        "subject": _parse_flattened(row.get("subject")),
+        "action": row.get("action") or None,
+        "environment": _parse_flattened(row.get("environment")),
+        "narrative_flow": row.get("narrative_flow") or None,
+        "additional_details": row.get("additional_details") or None,
+        "summary": row.get("summary") or None,
+        "error": row.get("error") or None
+    }
+
+
+def _embedding_status_row(row):
+
+    return {
+        "timestamp": _parse_timestamp(row.get("timestamp")),
+        "video_id": row.get("video_id"),
+        "status": row.get("status"),
+        "task_id": row.get("task_id") or None,
+        "error": row.get("error") or None
+    }
+
+
+DATASETS = {
+    "analysis": {"source": DETAILED_ANALYSIS_RESULTS_FILE, "schema": _analysis_schema, "row": _analysis_row},
+    "embedding-status": {"source": EMBEDDING_STATUS_FILE, "schema": _embedding_status_schema, "row": _embedding_status_row}
+}
+
+
+def _load_state():
+
+    if os.path.isfile(STATE_FILE):
+        try:
+            with open(STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not read export state, exporting from scratch: {str(e)}")
+    return {}
+
+
+def _save_state(state):
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp_path = f"{STATE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def _dataset_dir(dataset):
+
+    return os.path.join(EXPORT_DIR, dataset)
+
+
+# Rows appended to the source CSV since the last export. The CSVs are append
+# only, so the byte offset reached last time is the watermark; a file that
+# shrank has been replaced and is read from the start.
+def _read_new_rows(source, dataset_state):
+
+    with open(source, "r", newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), None)
+        if not header:
+            return [], dataset_state.get("offset", 0)
+        header_end = len(",".join(header).encode("utf-8")) + 2
+
+        offset = dataset_state.get("offset", 0)
+        size = os.path.getsize(source)
+        if offset < header_end or offset > size:
+            offset = header_end
+
+    with open(source, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames=header))
+    return rows, offset + len(data)
+
+
+# Export new rows of a dataset as one more part file; returns the part info or None if nothing changed
+def export_dataset(dataset, export_format="parquet"):
+
+    if not is_export_available():
+        raise RuntimeError("pyarrow is not installed")
+
+    spec = DATASETS[dataset]
+    if not os.path.isfile(spec["source"]):
+        return None
+
+    with _lock:
+        state = _load_state()
+        dataset_state = state.get(dataset, {})
+
+        rows, new_offset = _read_new_rows(spec["source"], dataset_state)
+        if not rows:
+            return None
+
+        table = pa.Table.from_pylist([spec["row"](row) for row in rows], schema=spec["schema"]())
+
+        timestamps = [row["timestamp"] for row in table.select(["timestamp"]).to_pylist() if row["timestamp"]]
+        part_name = f"part-{int(time.time() * 1000)}.{FORMATS[export_format]['extension']}"
+        part_dir = _dataset_dir(dataset)
+        os.makedirs(part_dir, exist_ok=True)
+        part_path = os.path.join(part_dir, part_name)
+
+        _write_table(table, part_path, export_format)
+
+        part = {
+            "file": part_name,
+            "format": export_format,
+            "rows": table.num_rows,
+            "min_timestamp": min(timestamps).strftime(TIMESTAMP_FORMAT) if timestamps else None,
+            "max_timestamp": max(timestamps).strftime(TIMESTAMP_FORMAT) if timestamps else None
+        }
+        dataset_state["offset"] = new_offset
+        dataset_state.setdefault("parts", []).append(part)
+        state[dataset] = dataset_state
+        _save_state(state)
+
+    logger.info(f"Exported {part['rows']} new {dataset} rows to {part_name}")
+    return part
+
+
+def _write_table(table, path, export_format):
+
+    tmp_path = f"{path}.tmp"
+    if export_format == "arrow":
+        feather.write_feather(table, tmp_path, compression="zstd")
+    else:
+        pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def _read_part(path):
+
+    if path.endswith(".arrow"):
+        return feather.read_table(path)
+    return pq.read_table(path)
+
+
+# Combine the exported parts (optionally only rows after `since`) into one file for download
+def build_export_file(dataset, export_format="parquet", since=None):
+
+    part_info = export_dataset(dataset, export_format)
+    logger.debug(f"Incremental export before download: {part_info}")
+
+    with _lock:
+        parts = _load_state().get(dataset, {}).get("parts", [])
+    since_value = _parse_timestamp(since) if since else None
+    if since and since_value is None:
+        raise ValueError(f"Invalid 'since' timestamp, expected {TIMESTAMP_FORMAT}")
+
+    # Parts entirely older than `since` are skipped without being read
+    selected = [
+        part for part in parts
+        if since_value is None or (part["max_timestamp"] and _parse_timestamp(part["max_timestamp"]) > since_value)
+    ]
+    if not selected:
+        return None
+
+    tables = [_read_part(os.path.join(_dataset_dir(dataset), part["file"])) for part in selected]
+    table = pa.concat_tables(tables)
+    if since_value is not None:
+        import pyarrow.compute as pc
+        table = table.filter(pc.greater(table["timestamp"], pa.scalar(since_value, type=pa.timestamp("s"))))
+
+    suffix = f"-since-{since_value.strftime('%Y%m%d%H%M%S')}" if since_value else ""
+    path = os.path.join(EXPORT_DIR, f"{dataset}{suffix}.{FORMATS[export_format]['extension']}")
+    _write_table(table, path, export_format)
+    return path
@@ -1,15 +1,18 @@
 import os
 import csv
-import io
 import json
 import logging
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
 from config.settings import (
     EMBEDDING_STATUS_FILE,
     ANALYSIS_RESULTS_FILE,
-    DETAILED_ANALYSIS_RESULTS_FILE
+    DETAILED_ANALYSIS_RESULTS_FILE,
+    REPORTS_DIR
 )
+from api.utils.report_registry import register_report
 
 logger = logging.getLogger(__name__)
 
@@ -180,65 +183,108 @@ def save_detailed_analysis_result(video_id, filename, status, analysis_data=None
         
         writer.writerow(row_data)
 
-def generate_structured_csv_report(results):
+REPORT_HEADER = [
+    'Video ID', 'Filename', 'Analysis Timestamp', 
+    'Shot', 'Subject', 'Action', 'Environment', 
+    'Status', 'Raw Analysis'
+]
 
-    csv_data = io.StringIO()
-    csv_writer = csv.writer(csv_data)
+def build_report_row(result):
+
+    video_id = result.get('video_id', 'N/A')
+    status = 'Success' if result.get('success', False) else 'Failed'
     
-    csv_writer.writerow([
-        'Video ID', 'Filename', 'Analysis Timestamp', 
-        'Shot', 'Subject', 'Action', 'Environment', 
-        'Status', 'Raw Analysis'
-    ])
+    video_info = result.get('video_info') or {}
+    filename = video_info.get('user_metadata', {}).get('filename', 'N/A')
     
-    for result in results:
-        video_id = result.get('video_id', 'N/A')
-        status = 'Success' if result.get('success', False) else 'Failed'
-        
-        video_info = result.get('video_info', {})
-        filename = video_info.get('user_metadata', {}).get('filename', 'N/A')
-        
-        raw_analysis = result.get('analysis', {}).get('data', 'No analysis data')
-        timestamp = result.get('timestamp', time.time())
-        
-        structured_data = result.get('analysis', {}).get('structured_data', {})
+    raw_analysis = result.get('analysis', {}).get('data', 'No analysis data')
+    timestamp = result.get('timestamp', time.time())
+    
+    structured_data = result.get('analysis', {}).get('structured_data', {})
+    
+    shot = structured_data.get('Shot', '')
+    
+    if 'condensed_format' in structured_data:
+        subject = structured_data.get('condensed_format', {}).get('Subject', '')
+        action = structured_data.get('condensed_format', {}).get('Action', '')
+        environment = structured_data.get('condensed_format', {}).get('Environment', '')
+    else:
+        subject_data = structured_data.get('Subject', {})
+        subject = ''.join([
+            subject_data.get('Type', ''),
+            subject_data.get('Classification', ''),
+            subject_data.get('Species', ''),
+            subject_data.get('Count', ''),
+            subject_data.get('Identification', ''),
+            subject_data.get('Color', '')
+        ])
         
-        shot = structured_data.get('Shot', '')
+        action = structured_data.get('Action', '')
         
-        if 'condensed_format' in structured_data:
-            subject = structured_data.get('condensed_format', {}).get('Subject', '')
-            action = structured_data.get('condensed_format', {}).get('Action', '')
-            environment = structured_data.get('condensed_format', {}).get('Environment', '')
-        else:
-            subject_data = structured_data.get('Subject', {})
-            subject = ''.join([
-                subject_data.get('Type', ''),
-                subject_data.get('Classification', ''),
-                subject_data.get('Species', ''),
-                subject_data.get('Count', ''),
-                subject_data.get('Identification', ''),
-                subject_data.get('Color', '')
-            ])
-            
-            action = structured_data.get('Action', '')
-            
-            env_data = structured_data.get('Environment', {})
-            environment = ''.join([
-                env_data.get('Time', ''),
-                env_data.get('Location', ''),
-                env_data.get('Weather', ''),
-                env_data.get('Position', ''),
-                env_data.get('Climate', '')
-            ])
-        
-        csv_writer.writerow([
-            video_id, filename, timestamp,
-            shot, subject, action, environment,
-            status, raw_analysis
+        env_data = structured_data.get('Environment', {})
+        environment = ''.join([
+            env_data.get('Time', ''),
+            env_data.get('Location', ''),
+            env_data.get('Weather', ''),
+            env_data.get('Position', ''),
+            env_data.get('Climate', '')
         ])
     
-    csv_data.seek(0)
-    return csv_data
+    return [
+        video_id, filename, timestamp,
+        shot, subject, action, environment,
+        status, raw_analysis
+    ]
+
+# Write the "all" and "successful" reports row by row into temp files, renamed
+# into place only once the batch is complete. Yields a function that takes one result.
+@contextmanager
+def structured_report_writer(timestamp=None, directory=REPORTS_DIR):
+
+    timestamp = timestamp or int(time.time())
+    paths = {
+        "all": os.path.join(directory, f"all_analyses_{timestamp}.csv"),
+        "successful": os.path.join(directory, f"successful_analyses_{timestamp}.csv")
+    }
+    counts = {"all": 0, "successful": 0}
+    files = {}
+    writers = {}
+    
+    os.makedirs(directory, exist_ok=True)
+    for report_type, path in paths.items():
+        files[report_type] = open(f"{path}.tmp", "w", newline="", encoding="utf-8")
+        writers[report_type] = csv.writer(files[report_type])
+        writers[report_type].writerow(REPORT_HEADER)
+    
+    def write(result):
+        row = build_report_row(result)
+        writers["all"].writerow(row)
+        counts["all"] += 1
+        if result.get("success", False):
+            writers["successful"].writerow(row)
+            counts["successful"] += 1
+    
+    completed = False
+    try:
+        yield write
+        completed = True
+    finally:
+        for report_type, path in paths.items():
+            files[report_type].close()
+            # The successful report is only kept when it has rows
+            if completed and (report_type == "all" or counts["successful"]):
+                os.replace(f"{path}.tmp", path)
+                register_report(report_type, path, timestamp, counts[report_type])
+            else:
+                os.remove(f"{path}.tmp")
+        if completed:
+            logger.info(f"Wrote analysis reports: {counts['all']} rows, {counts['successful']} successful")
+
+def write_structured_csv_reports(results, timestamp=None, directory=REPORTS_DIR):
+
+    with structured_report_writer(timestamp, directory) as write:
+        for result in results:
+            write(result)
 
 def normalize_metadata_key(key):
 
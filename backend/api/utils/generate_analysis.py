@@ -1,8 +1,6 @@
 import json
 import logging
 import traceback
-import boto3
-from twelvelabs import TwelveLabs
 import time
 
 
@@ -14,22 +12,46 @@ from config.settings import (
     LAMBDA_FUNCTION_NAME
 )
 
-from api.utils.twelvelabs_api import normalize_structured_data, parse_unstructured_response
+from api.utils.analysis_parser import normalize_structured_data, parse_unstructured_response
+from api.utils.analysis_cache import get_cached_analysis, save_cached_analysis
+from api.utils.metrics import track_upstream
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_VERSION = '1.0'
+
+lambda_client = None
+_lambda_client_checked = False
+
+# Lambda client, created (and boto3 imported) on first use if credentials are available
+def get_lambda_client():
+
+    global lambda_client, _lambda_client_checked
+
+    if _lambda_client_checked:
+        return lambda_client
+    _lambda_client_checked = True
+
+    if all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION]):
+        import boto3
+        lambda_client = boto3.client(
+            'lambda', 
+            region_name=AWS_REGION,
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY
+        )
+    else:
+        lambda_client = None
+        logger.warning("AWS credentials not set, Lambda client will not be available")
+    return lambda_client
+
+# Drop a client inherited from the parent process after a fork; the next use creates a new one
+def reset_lambda_client():
+
+    global lambda_client, _lambda_client_checked
 
-# Initialize Lambda client if credentials are available
-if all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION]):
-    lambda_client = boto3.client(
-        'lambda', 
-        region_name=AWS_REGION,
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY
-    )
-else:
     lambda_client = None
-    logger.warning("AWS credentials not set, Lambda client will not be available")
+    _lambda_client_checked = False
 
 
 def load_prompt(path="config/prompt.txt"):
@@ -40,15 +62,32 @@ def load_prompt(path="config/prompt.txt"):
         return None
     
 
-def analyze_video(video_id, prompt=None, use_lambda=True):
+def analyze_video(video_id, prompt=None, use_lambda=True, force=False):
 
     try:
         logger.info(f"Analyzing video {video_id}")
         
-        if use_lambda and lambda_client:
-            return analyze_video_with_lambda(video_id, prompt)
+        # The cache is keyed by the prompt actually sent to Pegasus; it is sent
+        # to Lambda explicitly too, rather than leaving Lambda to pick its own
+        effective_prompt = prompt or load_prompt()
+        
+        if not force:
+            cached = get_cached_analysis(video_id, effective_prompt)
+            if cached:
+                return {
+                    'statusCode': 200,
+                    'data': cached.get('data'),
+                    'structured_data': cached.get('structured_data'),
+                    'cached': True
+                }
         
-        return analyze_video_directly(video_id, prompt)
+        if use_lambda and get_lambda_client():
+            result = analyze_video_with_lambda(video_id, effective_prompt)
+        else:
+            result = analyze_video_directly(video_id, effective_prompt)
+        
+        save_cached_analysis(video_id, effective_prompt, result)
+        return result
         
     except Exception as e:
         error_msg = f"Error analyzing video: {str(e)}"
@@ -73,13 +112,20 @@ def analyze_video_with_lambda(video_id, prompt=None):
         if prompt:
             payload["prompt"] = prompt
         
-        response = lambda_client.invoke(
-            FunctionName=LAMBDA_FUNCTION_NAME,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(payload)
-        )
+        with track_upstream("lambda", "analyze_video") as call:
+            request_body = json.dumps(payload)
+            call.bytes_sent = len(request_body)
+            response = get_lambda_client().invoke(
+                FunctionName=LAMBDA_FUNCTION_NAME,
+                InvocationType='RequestResponse',
+                Payload=request_body
+            )
+            response_body = response['Payload'].read()
+            call.bytes_received = len(response_body)
+            # Errors raised inside the function come back in a normal 200 response
+            call.failed = 'FunctionError' in response
         
-        result = json.loads(response['Payload'].read().decode('utf-8'))
+        result = json.loads(response_body.decode('utf-8'))
         
         if 'error' in result:
             logger.error(f"Lambda function error: {result['error']}")
@@ -99,17 +145,19 @@ def analyze_video_with_lambda(video_id, prompt=None):
 def analyze_video_directly(video_id, prompt=None):
     try:
         logger.info(f"Analyzing video {video_id} directly with Pegasus model")
-        prompt = load_prompt()
+        prompt = prompt or load_prompt()
         if not prompt:
             raise ValueError("Prompt is not provided or not loaded")
         
+        from twelvelabs import TwelveLabs
         client = TwelveLabs(api_key=API_KEY)
         
         logger.info(f"Sending generation request for video {video_id}")
-        response = client.generate.text(
-            video_id=video_id,
-            prompt=prompt
-        )
+        with track_upstream("twelvelabs", "generate_text"):
+            response = client.generate.text(
+                video_id=video_id,
+                prompt=prompt
+            )
         
         raw_analysis = response.data
         logger.info(f"Received response with length: {len(raw_analysis) if raw_analysis else 0}")
@@ -140,111 +188,155 @@ def analyze_video_directly(video_id, prompt=None):
             'details': traceback.format_exc()
         }
 
-def process_analysis_result(video_id, result, update_metadata=True):
+# Build the analysis_* metadata fields for a structured Pegasus result
+def build_analysis_metadata(structured_data):
+
+    from api.utils.csv_utils import normalize_metadata_key
+    
+    new_metadata = {
+        'analysis_complete': True,
+        'analysis_timestamp': int(time.time()),
+        'analysis_version': ANALYSIS_VERSION
+    }
+    
+    # Shot field
+    if 'Shot' in structured_data:
+        new_metadata['analysis_shot'] = structured_data['Shot']
+    
+    # Add Action field
+    if 'Action' in structured_data:
+        new_metadata['analysis_action'] = structured_data['Action']
+    
+    # Handle Subject 
+    if 'Subject' in structured_data:
+        subject = structured_data['Subject']
+        if isinstance(subject, dict):
+            new_metadata['analysis_subject'] = json.dumps(subject)
+            
+            for key, value in subject.items():
+                if value:  
+                    meta_key = f"analysis_subject_{normalize_metadata_key(key)}"
+                    new_metadata[meta_key] = value
+        else:
+            new_metadata['analysis_subject'] = json.dumps({"Identification": subject})
+            new_metadata['analysis_subject_identification'] = subject
+    
+    # Handle Environment 
+    if 'Environment' in structured_data:
+        environment = structured_data['Environment']
+        if isinstance(environment, dict):
+            new_metadata['analysis_environment'] = json.dumps(environment)
+            
+            for key, value in environment.items():
+                if value:  
+                    meta_key = f"analysis_environment_{normalize_metadata_key(key)}"
+                    new_metadata[meta_key] = value
+        else:
+            new_metadata['analysis_environment'] = json.dumps({"Description": environment})
+            new_metadata['analysis_environment_description'] = environment
+    
+    # Narrative Flow
+    if 'Narrative Flow' in structured_data:
+        value = structured_data['Narrative Flow']
+        if isinstance(value, str) and len(value) > 1000:
+            value = value[:1000] + "..."
+        new_metadata['analysis_narrativeflow'] = value
+    
+    # Additional Details field
+    if 'Additional Details' in structured_data:
+        value = structured_data['Additional Details']
+        if isinstance(value, str) and len(value) > 1000:
+            value = value[:1000] + "..."
+        new_metadata['analysis_additionaldetails'] = value
+    
+    # Summary field
+    summary = []
+    if structured_data.get('Shot'):
+        summary.append(f"Shot: {structured_data['Shot']}")
+    if structured_data.get('Action'):
+        summary.append(f"Action: {structured_data['Action']}")
+    
+    if isinstance(structured_data.get('Subject'), dict):
+
+        for id_key in ['Identification', 'Specific identification', 'Species/Category', 'Type']:
+            if id_key in structured_data['Subject'] and structured_data['Subject'][id_key]:
+                summary.append(f"Subject: {structured_data['Subject'][id_key]}")
+                break
+    elif structured_data.get('Subject'):
+        summary.append(f"Subject: {structured_data['Subject']}")
+    
+    new_metadata['analysis_summary'] = " | ".join(summary)
+    
+    return new_metadata
+
+# Only the fields whose value differs from the current metadata
+def diff_metadata(current_metadata, new_metadata):
+
+    return {key: value for key, value in new_metadata.items() if current_metadata.get(key) != value}
+
+# Write the changed analysis fields in a single partial update. The metadata
+# PUT merges keys, so unrelated fields such as similar_videos_str are left alone.
+def _apply_analysis_metadata(video_id, new_metadata, video_info=None):
+
+    from api.utils.twelvelabs_api import update_video_metadata, get_video_metadata
+    
+    if video_info is not None:
+        current_metadata = video_info.get("user_metadata") or {}
+    else:
+        current_metadata = get_video_metadata(video_id)
+    
+    changes = diff_metadata(current_metadata, new_metadata)
+    merged_metadata = {**current_metadata, **changes}
+    
+    if not changes:
+        return True, merged_metadata
+    
+    logger.info(f"Updating {len(changes)} analysis metadata fields for video {video_id}")
+    success, result = update_video_metadata(video_id, changes)
+    if success:
+        _update_search_indexes(video_id, merged_metadata)
+        return True, merged_metadata
+    return False, result
+
+# Keep the local catalog and the Weaviate analysis properties in step with
+# the metadata; neither ever fails an analysis
+def _update_search_indexes(video_id, user_metadata):
+
+    try:
+        from api.utils.catalog_index import index_video_metadata
+        index_video_metadata(video_id, user_metadata)
+    except Exception as e:
+        logger.warning(f"Failed to update catalog for video {video_id}: {str(e)}")
+
+    try:
+        from api.utils.suggest_index import add_analysis_terms
+        add_analysis_terms(user_metadata)
+    except Exception as e:
+        logger.warning(f"Failed to update suggestions for video {video_id}: {str(e)}")
+
+    try:
+        from api.utils.weaviate_api import update_analysis_properties
+        update_analysis_properties(video_id, user_metadata)
+    except Exception as e:
+        logger.warning(f"Failed to update Weaviate analysis properties for video {video_id}: {str(e)}")
+
+def process_analysis_result(video_id, result, update_metadata=True, video_info=None):
 
     try:
         if result.get('statusCode') == 200 and 'structured_data' in result:
             structured_data = result['structured_data']
             
             if update_metadata:
-                from api.utils.twelvelabs_api import update_video_metadata, get_video_metadata
-                
-                # Get current metadata
-                current_metadata = get_video_metadata(video_id)
-                
-                # Create new metadata
-                new_metadata = current_metadata.copy()
-                
-                # Main analysis fields
-                new_metadata.update({
-                    'analysis_complete': True,
-                    'analysis_timestamp': int(time.time()),
-                    'analysis_version': '1.0'
-                })
-                
-                # Shot field
-                if 'Shot' in structured_data:
-                    new_metadata['analysis_shot'] = structured_data['Shot']
-                
-                # Add Action field
-                if 'Action' in structured_data:
-                    new_metadata['analysis_action'] = structured_data['Action']
-                
-                # Handle Subject 
-                if 'Subject' in structured_data:
-                    subject = structured_data['Subject']
-                    if isinstance(subject, dict):
-                
-                        subject_json = json.dumps(subject)
-                        new_metadata['analysis_subject'] = subject_json
-                        
-                        for key, value in subject.items():
-                            if value:  
-                                from api.utils.csv_utils import normalize_metadata_key
-                                meta_key = f"analysis_subject_{normalize_metadata_key(key)}"
-                                new_metadata[meta_key] = value
-                    else:
- 
-                        new_metadata['analysis_subject'] = json.dumps({"Identification": subject})
-                        new_metadata['analysis_subject_identification'] = subject
-                
-                # Handle Environment 
-                if 'Environment' in structured_data:
-                    environment = structured_data['Environment']
-                    if isinstance(environment, dict):
-
-                        env_json = json.dumps(environment)
-                        new_metadata['analysis_environment'] = env_json
-                        
-                        for key, value in environment.items():
-                            if value:  
-                                from api.utils.csv_utils import normalize_metadata_key
-                                meta_key = f"analysis_environment_{normalize_metadata_key(key)}"
-                                new_metadata[meta_key] = value
-                    else:
-                        new_metadata['analysis_environment'] = json.dumps({"Description": environment})
-                        new_metadata['analysis_environment_description'] = environment
-                
-                # Narrative Flow
-                if 'Narrative Flow' in structured_data:
-                    value = structured_data['Narrative Flow']
-                    if isinstance(value, str) and len(value) > 1000:
-                        value = value[:1000] + "..."
-                    new_metadata['analysis_narrativeflow'] = value
-                
-                # Additional Details field
-                if 'Additional Details' in structured_data:
-                    value = structured_data['Additional Details']
-                    if isinstance(value, str) and len(value) > 1000:
-                        value = value[:1000] + "..."
-                    new_metadata['analysis_additionaldetails'] = value
-                
-                # Summary field
-                summary = []
-                if structured_data.get('Shot'):
-                    summary.append(f"Shot: {structured_data['Shot']}")
-                if structured_data.get('Action'):
-                    summary.append(f"Action: {structured_data['Action']}")
-                
-                if isinstance(structured_data.get('Subject'), dict):
-
-                    for id_key in ['Identification', 'Specific identification', 'Species/Category', 'Type']:
-                        if id_key in structured_data['Subject'] and structured_data['Subject'][id_key]:
-                            summary.append(f"Subject: {structured_data['Subject'][id_key]}")
-                            break
-                elif structured_data.get('Subject'):
-                    summary.append(f"Subject: {structured_data['Subject']}")
-                
-                new_metadata['analysis_summary'] = " | ".join(summary)
+                new_metadata = build_analysis_metadata(structured_data)
                 
                 # Update the video metadata
-                success, result = update_video_metadata(video_id, new_metadata)
+                success, update_result = _apply_analysis_metadata(video_id, new_metadata, video_info)
                 
                 if success:
                     logger.info(f"Successfully updated metadata for video {video_id}")
-                    return True, new_metadata
+                    return True, update_result
                 else:
-                    error_msg = f"Failed to update metadata: {result}"
+                    error_msg = f"Failed to update metadata: {update_result}"
                     logger.error(error_msg)
                     return False, error_msg
             
@@ -255,22 +347,12 @@ def process_analysis_result(video_id, result, update_metadata=True):
             logger.error(f"Analysis failed: {error_message}")
             
             if update_metadata:
-                from api.utils.twelvelabs_api import update_video_metadata, get_video_metadata
-                
-
-                current_metadata = get_video_metadata(video_id)
-                
-                new_metadata = current_metadata.copy()
-                
-                new_metadata.update({
+                _apply_analysis_metadata(video_id, {
                     'analysis_complete': False,
                     'analysis_timestamp': int(time.time()),
                     'analysis_error': error_message[:500],  
-                    'analysis_version': '1.0'
-                })
-                
-                # Update the video metadata
-                update_video_metadata(video_id, new_metadata)
+                    'analysis_version': ANALYSIS_VERSION
+                }, video_info)
             
             return False, error_message
     
@@ -278,4 +360,4 @@ def process_analysis_result(video_id, result, update_metadata=True):
         error_msg = f"Error processing analysis result: {str(e)}"
         logger.error(error_msg)
         logger.error(traceback.format_exc())
-        return False, error_msg
\ No newline at end of file
+        return False, error_msg
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config.settings import (
+    API_KEY,
+    INDEX_ID,
+    S3_BUCKET_NAME,
+    HEALTH_CHECK_INTERVAL_SECONDS,
+    HEALTH_PROBE_TIMEOUT_SECONDS,
+    HEALTH_STATUS_FILE
+)
+from api.utils.metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAMES = {
+    "twelvelabs_api": "TwelveLabs API",
+    "s3": "S3",
+    "weaviate": "Weaviate"
+}
+
+_lock = threading.Lock()
+_executor = None
+_monitor_thread = None
+# Probes still running from an earlier round, so a hung dependency is not probed again on top
+_running = {}
+_last_result = None
+# Last result read from HEALTH_STATUS_FILE and the file mtime it was read at
+_shared_result = None
+_shared_mtime = None
+
+
+def _probe_twelvelabs():
+
+    from api.utils.twelvelabs_api import _request
+
+    response = _request(
+        "GET", "health_probe",
+        f"https://api.twelvelabs.io/v1.3/indexes/{INDEX_ID}",
+        headers={"x-api-key": API_KEY},
+        timeout=HEALTH_PROBE_TIMEOUT_SECONDS
+    )
+    response.raise_for_status()
+
+
+def _probe_s3():
+
+    from api.utils.s3_utils import get_s3_client
+
+    s3_client = get_s3_client()
+    if not s3_client:
+        raise RuntimeError("S3 client not initialized")
+    with track_upstream("s3", "list_objects_v2"):
+        s3_client.list_objects_v2(Bucket=S3_BUCKET_NAME, MaxKeys=1)
+
+
+def _probe_weaviate():
+
+    from api.utils.weaviate_api import get_weaviate_client
+
+    client = get_weaviate_client()
+    if client is None:
+        raise RuntimeError("Weaviate client not initialized")
+    if not client.is_ready():
+        raise RuntimeError("Weaviate is not ready")
+
+
+PROBES = {
+    "twelvelabs_api": _probe_twelvelabs,
+    "s3": _probe_s3,
+    "weaviate": _probe_weaviate
+}
+
+
+def _timed(probe):
+
+    started = time.perf_counter()
+    try:
+        probe()
+        error = None
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    return error, round((time.perf_counter() - started) * 1000, 1)
+
+
+# Probe every dependency concurrently and wait at most the probe timeout.
+# A probe that has not answered by then is reported as timed out and left to
+# finish on its own; until it does, later rounds report it as still timed out.
+def probe_dependencies():
+
+    global _executor, _last_result
+
+    started = time.time()
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(PROBES) * 2, thread_name_prefix="health-probe")
+        futures = {}
+        for name, probe in PROBES.items():
+            future = _running.get(name)
+            if future is None or future.done():
+                future = _executor.submit(_timed, probe)
+                _running[name] = future
+            futures[name] = future
+
+    wait(futures.values(), timeout=HEALTH_PROBE_TIMEOUT_SECONDS)
+
+    connections = {}
+    for name, future in futures.items():
+        service = SERVICE_NAMES[name]
+        if not future.done():
+            connections[name] = {
+                "status": "disconnected",
+                "message": f"Timed out connecting to {service}",
+                "latency_ms": None,
+                "error": f"No response within {HEALTH_PROBE_TIMEOUT_SECONDS}s"
+            }
+            continue
+        error, latency_ms = future.result()
+        connections[name] = {
+            "status": "connected" if error is None else "disconnected",
+            "message": f"Successfully connected to {service}" if error is None else f"Failed to connect to {service}",
+            "latency_ms": latency_ms,
+            "error": error
+        }
+        if error:
+            logger.warning(f"Health probe for {service} failed: {error}")
+
+    result = {
+        "connections": connections,
+        "all_services_available": all(c["status"] == "connected" for c in connections.values()),
+        "checked_at": round(started, 3)
+    }
+    with _lock:
+        _last_result = result
+    _save_shared(result)
+    return result
+
+
+# Every probe round is written to HEALTH_STATUS_FILE, so the workers that do
+# not run the monitor answer /api/test from the primary's last round
+def _save_shared(result):
+
+    try:
+        directory = os.path.dirname(HEALTH_STATUS_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{HEALTH_STATUS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, HEALTH_STATUS_FILE)
+    except OSError as e:
+        logger.warning(f"Could not write health status file: {str(e)}")
+
+
+def _load_shared():
+
+    global _shared_result, _shared_mtime
+
+    try:
+        mtime = os.stat(HEALTH_STATUS_FILE).st_mtime_ns
+    except OSError:
+        return None
+    if mtime != _shared_mtime:
+        try:
+            with open(HEALTH_STATUS_FILE, "r", encoding="utf-8") as f:
+                _shared_result = json.load(f)
+            _shared_mtime = mtime
+        except (OSError, json.JSONDecodeError):
+            return _shared_result
+    return _shared_result
+
+
+# Result of the latest probe round from this or any other process, or None
+# before the first one. Rounds older than three monitor intervals (a monitor
+# that has stopped, or a file left by an earlier run) do not count.
+def get_last_health():
+
+    with _lock:
+        results = [r for r in (_last_result, _load_shared()) if r is not None]
+        if not results:
+            return None
+        latest = max(results, key=lambda r: r["checked_at"])
+    if HEALTH_CHECK_INTERVAL_SECONDS > 0 and time.time() - latest["checked_at"] > 3 * HEALTH_CHECK_INTERVAL_SECONDS:
+        return None
+    return latest
+
+
+def _monitor_loop():
+
+    while True:
+        try:
+            probe_dependencies()
+        except Exception as e:
+            logger.error(f"Health monitor round failed: {str(e)}")
+        time.sleep(HEALTH_CHECK_INTERVAL_SECONDS)
+
+
+def start_health_monitor():
+
+    global _monitor_thread
+
+    if HEALTH_CHECK_INTERVAL_SECONDS <= 0:
+        return False
+    with _lock:
+        if _monitor_thread is not None and _monitor_thread.is_alive():
+            return False
+        _monitor_thread = threading.Thread(target=_monitor_loop, name="health-monitor", daemon=True)
+        _monitor_thread.start()
+        return True
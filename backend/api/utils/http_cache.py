@@ -0,0 +1,113 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from flask import Response, request
+
+from api.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_responses = {}
+
+
+# Weak and strong validators compare equal on the opaque part (If-None-Match
+# uses weak comparison); "*" matches anything
+def etag_matches(header_value, etag):
+
+    if not header_value or not etag:
+        return False
+    if header_value.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header_value.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def parse_http_date(value):
+
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def format_http_date(value):
+
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+# JSON response with a content-hash ETag. A matching If-None-Match gets a 304
+# without a body; serialisation is canonical so equal payloads hash equally.
+def conditional_json(payload, max_age, status=200):
+
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+    cache_control = f"public, max-age={max_age}" if status == 200 else "no-store"
+
+    if status == 200 and etag_matches(request.headers.get("If-None-Match"), etag):
+        rv = Response(status=304)
+    else:
+        rv = Response(body, status=status, mimetype="application/json")
+    if status == 200:
+        rv.headers["ETag"] = etag
+    rv.headers["Cache-Control"] = cache_control
+    return rv
+
+
+# Short-lived server-side copy of upstream responses, so revalidations and
+# repeat requests inside the TTL do not reach TwelveLabs
+def get_cached_response(key):
+
+    with _lock:
+        entry = _responses.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del _responses[key]
+            entry = None
+    # Labelled by route family: "videos", "video" or "index"
+    record_cache(f"api_{key.split(':', 1)[0]}", entry is not None)
+    return entry[1] if entry is not None else None
+
+
+def cache_response(key, value, ttl):
+
+    if ttl <= 0:
+        return
+    with _lock:
+        if len(_responses) >= 1000:
+            now = time.time()
+            for stale in [k for k, (expires_at, _) in _responses.items() if expires_at <= now]:
+                del _responses[stale]
+            while len(_responses) >= 1000:
+                del _responses[next(iter(_responses))]
+        _responses[key] = (time.time() + ttl, value)
+
+
+# Drop cached upstream responses whose key starts with any of the prefixes
+def invalidate_cached_responses(*prefixes):
+
+    with _lock:
+        for key in [k for k in _responses if k.startswith(prefixes)]:
+            del _responses[key]
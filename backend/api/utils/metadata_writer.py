@@ -0,0 +1,175 @@
+import time
+import atexit
+import logging
+import threading
+
+from config.settings import (
+    METADATA_WRITE_BEHIND,
+    METADATA_WRITE_BEHIND_WINDOW,
+    METADATA_WRITE_BEHIND_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# A video whose flush keeps failing is given up after this many requeues
+MAX_REQUEUES = 3
+
+# Pending field updates per video: {video_id: {"fields": {...}, "queued_at": ts}}
+_pending = {}
+# Fields currently being PUT, so reads still see them until the write lands
+_in_flight = {}
+_lock = threading.Condition()
+_flusher_thread = None
+
+_stats = {
+    "queued_updates": 0,
+    "flushed_videos": 0,
+    "coalesced_updates": 0,
+    "failed_flushes": 0,
+    "last_error": None
+}
+
+
+def is_write_behind_enabled():
+
+    return METADATA_WRITE_BEHIND
+
+
+# Queue field updates for a video, merging them with any not yet flushed
+def enqueue_metadata_update(video_id, fields):
+
+    with _lock:
+        entry = _pending.get(video_id)
+        if entry is None:
+            _pending[video_id] = {"fields": dict(fields), "queued_at": time.time(), "failures": 0}
+        else:
+            entry["fields"].update(fields)
+            _stats["coalesced_updates"] += 1
+        _stats["queued_updates"] += 1
+        _lock.notify()
+
+    _ensure_flusher()
+    return True, {"queued": True, "video_id": video_id, "fields": list(fields.keys())}
+
+
+# Overlay pending and in-flight writes on user_metadata fetched from TwelveLabs
+def apply_pending_metadata(video_id, video_info):
+
+    if not video_info:
+        return video_info
+
+    with _lock:
+        overlay = {}
+        overlay.update(_in_flight.get(video_id, {}))
+        overlay.update(_pending.get(video_id, {}).get("fields", {}))
+
+    if overlay:
+        video_info["user_metadata"] = {**(video_info.get("user_metadata") or {}), **overlay}
+    return video_info
+
+
+def _flush_video(video_id):
+
+    from api.utils.twelvelabs_api import put_user_metadata
+
+    with _lock:
+        # One PUT per video at a time keeps writes for a video in order
+        while video_id in _in_flight:
+            _lock.wait()
+        entry = _pending.pop(video_id, None)
+        if entry is None:
+            return True
+        fields = entry["fields"]
+        _in_flight[video_id] = fields
+
+    success, result = False, None
+    try:
+        for attempt in range(METADATA_WRITE_BEHIND_RETRIES + 1):
+            success, result = put_user_metadata(video_id, fields)
+            if success:
+                break
+            if attempt < METADATA_WRITE_BEHIND_RETRIES:
+                time.sleep(min(2 ** attempt, 10))
+    except Exception as e:
+        success, result = False, str(e)
+
+    with _lock:
+        del _in_flight[video_id]
+        if success:
+            _stats["flushed_videos"] += 1
+        else:
+            # Put the fields back underneath anything queued since, newer values win
+            _stats["failed_flushes"] += 1
+            _stats["last_error"] = {"video_id": video_id, "error": str(result), "time": int(time.time())}
+            failures = entry.get("failures", 0) + 1
+            newer = _pending.get(video_id)
+            if failures > MAX_REQUEUES:
+                logger.error(f"Dropping metadata update for video {video_id} after {failures} failed flushes: {result}")
+            else:
+                _pending[video_id] = {
+                    "fields": {**fields, **(newer["fields"] if newer else {})},
+                    "queued_at": time.time(),
+                    "failures": failures
+                }
+                logger.error(f"Failed to flush metadata for video {video_id}, will retry: {result}")
+        _lock.notify_all()
+
+    return success
+
+
+# Flush one video, or everything that is pending, right away
+def flush_metadata_updates(video_id=None):
+
+    with _lock:
+        video_ids = [video_id] if video_id else list(_pending.keys())
+
+    results = {vid: _flush_video(vid) for vid in video_ids}
+    return {
+        "flushed": sum(1 for ok in results.values() if ok),
+        "failed": [vid for vid, ok in results.items() if not ok]
+    }
+
+
+def get_write_behind_status():
+
+    with _lock:
+        return {
+            "enabled": METADATA_WRITE_BEHIND,
+            "window_seconds": METADATA_WRITE_BEHIND_WINDOW,
+            "pending_videos": len(_pending),
+            "in_flight_videos": len(_in_flight),
+            "pending": {
+                vid: {"fields": list(entry["fields"].keys()), "age_seconds": round(time.time() - entry["queued_at"], 2)}
+                for vid, entry in _pending.items()
+            },
+            "stats": dict(_stats)
+        }
+
+
+def _flusher_loop():
+
+    while True:
+        with _lock:
+            now = time.time()
+            due = [vid for vid, entry in _pending.items()
+                   if now - entry["queued_at"] >= METADATA_WRITE_BEHIND_WINDOW and vid not in _in_flight]
+            if not due:
+                _lock.wait(timeout=METADATA_WRITE_BEHIND_WINDOW / 2 or 0.1)
+                continue
+
+        for vid in due:
+            _flush_video(vid)
+
+
+def _ensure_flusher():
+
+    global _flusher_thread
+
+    with _lock:
+        if _flusher_thread is not None and _flusher_thread.is_alive():
+            return
+        _flusher_thread = threading.Thread(target=_flusher_loop, name="metadata-write-behind", daemon=True)
+        _flusher_thread.start()
+
+
+atexit.register(flush_metadata_updates)
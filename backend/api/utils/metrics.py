@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from config.settings import METRICS_DIR, METRICS_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = {
+    "upstream_request_duration_seconds": ("histogram", "Latency of calls to upstream services"),
+    "upstream_requests_total": ("counter", "Calls to upstream services by outcome"),
+    "upstream_bytes_total": ("counter", "Bytes sent to and received from upstream services"),
+    "cache_requests_total": ("counter", "Cache lookups by result"),
+    "cache_hit_ratio": ("gauge", "Share of cache lookups that were hits since start"),
+    "http_request_duration_seconds": ("histogram", "Time to produce the response headers, per route"),
+    "http_requests_total": ("counter", "Requests served, per route and status"),
+    "metrics_processes": ("gauge", "Worker processes (running or exited) whose series are summed here"),
+}
+
+_lock = threading.Lock()
+# (name, labels) -> value; labels is a tuple of (label, value) pairs
+_counters = {}
+# (name, labels) -> [per-bucket counts, sum, count]
+_histograms = {}
+
+# Each process (every gunicorn worker) writes its series to its own file in
+# METRICS_DIR; /metrics sums all the files, so any worker answers a scrape
+# with totals for the whole server. Files of workers that have exited are
+# kept until the next server start, so the totals never go backwards.
+_flush_thread = None
+_process_file = None
+
+
+def _labels(**labels):
+
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _inc(name, labels, value=1):
+
+    with _lock:
+        _counters[(name, labels)] = _counters.get((name, labels), 0) + value
+
+
+def _observe(name, labels, value):
+
+    with _lock:
+        entry = _histograms.get((name, labels))
+        if entry is None:
+            entry = _histograms[(name, labels)] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+
+class UpstreamCall:
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.failed = False
+
+
+# Time one upstream call. Raising inside the block, or setting call.failed,
+# counts it as an error; bytes set on the call are added to the byte counters.
+@contextmanager
+def track_upstream(upstream, operation):
+
+    call = UpstreamCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.failed = True
+        raise
+    finally:
+        observe_upstream(upstream, operation, time.perf_counter() - started, call.failed)
+        add_upstream_bytes(upstream, operation, sent=call.bytes_sent, received=call.bytes_received)
+
+
+def observe_upstream(upstream, operation, seconds, failed=False):
+
+    _observe("upstream_request_duration_seconds", _labels(upstream=upstream, operation=operation), seconds)
+    _inc("upstream_requests_total", _labels(upstream=upstream, operation=operation,
+                                            outcome="error" if failed else "ok"))
+
+
+# Bytes of a transfer that outlives its track_upstream block, e.g. a streamed S3 body
+def add_upstream_bytes(upstream, operation, sent=0, received=0):
+
+    if sent:
+        _inc("upstream_bytes_total", _labels(upstream=upstream, operation=operation, direction="sent"), sent)
+    if received:
+        _inc("upstream_bytes_total", _labels(upstream=upstream, operation=operation, direction="received"), received)
+
+
+def record_cache(cache, hit, count=1):
+
+    _inc("cache_requests_total", _labels(cache=cache, result="hit" if hit else "miss"), count)
+
+
+def observe_request(route, method, status, seconds):
+
+    _observe("http_request_duration_seconds", _labels(route=route, method=method), seconds)
+    _inc("http_requests_total", _labels(route=route, method=method, status=status))
+
+
+# Per-route timing for every request; the route label is the URL rule, so
+# cardinality stays bounded whatever the path parameters are
+def instrument_app(app):
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+
+# Forget series inherited from the preloading parent after a fork; the new
+# worker gets its own file
+def reset_metrics():
+
+    global _process_file
+
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _process_file = None
+
+
+# Remove every process file; called once per server start, before any worker runs
+def clear_shared_metrics():
+
+    if not os.path.isdir(METRICS_DIR):
+        return
+    for name in os.listdir(METRICS_DIR):
+        try:
+            os.remove(os.path.join(METRICS_DIR, name))
+        except OSError:
+            pass
+
+
+def _snapshot():
+
+    with _lock:
+        return {
+            "counters": [[name, labels, value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, labels, list(buckets), total, count]
+                           for (name, labels), (buckets, total, count) in _histograms.items()]
+        }
+
+
+# Write this process's series to its file. The name carries the start time
+# as well as the pid, so a reused pid never overwrites an exited worker's file.
+def flush_metrics():
+
+    global _process_file
+
+    if _process_file is None:
+        _process_file = os.path.join(METRICS_DIR, f"{os.getpid()}-{time.time_ns()}.json")
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp_path = f"{_process_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, _process_file)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not write metrics file: {str(e)}")
+        return False
+
+
+def _flush_loop():
+
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        flush_metrics()
+
+
+def start_metrics_flush():
+
+    global _flush_thread
+
+    with _lock:
+        if _flush_thread is not None and _flush_thread.is_alive():
+            return False
+        _flush_thread = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+        _flush_thread.start()
+        return True
+
+
+# Sum of the series of every process that has written a file; this process's
+# own series only when the directory cannot be used
+def _collect():
+
+    if not flush_metrics():
+        snapshots = [_snapshot()]
+    else:
+        snapshots = []
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name), "r", encoding="utf-8") as f:
+                    snapshots.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms, len(snapshots)
+
+
+def _format_labels(labels, extra=()):
+
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Everything recorded by all processes, in the Prometheus text exposition format
+def render_metrics():
+
+    counters, histograms, processes = _collect()
+
+    cache_totals = {}
+    for (name, labels), value in counters.items():
+        if name == "cache_requests_total":
+            label_map = dict(labels)
+            hits, lookups = cache_totals.get(label_map["cache"], (0, 0))
+            cache_totals[label_map["cache"]] = (hits + (value if label_map["result"] == "hit" else 0), lookups + value)
+    gauges = {("cache_hit_ratio", _labels(cache=cache)): hits / lookups
+              for cache, (hits, lookups) in cache_totals.items() if lookups}
+    gauges[("metrics_processes", ())] = processes
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "histogram":
+            for (series, labels), (buckets, total, count) in sorted(histograms.items()):
+                if series != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        else:
+            values = counters if metric_type == "counter" else gauges
+            for (series, labels), value in sorted(values.items()):
+                if series == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
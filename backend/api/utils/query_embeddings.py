@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict, Counter
+
+from config.settings import (
+    EMBEDDING_MODEL_NAME,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_FILE,
+    QUERY_EMBEDDING_CACHE_MAX_MB,
+    QUERY_EMBEDDING_PREWARM_COUNT,
+    LOG_FILE
+)
+from api.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Search queries as logged by the search route
+_QUERY_LOG_PATTERN = re.compile(r"Search request received: query=(.*?), options=")
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_connection = None
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evicted": 0, "prewarmed": 0}
+
+# Running size of the disk store, so writes do not sum the whole table. Other
+# workers write to the same store, so it is recounted every SIZE_RECOUNT_WRITES
+# writes and before evicting.
+SIZE_RECOUNT_WRITES = 100
+_disk_bytes = None
+_writes_since_recount = 0
+
+
+# Queries differing only in case or spacing share one embedding
+def normalize_query(text):
+
+    return " ".join((text or "").lower().split())
+
+
+# On-disk store: one float32 blob per (model, normalized query)
+def _get_connection():
+
+    global _connection
+
+    if _connection is None:
+        directory = os.path.dirname(QUERY_EMBEDDING_CACHE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(QUERY_EMBEDDING_CACHE_FILE, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, "
+            "hits INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL, PRIMARY KEY (model, query))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used ON query_embeddings(last_used)")
+        conn.commit()
+        _connection = conn
+
+    return _connection
+
+
+def _to_blob(vector):
+
+    return array("f", vector).tobytes()
+
+
+def _from_blob(blob):
+
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+def _remember(key, vector):
+
+    _cache[key] = vector
+    _cache.move_to_end(key)
+    while len(_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _read_disk(key):
+
+    conn = _get_connection()
+    row = conn.execute(
+        "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?", key
+    ).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "UPDATE query_embeddings SET hits = hits + 1, last_used = ? WHERE model = ? AND query = ?",
+        (time.time(),) + key
+    )
+    conn.commit()
+    return _from_blob(row[0])
+
+
+def _count_disk_bytes(conn):
+
+    global _disk_bytes, _writes_since_recount
+
+    _disk_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM query_embeddings").fetchone()[0]
+    _writes_since_recount = 0
+    return _disk_bytes
+
+
+# Store a vector and drop the least recently used entries once the store is over its size limit
+def _write_disk(key, vector):
+
+    global _disk_bytes, _writes_since_recount
+
+    conn = _get_connection()
+    blob = _to_blob(vector)
+    conn.execute(
+        "INSERT INTO query_embeddings (model, query, vector, hits, last_used) VALUES (?, ?, ?, 1, ?) "
+        "ON CONFLICT (model, query) DO UPDATE SET vector = excluded.vector, last_used = excluded.last_used",
+        key + (blob, time.time())
+    )
+
+    max_bytes = QUERY_EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+    if _disk_bytes is None or _writes_since_recount >= SIZE_RECOUNT_WRITES:
+        total = _count_disk_bytes(conn)
+    else:
+        # An overwrite is counted as an addition; the estimate only errs high
+        _disk_bytes += len(blob)
+        _writes_since_recount += 1
+        total = _disk_bytes
+        if total > max_bytes:
+            total = _count_disk_bytes(conn)
+    if total > max_bytes:
+        # Evict down to 90% so a full store does not evict on every write
+        excess = total - int(max_bytes * 0.9)
+        rows = conn.execute("SELECT rowid, LENGTH(vector) FROM query_embeddings ORDER BY last_used").fetchall()
+        evict = []
+        for rowid, size in rows:
+            if excess <= 0:
+                break
+            evict.append((rowid,))
+            excess -= size
+            total -= size
+        conn.executemany("DELETE FROM query_embeddings WHERE rowid = ?", evict)
+        _disk_bytes = total
+        _stats["evicted"] += len(evict)
+        logger.info(f"Evicted {len(evict)} query embeddings from the disk cache")
+
+    conn.commit()
+
+
+# Marengo text embedding for a search query, computed once per (model,
+# normalized query). Lookups go memory LRU -> disk store -> embed API.
+def get_query_embedding(text):
+
+    query = normalize_query(text)
+    if not query:
+        return None
+
+    key = (EMBEDDING_MODEL_NAME, query)
+    with _lock:
+        vector = _cache.get(key)
+        if vector is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            record_cache("query_embedding", True)
+            return vector
+
+        try:
+            vector = _read_disk(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding disk cache unavailable: {str(e)}")
+            vector = None
+        if vector is not None:
+            _stats["disk_hits"] += 1
+            record_cache("query_embedding", True)
+            _remember(key, vector)
+            return vector
+        _stats["misses"] += 1
+        record_cache("query_embedding", False)
+
+    from api.utils.twelvelabs_api import create_text_embedding
+    vector = create_text_embedding(query)
+    if vector is None:
+        return None
+
+    with _lock:
+        _remember(key, vector)
+        try:
+            _write_disk(key, vector)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist query embedding: {str(e)}")
+
+    return vector
+
+
+# How often each normalized search query appears in the application log
+def count_logged_queries(log_file=LOG_FILE):
+
+    counts = Counter()
+    if not os.path.isfile(log_file):
+        return counts
+
+    with open(log_file, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = _QUERY_LOG_PATTERN.search(line)
+            if match:
+                query = normalize_query(match.group(1))
+                if query:
+                    counts[query] += 1
+
+    return counts
+
+
+def get_frequent_logged_queries(limit=QUERY_EMBEDDING_PREWARM_COUNT, log_file=LOG_FILE):
+
+    return [query for query, _ in count_logged_queries(log_file).most_common(limit)]
+
+
+# Load the most frequent logged queries into memory, embedding any not yet on disk
+def prewarm_query_embeddings(limit=QUERY_EMBEDDING_PREWARM_COUNT):
+
+    if limit <= 0:
+        return 0
+
+    queries = get_frequent_logged_queries(limit)
+    warmed = 0
+    for query in queries:
+        if get_query_embedding(query) is not None:
+            warmed += 1
+
+    _stats["prewarmed"] = warmed
+    logger.info(f"Pre-warmed {warmed} of {len(queries)} frequent search query embeddings")
+    return warmed
+
+
+def start_prewarm():
+
+    thread = threading.Thread(target=prewarm_query_embeddings, name="query-embedding-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_query_embedding_stats():
+
+    with _lock:
+        try:
+            conn = _get_connection()
+            disk_entries, disk_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM query_embeddings"
+            ).fetchone()
+        except sqlite3.Error:
+            disk_entries, disk_bytes = None, None
+
+        return {
+            "entries": len(_cache),
+            "max_entries": QUERY_EMBEDDING_CACHE_SIZE,
+            "disk_entries": disk_entries,
+            "disk_bytes": disk_bytes,
+            "disk_max_bytes": QUERY_EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+            **_stats
+        }
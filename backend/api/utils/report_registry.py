@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+
+from config.settings import REPORTS_DIR, REPORT_RETENTION_COUNT, REPORT_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = os.path.join(REPORTS_DIR, "manifest.json")
+MANIFEST_LOCK_FILE = os.path.join(REPORTS_DIR, "manifest.lock")
+
+_lock = threading.Lock()
+_manifest = None
+_manifest_mtime = None
+
+
+def _manifest_changed_at():
+
+    try:
+        return os.stat(MANIFEST_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Other workers and the CLI also register reports; reload the manifest
+# whenever the file on disk has been replaced since it was last read
+def _load_manifest():
+
+    global _manifest, _manifest_mtime
+
+    mtime = _manifest_changed_at()
+    if _manifest is None or mtime != _manifest_mtime:
+        _manifest = {"latest": {}, "reports": {}}
+        if mtime is not None:
+            try:
+                with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+                    _manifest = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Could not read report manifest, starting a new one: {str(e)}")
+        _manifest_mtime = mtime
+    return _manifest
+
+
+def _save_manifest(manifest):
+
+    global _manifest_mtime
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    tmp_path = f"{MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_FILE)
+    _manifest_mtime = _manifest_changed_at()
+
+
+# Serialises manifest read-modify-write across processes
+@contextmanager
+def _manifest_file_lock():
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    with open(MANIFEST_LOCK_FILE, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Drop reports beyond the retention count or age, newest are always kept first
+def _apply_retention(manifest, report_type):
+
+    entries = sorted(manifest["reports"].get(report_type, []), key=lambda e: e["timestamp"], reverse=True)
+    cutoff = time.time() - REPORT_RETENTION_DAYS * 86400 if REPORT_RETENTION_DAYS > 0 else None
+
+    kept = []
+    for i, entry in enumerate(entries):
+        expired = cutoff is not None and entry["timestamp"] < cutoff and i > 0
+        if (REPORT_RETENTION_COUNT > 0 and i >= REPORT_RETENTION_COUNT) or expired:
+            path = os.path.join(REPORTS_DIR, entry["filename"])
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+                logger.info(f"Removed old report {entry['filename']}")
+            except OSError as e:
+                logger.warning(f"Could not remove old report {entry['filename']}: {str(e)}")
+                kept.append(entry)
+        else:
+            kept.append(entry)
+
+    manifest["reports"][report_type] = kept
+
+
+# Record a finished report file (already in REPORTS_DIR) in the manifest
+def register_report(report_type, path, timestamp, rows):
+
+    entry = {
+        "type": report_type,
+        "filename": os.path.basename(path),
+        "timestamp": timestamp,
+        "rows": rows,
+        "size": os.path.getsize(path)
+    }
+
+    with _lock, _manifest_file_lock():
+        manifest = _load_manifest()
+        manifest["reports"].setdefault(report_type, []).append(entry)
+
+        latest = manifest["latest"].get(report_type)
+        if latest is None or latest["timestamp"] <= timestamp:
+            manifest["latest"][report_type] = entry
+
+        _apply_retention(manifest, report_type)
+        _save_manifest(manifest)
+
+    return entry
+
+
+def get_latest_report(report_type):
+
+    with _lock:
+        entry = _load_manifest()["latest"].get(report_type)
+
+    if entry is None:
+        return None, None
+
+    path = os.path.join(REPORTS_DIR, entry["filename"])
+    if not os.path.isfile(path):
+        logger.warning(f"Latest {report_type} report {entry['filename']} is missing on disk")
+        return None, None
+    return entry, path
+
+
+def list_reports(report_type=None):
+
+    with _lock:
+        manifest = _load_manifest()
+        if report_type:
+            return {report_type: list(manifest["reports"].get(report_type, []))}
+        return {t: list(entries) for t, entries in manifest["reports"].items()}
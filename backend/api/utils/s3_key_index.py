@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import logging
+import threading
+import traceback
+
+from config.settings import S3_BUCKET_NAME, S3_KEY_INDEX_FILE, S3_KEY_INDEX_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Other worker processes may rewrite the index file; check it for changes this often
+RELOAD_CHECK_SECONDS = 30
+
+_lock = threading.Lock()
+_loaded = False
+_file_mtime = None
+_checked_at = 0
+_crawl_thread = None
+
+# key -> {"key", "size", "etag", "last_modified"}, and basename -> the same entry
+_by_key = {}
+_by_name = {}
+_status = {"crawled_at": None, "crawling": False, "last_crawl_seconds": None, "error": None}
+
+
+def _basename(key):
+
+    return key.rsplit("/", 1)[-1]
+
+
+# Guess the S3 key of a bare filename from the bucket layout,
+# e.g. JU231212_0147.mp4 -> JU/JU231212/q4/JU231212_0147.mp4
+def guess_key(filename):
+
+    if filename.startswith('JU') and '_' in filename:
+        prefix = filename.split('_')[0]
+        return f"JU/{prefix}/q4/{filename}"
+    return None
+
+
+# When several keys share a basename, the one at the guessed location wins, then the first by key
+def _prefer(current, candidate):
+
+    if current is None:
+        return candidate
+    guessed = guess_key(_basename(candidate["key"]))
+    if candidate["key"] == guessed and current["key"] != guessed:
+        return candidate
+    if current["key"] != guessed and candidate["key"] < current["key"]:
+        return candidate
+    return current
+
+
+def _add_entry(entry):
+
+    previous = _by_key.get(entry["key"])
+    _by_key[entry["key"]] = entry
+    name = _basename(entry["key"])
+    if previous is not None and _by_name.get(name) is previous:
+        _by_name[name] = entry
+    else:
+        _by_name[name] = _prefer(_by_name.get(name), entry)
+
+
+def _file_changed_at():
+
+    try:
+        return os.stat(S3_KEY_INDEX_FILE).st_mtime
+    except OSError:
+        return None
+
+
+# Load the index file, and reload it when another process (the one that
+# runs the scheduled crawls) has replaced it since
+def _load(force=False):
+
+    global _loaded, _file_mtime, _checked_at
+
+    now = time.time()
+    if _loaded and not force and now - _checked_at < RELOAD_CHECK_SECONDS:
+        return
+    _checked_at = now
+
+    mtime = _file_changed_at()
+    if _loaded and mtime == _file_mtime:
+        return
+    _loaded = True
+    _file_mtime = mtime
+
+    if mtime is None:
+        return
+    try:
+        with open(S3_KEY_INDEX_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        _by_key.clear()
+        _by_name.clear()
+        for key, (size, etag, last_modified) in data.get("objects", {}).items():
+            _add_entry({"key": key, "size": size, "etag": etag, "last_modified": last_modified})
+        _status["crawled_at"] = data.get("crawled_at")
+        logger.info(f"Loaded S3 key index with {len(_by_key)} objects")
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read S3 key index, it will be rebuilt: {str(e)}")
+
+
+def _save():
+
+    global _file_mtime
+
+    data = {
+        "crawled_at": _status["crawled_at"],
+        "objects": {key: [e["size"], e["etag"], e["last_modified"]] for key, e in _by_key.items()}
+    }
+    directory = os.path.dirname(S3_KEY_INDEX_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{S3_KEY_INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, S3_KEY_INDEX_FILE)
+    _file_mtime = _file_changed_at()
+
+
+def _entry_from_listing(obj):
+
+    return {
+        "key": obj["Key"],
+        "size": obj["Size"],
+        "etag": obj.get("ETag"),
+        "last_modified": obj["LastModified"].isoformat() if obj.get("LastModified") else None
+    }
+
+
+# List every object under the configured prefix with a paginated
+# list_objects_v2 crawl and replace the index with the result
+def crawl_s3_keys(prefix=S3_KEY_INDEX_PREFIX):
+
+    from api.utils.s3_utils import get_s3_client
+    from api.utils.metrics import observe_upstream
+
+    s3_client = get_s3_client()
+    if not s3_client:
+        logger.error("S3 client not initialized")
+        return False
+
+    started = time.time()
+    _status.update({"crawling": True, "error": None})
+    try:
+        entries = []
+        paginator = s3_client.get_paginator("list_objects_v2")
+        pages = iter(paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=prefix or ""))
+        while True:
+            # Each page is one list_objects_v2 request
+            page_started = time.perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                break
+            except Exception:
+                observe_upstream("s3", "list_objects_v2", time.perf_counter() - page_started, failed=True)
+                raise
+            observe_upstream("s3", "list_objects_v2", time.perf_counter() - page_started)
+            entries.extend(_entry_from_listing(obj) for obj in page.get("Contents", []))
+
+        with _lock:
+            _by_key.clear()
+            _by_name.clear()
+            for entry in entries:
+                _add_entry(entry)
+            _status["crawled_at"] = int(started)
+            _status["last_crawl_seconds"] = round(time.time() - started, 1)
+            _save()
+
+        logger.info(f"Indexed {len(entries)} S3 objects in {_status['last_crawl_seconds']}s")
+        return True
+    except Exception as e:
+        logger.error(f"S3 key crawl failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        _status["error"] = str(e)
+        return False
+    finally:
+        _status["crawling"] = False
+
+
+def start_crawl():
+
+    global _crawl_thread
+
+    with _lock:
+        if _crawl_thread is not None and _crawl_thread.is_alive():
+            return False
+        _crawl_thread = threading.Thread(target=crawl_s3_keys, name="s3-key-crawl", daemon=True)
+        _crawl_thread.start()
+        return True
+
+
+# Crawl in the background if the bucket has never been indexed
+def ensure_s3_key_index():
+
+    with _lock:
+        _load()
+        needs_crawl = _status["crawled_at"] is None
+    if needs_crawl:
+        start_crawl()
+
+
+# Record a single object found outside a crawl (e.g. by the pattern fallback)
+def record_object(key, size, etag=None, last_modified=None):
+
+    with _lock:
+        _load(force=True)
+        _add_entry({"key": key, "size": size, "etag": etag, "last_modified": last_modified})
+        _save()
+
+
+def forget_object(key):
+
+    with _lock:
+        _load(force=True)
+        entry = _by_key.pop(key, None)
+        if entry is not None:
+            name = _basename(key)
+            if _by_name.get(name) is entry:
+                del _by_name[name]
+                for other in _by_key.values():
+                    if _basename(other["key"]) == name:
+                        _by_name[name] = _prefer(_by_name.get(name), other)
+            _save()
+
+
+def lookup_key(key):
+
+    with _lock:
+        _load()
+        return _by_key.get(key)
+
+
+def lookup_filename(filename):
+
+    with _lock:
+        _load()
+        return _by_name.get(filename)
+
+
+def get_s3_key_index_status():
+
+    with _lock:
+        _load()
+        return {"objects": len(_by_key), "filenames": len(_by_name), **_status}
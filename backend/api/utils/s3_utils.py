@@ -1,41 +1,353 @@
 import os
-import boto3
 from flask import Response, stream_with_context
 import logging
 import re
+import time
+import threading
+import itertools
 
 from config.settings import (
     AWS_ACCESS_KEY_ID,
     AWS_SECRET_ACCESS_KEY,
     AWS_REGION,
-    S3_BUCKET_NAME
+    S3_BUCKET_NAME,
+    PRESIGNED_URL_EXPIRY_SECONDS,
+    VIDEO_BLOCK_CACHE_ENABLED,
+    VIDEO_STREAM_MIN_CHUNK_KB,
+    VIDEO_STREAM_MAX_CHUNK_KB,
+    VIDEO_CACHE_MAX_AGE
 )
+from api.utils.http_cache import etag_matches, parse_http_date, format_http_date
+from api.utils.metrics import track_upstream, observe_upstream, add_upstream_bytes, record_cache
 
 logger = logging.getLogger(__name__)
 
-# Initialize S3 client
-if all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, S3_BUCKET_NAME]):
-    session = boto3.Session(
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_REGION
-    )
-    s3_client = session.client("s3")
-else:
+# Presigned URLs are reused until this long before they expire
+PRESIGNED_URL_MARGIN_SECONDS = min(60, PRESIGNED_URL_EXPIRY_SECONDS // 4)
+
+_presigned_lock = threading.Lock()
+_presigned_urls = {}
+
+_client_lock = threading.Lock()
+_s3_client_checked = False
+s3_client = None
+
+# S3 client, created (and boto3 imported) on first use
+def get_s3_client():
+
+    global s3_client, _s3_client_checked
+
+    if _s3_client_checked or s3_client is not None:
+        return s3_client
+
+    with _client_lock:
+        if not _s3_client_checked:
+            if all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, S3_BUCKET_NAME]):
+                import boto3
+                session = boto3.Session(
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION
+                )
+                s3_client = session.client("s3")
+            else:
+                s3_client = None
+                logger.error("Missing AWS credentials or S3 bucket name in environment variables")
+            _s3_client_checked = True
+    return s3_client
+
+# Drop a client inherited from the parent process after a fork, because the
+# connection pool would be shared; the next use creates a new one
+def reset_s3_client():
+
+    global s3_client, _s3_client_checked
+
     s3_client = None
-    logger.error("Missing AWS credentials or S3 bucket name in environment variables")
+    _s3_client_checked = False
+
+# Parse a single byte range: "bytes=500-999", "bytes=500-" or the suffix
+# form "bytes=-500" (the last 500 bytes). Returns (first, last) with None for
+# an omitted side, or None when the header is not a usable byte range.
+def parse_range_spec(range_header):
 
+    match = re.match(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*(?:,|$)", range_header or "")
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first = int(match.group(1)) if match.group(1) else None
+    last = int(match.group(2)) if match.group(2) else None
+    if first is not None and last is not None and last < first:
+        return None
+    return first, last
+
+# Resolve a parsed range against the file size. Returns (start, end)
+# inclusive, or None when the range cannot be satisfied (416).
+def resolve_range(range_spec, file_size):
+
+    first, last = range_spec
+    if first is None:
+        if last == 0 or file_size == 0:
+            return None
+        return max(0, file_size - last), file_size - 1
+    if first >= file_size:
+        return None
+    end = file_size - 1 if last is None else min(last, file_size - 1)
+    return first, end
+
+# Resolve a Range header against the file size. A missing or unusable header
+# means the whole file; None means the range cannot be satisfied.
 def parse_range(range_header, file_size):
 
-    match = re.match(r"bytes=(\d+)-(\d*)", range_header)
-    if match:
-        start = int(match.group(1))
-        end = int(match.group(2)) if match.group(2) else file_size - 1
-        return start, min(end, file_size - 1)
-    return 0, file_size - 1
+    spec = parse_range_spec(range_header)
+    if spec is None:
+        return 0, file_size - 1
+    return resolve_range(spec, file_size)
+
+# Resolve a requested path or bare filename to (S3 key, index entry). The
+# entry carries size and etag and is None when the object is not indexed.
+# Bare filenames missing from the index fall back to guessing the key from
+# the bucket layout; a guess that exists is added to the index.
+def resolve_video_object(filename):
+
+    from api.utils.s3_key_index import lookup_key, lookup_filename, guess_key, record_object
+    s3_client = get_s3_client()
+
+    s3_key = filename.lstrip("/")
+    if '/' in s3_key:
+        return s3_key, lookup_key(s3_key)
+
+    entry = lookup_filename(s3_key)
+    if entry is not None:
+        return entry["key"], entry
+
+    likely_path = guess_key(s3_key)
+    if likely_path and s3_client:
+        logger.info(f"{s3_key} not in the S3 key index, trying likely S3 path: {likely_path}")
+        try:
+            with track_upstream("s3", "head_object"):
+                head = s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=likely_path)
+            record_object(likely_path, head['ContentLength'], head.get('ETag'),
+                          head['LastModified'].isoformat() if head.get('LastModified') else None)
+            return likely_path, lookup_key(likely_path)
+        except Exception as e:
+            logger.warning(f"Path {likely_path} not found in S3: {str(e)}")
+
+    return s3_key, lookup_key(s3_key)
+
+# Read a response body in chunks that start small, so the first bytes (moov
+# atom, first frames) go out quickly, and double up to the maximum, so long
+# transfers need few Python-level iterations
+def _iter_body(body):
+
+    chunk_size = VIDEO_STREAM_MIN_CHUNK_KB * 1024
+    max_chunk_size = max(chunk_size, VIDEO_STREAM_MAX_CHUNK_KB * 1024)
+    try:
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+            add_upstream_bytes("s3", "get_object", received=len(chunk))
+            yield chunk
+            chunk_size = min(chunk_size * 2, max_chunk_size)
+    finally:
+        body.close()
+
+# "bytes 0-1023/146515" -> (0, 1023, 146515)
+def _parse_content_range(content_range):
+
+    match = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range or "")
+    if not match:
+        return None
+    return tuple(int(g) for g in match.groups())
+
+def _error_code(error):
+
+    return str(getattr(error, 'response', {}).get('Error', {}).get('Code'))
+
+# GetObject timed to the response headers; body bytes are counted as they are read
+def _get_object(s3_client, **params):
+
+    started = time.perf_counter()
+    try:
+        s3_response = s3_client.get_object(**params)
+    except Exception as e:
+        # 304, 412 and 416 answer the conditional or ranged request; they are not S3 failures
+        answered = _is_not_modified(e) or _error_code(e) in ('InvalidRange', 'PreconditionFailed')
+        observe_upstream("s3", "get_object", time.perf_counter() - started, failed=not answered)
+        raise
+    observe_upstream("s3", "get_object", time.perf_counter() - started)
+    return s3_response
+
+# The object in S3 no longer has the ETag recorded in the key index
+class StaleObjectError(Exception):
+    pass
+
+# GetObject of an indexed object, pinned to the indexed ETag with IfMatch so
+# the bytes always belong to the size and ETag the response headers announce.
+# A changed object is dropped from the index and raises StaleObjectError.
+def _get_indexed_object(s3_client, s3_key, etag, **params):
+
+    from api.utils.s3_key_index import forget_object
+
+    if not etag:
+        return _get_object(s3_client, Bucket=S3_BUCKET_NAME, Key=s3_key, **params)
+    try:
+        s3_response = _get_object(s3_client, Bucket=S3_BUCKET_NAME, Key=s3_key, IfMatch=etag, **params)
+    except Exception as e:
+        if _error_code(e) != 'PreconditionFailed':
+            raise
+        s3_response = None
+    if s3_response is None or s3_response.get('ETag') != etag:
+        if s3_response is not None:
+            s3_response['Body'].close()
+        logger.warning(f"{s3_key} changed since it was indexed, dropping it from the S3 key index")
+        forget_object(s3_key)
+        raise StaleObjectError(s3_key)
+    return s3_response
+
+# S3 answers a matching IfNoneMatch with 304, surfaced by boto3 as an error
+def _is_not_modified(error):
+
+    response = getattr(error, 'response', {})
+    return response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304 or _error_code(error) in ('304', 'NotModified')
+
+# The object's ETag on an S3 304: from the response headers, else the client's
+# If-None-Match when it names exactly one tag; None when it cannot be told
+def _not_modified_etag(error, if_none_match):
+
+    headers = getattr(error, 'response', {}).get('ResponseMetadata', {}).get('HTTPHeaders', {})
+    if headers.get('etag'):
+        return headers['etag']
+    candidate = (if_none_match or "").strip()
+    if candidate and candidate != "*" and "," not in candidate:
+        return candidate
+    return None
+
+# Whether an If-Range validator (an ETag or an HTTP date) still matches the object
+def _if_range_matches(if_range, etag, last_modified):
 
-def stream_video_from_s3(filename):
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # If-Range requires a strong comparison
+        return not if_range.startswith('W/') and etag is not None and if_range == etag
+    since = parse_http_date(if_range)
+    modified = parse_http_date(format_http_date(last_modified)) if last_modified else None
+    return since is not None and modified is not None and modified <= since
+
+# Indexed branch of _open_object_bytes. Raises StaleObjectError when the
+# object has changed since it was indexed.
+def _open_indexed_object_bytes(s3_client, s3_key, object_info, range_spec, if_none_match, if_range):
+
+    etag = object_info.get('etag')
+    last_modified = object_info.get('last_modified')
+    if if_none_match and etag_matches(if_none_match, etag):
+        return {"not_modified": True, "etag": etag, "last_modified": last_modified}
+
+    # A stale If-Range means the client's partial copy is outdated: send the whole object
+    if range_spec is not None and if_range and not _if_range_matches(if_range, etag, last_modified):
+        range_spec = None
+
+    file_size = object_info['size']
+    if range_spec is None:
+        start, end, ranged = 0, file_size - 1, False
+    else:
+        byte_range = resolve_range(range_spec, file_size)
+        if byte_range is None:
+            return None
+        (start, end), ranged = byte_range, True
+
+    opened = {"start": start, "end": end, "size": file_size, "ranged": ranged,
+              "etag": etag, "last_modified": last_modified}
+
+    if VIDEO_BLOCK_CACHE_ENABLED and etag:
+        from api.utils.video_block_cache import iter_cached_range
+        chunks = iter_cached_range(s3_client, s3_key, etag, file_size, start, end,
+                                   chunk_size=VIDEO_STREAM_MAX_CHUNK_KB * 1024)
+        # Start it here, so a changed object is noticed before any header is sent
+        first_chunk = next(chunks, b"")
+        opened["chunks"] = itertools.chain([first_chunk], chunks)
+        return opened
+
+    params = {"Range": f"bytes={start}-{end}"} if ranged else {}
+    try:
+        s3_response = _get_indexed_object(s3_client, s3_key, etag, **params)
+    except Exception as e:
+        if _error_code(e) == 'InvalidRange':
+            return None
+        raise
+    opened["chunks"] = _iter_body(s3_response['Body'])
+    return opened
+
+# Open the requested bytes with a single S3 request. Returns a dict with the
+# chunk iterator, start, end, size, ranged, etag and last_modified; or
+# {"not_modified": True} when If-None-Match matches; or None if the range
+# cannot be satisfied.
+#
+# Indexed objects (size and etag known) are read through the local block
+# cache, and conditional requests are answered without contacting S3.
+# Otherwise the Range and validators are passed to S3 as-is and the size is
+# taken from the Content-Range (or Content-Length) of the GET response, so
+# no head_object is needed.
+def _open_object_bytes(s3_key, object_info, range_spec, if_none_match=None, if_range=None):
+
+    s3_client = get_s3_client()
+    if object_info is not None:
+        try:
+            return _open_indexed_object_bytes(s3_client, s3_key, object_info, range_spec, if_none_match, if_range)
+        except StaleObjectError:
+            # Served like an unindexed object: size and ETag come from the GET itself
+            pass
+
+    params = {"Bucket": S3_BUCKET_NAME, "Key": s3_key}
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    if range_spec is not None:
+        first, last = range_spec
+        params["Range"] = f"bytes={first if first is not None else ''}-{last if last is not None else ''}"
+        # If-Range maps onto an S3 precondition; when it fails the whole object is sent instead
+        if if_range:
+            if if_range.startswith('"'):
+                params["IfMatch"] = if_range
+            elif parse_http_date(if_range) is not None:
+                params["IfUnmodifiedSince"] = parse_http_date(if_range)
+            else:
+                params.pop("Range")
+
+    try:
+        s3_response = _get_object(s3_client, **params)
+    except Exception as e:
+        if _is_not_modified(e):
+            return {"not_modified": True, "etag": _not_modified_etag(e, if_none_match), "last_modified": None}
+        if _error_code(e) == 'InvalidRange':
+            return None
+        if _error_code(e) == 'PreconditionFailed' and "Range" in params:
+            for name in ("Range", "IfMatch", "IfUnmodifiedSince"):
+                params.pop(name, None)
+            s3_response = _get_object(s3_client, **params)
+        else:
+            raise
+
+    opened = {"etag": s3_response.get('ETag'), "last_modified": s3_response.get('LastModified'),
+              "chunks": _iter_body(s3_response['Body'])}
+    content_range = _parse_content_range(s3_response.get('ContentRange'))
+    if content_range:
+        opened["start"], opened["end"], opened["size"] = content_range
+        opened["ranged"] = True
+    else:
+        opened["size"] = s3_response['ContentLength']
+        opened["start"], opened["end"], opened["ranged"] = 0, opened["size"] - 1, False
+    return opened
+
+def _add_validators(rv, etag, last_modified):
+
+    if etag:
+        rv.headers['ETag'] = etag
+    http_date = format_http_date(last_modified) if last_modified else None
+    if http_date:
+        rv.headers['Last-Modified'] = http_date
+    rv.headers['Cache-Control'] = f"public, max-age={VIDEO_CACHE_MAX_AGE}"
+
+def stream_video_from_s3(filename, object_info=None):
     from flask import request  # Needed here for range header
+    s3_client = get_s3_client()
     if not s3_client:
         logger.error("S3 client not initialized")
         return Response("S3 client not initialized", status=500)
@@ -45,49 +357,93 @@ def stream_video_from_s3(filename):
         
         s3_key = filename.lstrip("/") 
 
-        head = s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-        file_size = head['ContentLength']
-
         range_header = request.headers.get('Range', None)
-        if range_header:
-            start, end = parse_range(range_header, file_size)
-            byte_range = f"bytes={start}-{end}"
-            logger.info(f"Streaming byte range: {byte_range}")
-            s3_response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Range=byte_range)
-            data = s3_response['Body']
-
-            def generate():
-                for chunk in data.iter_chunks(chunk_size=8192):
-                    yield chunk
-
-            rv = Response(stream_with_context(generate()), status=206, mimetype='video/mp4')
-            rv.headers.add('Content-Range', f'bytes {start}-{end}/{file_size}')
-            rv.headers.add('Accept-Ranges', 'bytes')
-            rv.headers.add('Content-Length', str(end - start + 1))
+        range_spec = parse_range_spec(range_header) if range_header else None
+        
+        opened = _open_object_bytes(s3_key, object_info, range_spec,
+                                    request.headers.get('If-None-Match'), request.headers.get('If-Range'))
+        if opened is None:
+            rv = Response("Requested range not satisfiable.", status=416)
+            if object_info is not None:
+                rv.headers.add('Content-Range', f"bytes */{object_info['size']}")
             return rv
-        else:
-            s3_response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-            data = s3_response['Body']
+        
+        if opened.get("not_modified"):
+            rv = Response(status=304)
+            _add_validators(rv, opened["etag"], opened["last_modified"])
+            return rv
+        
+        chunks, start, end = opened["chunks"], opened["start"], opened["end"]
+        ranged = opened["ranged"]
+        
+        if ranged:
+            logger.info(f"Streaming byte range: bytes={start}-{end}")
+        
+        # Pull the first chunk now so S3 errors still produce an error response
+        first_chunk = next(chunks, b"")
 
-            def generate():
-                for chunk in data.iter_chunks(chunk_size=8192):
-                    yield chunk
+        def generate():
+            yield first_chunk
+            try:
+                yield from chunks
+            except Exception as e:
+                # Headers are already sent, so the client sees a short response
+                logger.error(f"Error while streaming {s3_key}: {str(e)}")
 
-            rv = Response(stream_with_context(generate()), mimetype='video/mp4')
-            rv.headers.add('Content-Length', str(file_size))
-            rv.headers.add('Accept-Ranges', 'bytes')
-            return rv
+        rv = Response(stream_with_context(generate()), status=206 if ranged else 200, mimetype='video/mp4')
+        if ranged:
+            rv.headers.add('Content-Range', f'bytes {start}-{end}/{opened["size"]}')
+        rv.headers.add('Accept-Ranges', 'bytes')
+        rv.headers.add('Content-Length', str(end - start + 1))
+        _add_validators(rv, opened["etag"], opened["last_modified"])
+        return rv
 
     except s3_client.exceptions.NoSuchKey:
         logger.warning(f"File not found in S3: {filename}")
+        if object_info is not None:
+            from api.utils.s3_key_index import forget_object
+            forget_object(s3_key)
         return Response("File not found in S3.", status=404)
     except Exception as e:
         logger.error(f"Error streaming video {filename}: {str(e)}")
         return Response("Could not stream video.", status=500)
 
+# Short-lived GET URL for an object, cached per key until shortly before it
+# expires. Returns (url, expires_at) or (None, None) without an S3 client.
+def get_presigned_video_url(s3_key):
+
+    s3_client = get_s3_client()
+    if not s3_client:
+        logger.error("S3 client not initialized")
+        return None, None
+
+    now = time.time()
+    with _presigned_lock:
+        cached = _presigned_urls.get(s3_key)
+        if cached and cached[1] - PRESIGNED_URL_MARGIN_SECONDS > now:
+            record_cache("presigned_url", True)
+            return cached
+    record_cache("presigned_url", False)
+
+    url = s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": S3_BUCKET_NAME, "Key": s3_key, "ResponseContentType": "video/mp4"},
+        ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS
+    )
+    entry = (url, int(now) + PRESIGNED_URL_EXPIRY_SECONDS)
+
+    with _presigned_lock:
+        if len(_presigned_urls) >= 10000:
+            for key in [k for k, (_, expires_at) in _presigned_urls.items() if expires_at - PRESIGNED_URL_MARGIN_SECONDS <= now]:
+                del _presigned_urls[key]
+        _presigned_urls[s3_key] = entry
+
+    return entry
+
 def test_s3_connection():
 
     try:
+        s3_client = get_s3_client()
         if not s3_client:
             logger.error("S3 client not initialized")
             return False
@@ -104,15 +460,19 @@ def get_video_path(video_id):
     try:
         from api.utils.twelvelabs_api import get_video_metadata
         
-        metadata = get_video_metadata(video_id)
-        if metadata and 'filename' in metadata:
-            # Remove leading slash if present
-            filename = metadata['filename'].lstrip('/')
-            logger.info(f"Using filename from metadata: {filename}")
-            return filename
-        else:
-            logger.warning(f"No filename in metadata for video {video_id}, using default path")
-            return f"videos/{video_id}/original.mp4"
+        return video_path_from_metadata(video_id, get_video_metadata(video_id))
     except Exception as e:
         logger.error(f"Error getting video path for {video_id}: {str(e)}")
+        return f"videos/{video_id}/original.mp4"
+
+# S3 path of a video from user metadata the caller already holds
+def video_path_from_metadata(video_id, metadata):
+
+    if metadata and 'filename' in metadata:
+        # Remove leading slash if present
+        filename = metadata['filename'].lstrip('/')
+        logger.info(f"Using filename from metadata: {filename}")
+        return filename
+    else:
+        logger.warning(f"No filename in metadata for video {video_id}, using default path")
         return f"videos/{video_id}/original.mp4"
\ No newline at end of file
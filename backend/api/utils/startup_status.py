@@ -0,0 +1,26 @@
+import time
+import threading
+
+_lock = threading.Lock()
+_started_at = time.time()
+
+# component -> {"status": "pending" | "ready" | "failed", "error", "since"}
+_components = {}
+
+
+def set_component_status(name, status, error=None):
+
+    with _lock:
+        _components[name] = {"status": status, "error": error, "since": round(time.time() - _started_at, 3)}
+
+
+# Ready once every component registered at startup has initialized successfully
+def get_startup_status():
+
+    with _lock:
+        components = {name: dict(state) for name, state in _components.items()}
+    return {
+        "ready": all(state["status"] == "ready" for state in components.values()),
+        "uptime_seconds": round(time.time() - _started_at, 3),
+        "components": components
+    }
@@ -0,0 +1,55 @@
+import json
+import logging
+import traceback
+from flask import Response, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "ndjson"
+SSE = "sse"
+
+# Emit a summary event after this many per-video events
+SUMMARY_INTERVAL = 10
+
+
+# Pick a streaming mode from the request body or the Accept header, None means a plain JSON response
+def get_stream_mode(request, data):
+
+    stream = data.get('stream')
+    if stream in (NDJSON, SSE):
+        return stream
+    if stream is True:
+        return NDJSON
+
+    accept = request.headers.get('Accept', '')
+    if 'text/event-stream' in accept:
+        return SSE
+    if 'application/x-ndjson' in accept:
+        return NDJSON
+    return None
+
+
+def format_event(event, payload, mode):
+
+    if mode == SSE:
+        return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+    return json.dumps({"event": event, **payload}, default=str) + "\n"
+
+
+# Wrap a generator of (event, payload) pairs in a streaming response
+def stream_events(events, mode):
+
+    def generate():
+        try:
+            for event, payload in events:
+                yield format_event(event, payload, mode)
+        except Exception as e:
+            logger.error(f"Error while streaming events: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield format_event("error", {"error": str(e)}, mode)
+
+    mimetype = 'text/event-stream' if mode == SSE else 'application/x-ndjson'
+    rv = Response(stream_with_context(generate()), mimetype=mimetype)
+    rv.headers['Cache-Control'] = 'no-cache'
+    rv.headers['X-Accel-Buffering'] = 'no'
+    return rv
@@ -0,0 +1,222 @@
+import time
+import logging
+import threading
+from bisect import bisect_left, insort
+
+from config.settings import SUGGEST_MAX_SCAN
+
+logger = logging.getLogger(__name__)
+
+# Catalog columns offered as suggestions
+SUGGEST_SOURCES = ("species", "action", "location", "classification")
+
+# Longer values (full sentences) make poor suggestions
+MAX_TERM_WORDS = 4
+MAX_TERM_LENGTH = 40
+
+# Prefixes up to this length are answered from precomputed top-k lists, so
+# one- and two-letter prefixes never scan the (large) matching key range
+TOP_PREFIX_LENGTH = 3
+TOP_K = 20
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_start_lock = threading.Lock()
+_built = False
+_build_thread = None
+
+# keys: sorted (key, term) pairs. Every term is indexed under each of its word
+# starts, so "mon" finds "capuchin monkey" as well as "monkey".
+# terms: term -> {"text", "types"}; top: short prefix -> best TOP_K terms
+_index = {"keys": [], "terms": {}, "top": {}}
+
+
+def _normalize(text):
+
+    return " ".join(str(text or "").lower().split())
+
+
+def _is_suggestable(term):
+
+    return term and len(term) <= MAX_TERM_LENGTH and len(term.split()) <= MAX_TERM_WORDS
+
+
+def _word_starts(term):
+
+    words = term.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _short_prefixes(term):
+
+    return {key[:length] for key in _word_starts(term)
+            for length in range(1, min(TOP_PREFIX_LENGTH, len(key)) + 1)}
+
+
+def _count(index, term):
+
+    return sum(index["terms"][term]["types"].values())
+
+
+# Terms that start with the prefix rank ahead of mid-term matches, then by frequency
+def _rank(index, term, prefix):
+
+    return (not term.startswith(prefix), -_count(index, term), index["terms"][term]["text"].lower())
+
+
+def _update_top(index, term):
+
+    for prefix in _short_prefixes(term):
+        best = index["top"].setdefault(prefix, [])
+        if term not in best:
+            best.append(term)
+        best.sort(key=lambda t: _rank(index, t, prefix))
+        del best[TOP_K:]
+
+
+# Counts only grow, so a term can only enter a top-k list when it is itself
+# added or counted again; updating its own prefixes keeps every list exact
+def _add_term(index, text, term_type, weight=1, incremental=True):
+
+    term = _normalize(text)
+    if not _is_suggestable(term):
+        return
+
+    entry = index["terms"].get(term)
+    if entry is None:
+        index["terms"][term] = {"text": text.strip(), "types": {term_type: weight}}
+        if incremental:
+            for key in _word_starts(term):
+                insort(index["keys"], (key, term))
+    else:
+        entry["types"][term_type] = entry["types"].get(term_type, 0) + weight
+    if incremental:
+        _update_top(index, term)
+
+
+def _add_row_terms(index, row, incremental=True):
+
+    for source in SUGGEST_SOURCES:
+        if row.get(source):
+            _add_term(index, row[source], source, incremental=incremental)
+
+
+# Build from every video in the local catalog and from the search log. The
+# new index is assembled aside and swapped in, so lookups never wait on it.
+def build_suggest_index():
+
+    global _built, _index
+
+    from api.utils.catalog_index import iter_catalog_rows
+    from api.utils.query_embeddings import count_logged_queries
+
+    started = time.perf_counter()
+    index = {"keys": [], "terms": {}, "top": {}}
+    for row in iter_catalog_rows():
+        _add_row_terms(index, row, incremental=False)
+    for query, count in count_logged_queries().items():
+        _add_term(index, query, "query", count, incremental=False)
+
+    candidates = {}
+    for term in index["terms"]:
+        index["keys"].extend((key, term) for key in _word_starts(term))
+        for prefix in _short_prefixes(term):
+            candidates.setdefault(prefix, []).append(term)
+    index["keys"].sort()
+    for prefix, terms in candidates.items():
+        index["top"][prefix] = sorted(terms, key=lambda t: _rank(index, t, prefix))[:TOP_K]
+
+    with _lock:
+        _index = index
+        _built = True
+
+    logger.info(f"Built suggestion index with {len(index['terms'])} terms in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+def _ensure_built():
+
+    with _build_lock:
+        if not _built:
+            build_suggest_index()
+
+
+def start_build():
+
+    global _build_thread
+
+    with _start_lock:
+        if _built or (_build_thread is not None and _build_thread.is_alive()):
+            return _build_thread
+        _build_thread = threading.Thread(target=_ensure_built, name="suggest-index-build", daemon=True)
+        _build_thread.start()
+        return _build_thread
+
+
+def is_built():
+
+    return _built
+
+
+# Incremental updates, from a newly saved analysis and from submitted searches
+def add_analysis_terms(user_metadata):
+
+    from api.utils.catalog_index import build_catalog_row
+
+    if not _built or not user_metadata or not user_metadata.get("analysis_complete"):
+        return
+    row = build_catalog_row(None, user_metadata)
+    with _lock:
+        _add_row_terms(_index, row)
+
+
+def record_query(query_text):
+
+    if not _built:
+        return
+    with _lock:
+        _add_term(_index, query_text, "query")
+
+
+# Terms with a word starting with the prefix, most frequent first. Nothing is
+# suggested until the background build has finished; keystrokes never wait for it.
+def suggest(prefix, limit=8):
+
+    if not _built:
+        start_build()
+        return []
+
+    prefix = _normalize(prefix)
+    if not prefix:
+        return []
+
+    with _lock:
+        index = _index
+        if len(prefix) <= TOP_PREFIX_LENGTH:
+            terms = list(index["top"].get(prefix, []))
+        else:
+            # Longer prefixes match few keys; the scan is bounded all the same
+            matches = set()
+            keys = index["keys"]
+            i = bisect_left(keys, (prefix,))
+            end = min(len(keys), i + SUGGEST_MAX_SCAN)
+            while i < end and keys[i][0].startswith(prefix):
+                matches.add(keys[i][1])
+                i += 1
+            terms = sorted(matches, key=lambda t: _rank(index, t, prefix))
+
+        suggestions = []
+        for term in terms[:limit]:
+            types = index["terms"][term]["types"]
+            suggestions.append({
+                "text": index["terms"][term]["text"],
+                "type": max(types, key=types.get),
+                "count": sum(types.values())
+            })
+    return suggestions
+
+
+def get_suggest_stats():
+
+    with _lock:
+        return {"built": _built, "terms": len(_index["terms"]), "keys": len(_index["keys"]),
+                "short_prefixes": len(_index["top"])}
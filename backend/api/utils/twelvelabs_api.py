@@ -2,14 +2,28 @@ import requests
 import json
 import logging
 import traceback
-from twelvelabs import TwelveLabs
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from config.settings import API_KEY, INDEX_ID
+from config.settings import API_KEY, INDEX_ID, EMBEDDING_MODEL_NAME, TWELVELABS_MAX_CONCURRENCY
+from api.utils.metadata_writer import is_write_behind_enabled, enqueue_metadata_update, apply_pending_metadata
+from api.utils.metrics import track_upstream
 
 logger = logging.getLogger(__name__)
 
 
+# requests call to the TwelveLabs REST API, timed and counted per operation.
+# Responses with an error status are counted as errors and returned as-is.
+def _request(method, operation, url, **kwargs):
+
+    with track_upstream("twelvelabs", operation) as call:
+        response = requests.request(method, url, **kwargs)
+        call.bytes_sent = len(response.request.body or b"") if response.request is not None else 0
+        call.bytes_received = len(response.content)
+        call.failed = response.status_code >= 400
+        return response
+
+
 # List videos from the TwelveLabs index
 def list_videos(page=1, page_limit=50, sort_by="created_at", sort_option="desc", filename=None):
 
@@ -30,7 +44,7 @@ def list_videos(page=1, page_limit=50, sort_by="created_at", sort_option="desc",
     
     try:
         logger.info(f"Listing videos: page {page}, limit {page_limit}")
-        response = requests.get(url, headers=headers, params=querystring)
+        response = _request("GET", "list_videos", url, headers=headers, params=querystring)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -46,7 +60,7 @@ def get_index_info():
     
     try:
         logger.info(f"Getting index information for {INDEX_ID}")
-        response = requests.get(url, headers=headers)
+        response = _request("GET", "get_index_info", url, headers=headers)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -66,13 +80,24 @@ def get_video_info(video_id, include_embeddings=False):
     
     try:
         logger.info(f"Getting video information for {video_id}")
-        response = requests.get(url, headers=headers, params=params)
+        response = _request("GET", "get_video_info", url, headers=headers, params=params)
         response.raise_for_status()
-        return response.json()
+        return apply_pending_metadata(video_id, response.json())
     except requests.RequestException as e:
         logger.error(f"Error fetching video information: {str(e)}")
         return None
 
+# Information about several videos, fetched concurrently. Returns video_id -> info (None on failure).
+def get_video_infos(video_ids, include_embeddings=False):
+
+    video_ids = list(dict.fromkeys(video_ids))
+    if len(video_ids) <= 1 or TWELVELABS_MAX_CONCURRENCY <= 1:
+        return {video_id: get_video_info(video_id, include_embeddings) for video_id in video_ids}
+    
+    with ThreadPoolExecutor(max_workers=min(TWELVELABS_MAX_CONCURRENCY, len(video_ids))) as executor:
+        infos = executor.map(lambda video_id: get_video_info(video_id, include_embeddings), video_ids)
+        return dict(zip(video_ids, infos))
+
 # Get metadata for a specific video
 def get_video_metadata(video_id):
 
@@ -81,8 +106,15 @@ def get_video_metadata(video_id):
         return video_info.get("user_metadata", {})
     return {}
 
-# Update metadata for a specific video
-def update_video_metadata(video_id, metadata):
+# Cached /api/videos listings and details of the video are stale once its metadata changes
+def _invalidate_video_responses(video_id):
+
+    from api.utils.http_cache import invalidate_cached_responses
+    invalidate_cached_responses("videos:", f"video:{video_id}:")
+
+
+# PUT user metadata fields for a video. TwelveLabs merges the given keys into the existing metadata.
+def put_user_metadata(video_id, metadata):
 
     url = f"https://api.twelvelabs.io/v1.3/indexes/{INDEX_ID}/videos/{video_id}"
     headers = {
@@ -96,9 +128,11 @@ def update_video_metadata(video_id, metadata):
     
     try:
         logger.info(f"Updating metadata for video {video_id}")
-        response = requests.put(url, json=payload, headers=headers)
+        response = _request("PUT", "put_user_metadata", url, json=payload, headers=headers)
         response.raise_for_status()
         
+        _invalidate_video_responses(video_id)
+        
         try:
             response_data = response.json()
             return True, response_data
@@ -119,50 +153,34 @@ def update_video_metadata(video_id, metadata):
         return False, error_msg
 
 
+# Update metadata for a specific video
+def update_video_metadata(video_id, metadata):
+
+    if is_write_behind_enabled():
+        result = enqueue_metadata_update(video_id, metadata)
+        _invalidate_video_responses(video_id)
+        return result
+    
+    return put_user_metadata(video_id, metadata)
+
+
 # Update a single field in the user metadata
 def update_single_field_metadata(video_id, field_name, field_value):
 
     try:
         logger.info(f"Updating single field '{field_name}' for video {video_id}")
         
-        url = f"https://api.twelvelabs.io/v1.3/indexes/{INDEX_ID}/videos/{video_id}"
-        headers = {
-            "x-api-key": API_KEY,
-            "Content-Type": "application/json"
-        }
-        
         if isinstance(field_value, (list, dict)):
-            field_value_str = json.dumps(field_value)
-            logger.debug(f"Converting complex value to string: {field_value_str[:100]}...")
-            
-            # Simple payload with just the one field we want to update
-            payload = {
-                "user_metadata": {
-                    field_name: field_value_str
-                }
-            }
-        else:
-            payload = {
-                "user_metadata": {
-                    field_name: field_value
-                }
-            }
+            field_value = json.dumps(field_value)
+            logger.debug(f"Converting complex value to string: {field_value[:100]}...")
         
-        response = requests.put(url, json=payload, headers=headers)
-        logger.info(f"API response status: {response.status_code}")
+        # Simple payload with just the one field we want to update
+        if is_write_behind_enabled():
+            result = enqueue_metadata_update(video_id, {field_name: field_value})
+            _invalidate_video_responses(video_id)
+            return result
         
-        response.raise_for_status()
-        
-        try:
-            response_data = response.json()
-            return True, response_data
-        except json.JSONDecodeError:
-            if response.status_code in (200, 201, 204):
-                return True, "Success (no JSON response)"
-            else:
-                error_msg = f"Invalid JSON response: {response.text}"
-                logger.error(error_msg)
-                return False, error_msg
+        return put_user_metadata(video_id, {field_name: field_value})
     
     except Exception as e:
         error_msg = f"Error updating metadata field: {str(e)}"
@@ -185,7 +203,7 @@ def get_video_embedding(video_id):
         }
         
         logger.debug(f"Making API request to {video_url} with params: {params}")
-        video_response = requests.get(video_url, headers=headers, params=params)
+        video_response = _request("GET", "get_video_embedding", video_url, headers=headers, params=params)
 
         if video_response.status_code == 404 and "embed_no_embeddings_found" in video_response.text and "audio" in video_response.text:
             logger.warning(f"No audio embeddings found for video {video_id}, retrying with visual-text only")
@@ -194,7 +212,7 @@ def get_video_embedding(video_id):
                 "embedding_option": ["visual-text"]
             }
             
-            video_response = requests.get(video_url, headers=headers, params=params)
+            video_response = _request("GET", "get_video_embedding", video_url, headers=headers, params=params)
         
         if video_response.status_code != 200:
             error_msg = f"API error: {video_response.status_code} - {video_response.text}"
@@ -225,6 +243,32 @@ def get_video_embedding(video_id):
         return {"status": "error", "error": error_msg}
 
 
+# Embed a text query with the Marengo model, returns the float vector or None
+def create_text_embedding(text):
+
+    url = "https://api.twelvelabs.io/v1.3/embed"
+    headers = {"x-api-key": API_KEY}
+    
+    form_data = {
+        "model_name": EMBEDDING_MODEL_NAME,
+        "text": text,
+        "text_truncate": "end"
+    }
+    
+    try:
+        logger.info(f"Creating text embedding for: {text[:50]}")
+        response = _request("POST", "create_text_embedding", url, headers=headers, files={k: (None, v) for k, v in form_data.items()})
+        response.raise_for_status()
+        segments = response.json().get("text_embedding", {}).get("segments", [])
+        if not segments or not segments[0].get("float"):
+            logger.error("Text embedding response contained no vector")
+            return None
+        return segments[0]["float"]
+    except requests.RequestException as e:
+        logger.error(f"Error creating text embedding: {str(e)}")
+        return None
+
+
 # Search for videos using TwelveLabs API
 def search_videos(query_text, search_options=None, page_limit=15, threshold="high"):
 
@@ -233,6 +277,7 @@ def search_videos(query_text, search_options=None, page_limit=15, threshold="hig
         if search_options is None:
             search_options = ['visual']
             
+        from twelvelabs import TwelveLabs
         client = TwelveLabs(api_key=API_KEY)
         
         search_params = {
@@ -249,7 +294,8 @@ def search_videos(query_text, search_options=None, page_limit=15, threshold="hig
             search_params["options"] = search_options
         
         logger.info(f"Searching with params: {search_params}")
-        search_results = client.search.query(**search_params)
+        with track_upstream("twelvelabs", "search"):
+            search_results = client.search.query(**search_params)
         
         return search_results
     except Exception as e:
@@ -262,166 +308,12 @@ def search_by_page_token(page_token):
 
     try:
         logger.info(f"Fetching next page with token: {page_token[:10]}...")
+        from twelvelabs import TwelveLabs
         client = TwelveLabs(api_key=API_KEY)
-        search_results = client.search.by_page_token(page_token=page_token)
+        with track_upstream("twelvelabs", "search_by_page_token"):
+            search_results = client.search.by_page_token(page_token=page_token)
         return search_results
     except Exception as e:
         logger.error(f"Error fetching next page: {str(e)}")
         logger.error(traceback.format_exc())
         return None
-
-
-def normalize_structured_data(data):
-
-    normalized = {}
-    
-    if "Shot" in data:
-        normalized["Shot"] = data["Shot"]
-    elif "shot" in data:
-        normalized["Shot"] = data["shot"]
-    
-    if "Subject" in data:
-        subject = data["Subject"]
-        if isinstance(subject, dict):
-            normalized["Subject"] = subject
-        else:
-            normalized["Subject"] = {"Identification": subject}
-    elif "subject" in data:
-        subject = data["subject"]
-        if isinstance(subject, dict):
-            normalized["Subject"] = subject
-        else:
-            normalized["Subject"] = {"Identification": subject}
-    
-    if "Action" in data:
-        normalized["Action"] = data["Action"]
-    elif "action" in data:
-        normalized["Action"] = data["action"]
-    
-    if "Environment" in data:
-        env = data["Environment"]
-        if isinstance(env, dict):
-            normalized["Environment"] = env
-        else:
-            normalized["Environment"] = {"Description": env}
-    elif "environment" in data:
-        env = data["environment"]
-        if isinstance(env, dict):
-            normalized["Environment"] = env
-        else:
-            normalized["Environment"] = {"Description": env}
-    
-    if "Narrative Flow" in data:
-        normalized["Narrative Flow"] = data["Narrative Flow"]
-    elif "narrative flow" in data:
-        normalized["Narrative Flow"] = data["narrative flow"]
-    elif "NarrativeFlow" in data:
-        normalized["Narrative Flow"] = data["NarrativeFlow"]
-    
-    if "Additional Details" in data:
-        normalized["Additional Details"] = data["Additional Details"]
-    elif "additional details" in data:
-        normalized["Additional Details"] = data["additional details"]
-    elif "AdditionalDetails" in data:
-        normalized["Additional Details"] = data["AdditionalDetails"]
-    
-    return normalized
-
-def parse_unstructured_response(text):
-
-    result = {
-        "Shot": "",
-        "Subject": {
-            "Type": "",
-            "Classification": "",
-            "Species": "",
-            "Count": "",
-            "Identification": "",
-            "Color": ""
-        },
-        "Action": "",
-        "Environment": {
-            "Time": "",
-            "Location": "",
-            "Weather": "",
-            "Position": "",
-            "Climate": ""
-        },
-        "Narrative Flow": "",
-        "Additional Details": ""
-    }
-
-    if not text:
-        return result
-
-    if "shot:" in text.lower():
-        shot_section = text.lower().split("shot:")[1].split("\n")[0]
-        result["Shot"] = shot_section.strip()
-
-    if "subject:" in text.lower():
-        subject_section = text.lower().split("subject:")[1].split("\n")[0]
-        parts = subject_section.split()
-        
-        for type_key in ["animal", "human", "object"]:
-            if type_key in parts:
-                result["Subject"]["Type"] = type_key.capitalize()
-        
-        for class_key in ["mammal", "bird", "reptile", "amphibian", "fish", "insect"]:
-            if class_key in parts:
-                result["Subject"]["Classification"] = class_key.capitalize()
-        
-        for species_key in ["primate", "feline", "canine", "bovine", "equine"]:
-            if species_key in parts:
-                result["Subject"]["Species"] = species_key.capitalize()
-        
-        for count_key in ["single", "multiple", "pair", "group"]:
-            if count_key in parts:
-                result["Subject"]["Count"] = count_key.capitalize()
-        
-        result["Subject"]["Identification"] = subject_section.strip()
-        
-        for color in ["black", "white", "brown", "grey", "gray", "red", "blue", "green", "yellow"]:
-            if color in parts:
-                result["Subject"]["Color"] = color.capitalize()
-    
-    if "action:" in text.lower():
-        action_section = text.lower().split("action:")[1].split("\n")[0]
-        result["Action"] = action_section.strip()
-    
-    if "environment:" in text.lower():
-        env_section = text.lower().split("environment:")[1].split("\n")[0]
-        parts = env_section.split()
-        
-        for time_key in ["day", "night", "dusk", "dawn", "morning", "evening"]:
-            if time_key in parts:
-                result["Environment"]["Time"] = time_key.capitalize()
-
-        for loc_key in ["forest", "urban", "indoor", "outdoor", "rural", "jungle", "desert", "mountain", "beach", "ocean", "river", "lake", "rainforest"]:
-            if loc_key in parts:
-                result["Environment"]["Location"] = loc_key.capitalize()
-        
-        for weather_key in ["sunny", "rainy", "cloudy", "snowy", "foggy", "clear"]:
-            if weather_key in parts:
-                result["Environment"]["Weather"] = weather_key.capitalize()
-        
-        for pos_key in ["topside", "underwater", "aerial", "ground"]:
-            if pos_key in parts:
-                result["Environment"]["Position"] = pos_key.capitalize()
-        
-        for climate_key in ["tropical", "temperate", "arctic", "desert", "mediterranean"]:
-            if climate_key in parts:
-                result["Environment"]["Climate"] = climate_key.capitalize()
-    
-    if "narrative flow:" in text.lower():
-        narrative_section = text.lower().split("narrative flow:")[1]
-        if "\n" in narrative_section:
-            narrative_section = narrative_section.split("\n")[0]
-        result["Narrative Flow"] = narrative_section.strip()
-    
-    if "additional details:" in text.lower():
-        details_section = text.lower().split("additional details:")[1]
-        if "\n" in details_section:
-            details_section = details_section.split("\n")[0]
-        result["Additional Details"] = details_section.strip()
-    
-    return result
\ No newline at end of file
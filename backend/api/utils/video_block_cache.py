@@ -0,0 +1,291 @@
+import os
+import mmap
+import time
+import hashlib
+import tempfile
+import logging
+import threading
+from collections import OrderedDict
+
+from config.settings import (
+    VIDEO_BLOCK_CACHE_DIR,
+    VIDEO_BLOCK_SIZE_KB,
+    VIDEO_BLOCK_CACHE_MAX_MB,
+    VIDEO_BLOCK_CACHE_MAX_REQUEST_MB
+)
+from api.utils.metrics import add_upstream_bytes, record_cache
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = VIDEO_BLOCK_SIZE_KB * 1024
+MAX_BYTES = VIDEO_BLOCK_CACHE_MAX_MB * 1024 * 1024
+
+# Only the first blocks of a large request go through the cache, so one full
+# download cannot flush the hot preview blocks of every other clip
+MAX_REQUEST_BLOCKS = max(1, VIDEO_BLOCK_CACHE_MAX_REQUEST_MB * 1024 * 1024 // BLOCK_SIZE)
+
+# Every gunicorn worker shares the directory, but this LRU only sees its own
+# reads and writes. It is rebuilt from the directory (recency is the file
+# mtime, touched on every read) this often, so the MAX_MB budget holds for the
+# directory as a whole rather than per worker.
+RESCAN_SECONDS = 60
+# Temp files older than this were left by a worker that died mid-write
+STALE_TMP_SECONDS = 3600
+
+_lock = threading.Lock()
+_scanned_at = None
+# Block path -> size, least recently used first
+_lru = OrderedDict()
+_total_bytes = 0
+_stats = {"hits": 0, "misses": 0, "fetches": 0, "evicted": 0}
+
+
+def _init():
+
+    if _scanned_at is None:
+        _scan()
+        if _lru:
+            logger.info(f"Video block cache holds {len(_lru)} blocks ({_total_bytes // (1024 * 1024)} MB)")
+    elif time.time() - _scanned_at >= RESCAN_SECONDS:
+        _scan()
+
+
+# Rebuild the LRU from every block on disk (written by any process), oldest
+# access first, and evict down to the budget
+def _scan():
+
+    global _scanned_at, _total_bytes
+
+    now = time.time()
+    blocks = []
+    for root, _, files in os.walk(VIDEO_BLOCK_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(".blk"):
+                blocks.append((stat.st_mtime, path, stat.st_size))
+            elif name.endswith(".tmp") and now - stat.st_mtime > STALE_TMP_SECONDS:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    _lru.clear()
+    _total_bytes = 0
+    for _, path, size in sorted(blocks):
+        _lru[path] = size
+        _total_bytes += size
+    _scanned_at = now
+    _evict()
+
+
+def _evict():
+
+    global _total_bytes
+
+    while _total_bytes > MAX_BYTES and _lru:
+        path, size = _lru.popitem(last=False)
+        _total_bytes -= size
+        _stats["evicted"] += 1
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Blocks are keyed by (key, etag, index): a changed object gets new blocks
+# and the stale ones age out of the LRU
+def _block_path(s3_key, etag, index):
+
+    digest = hashlib.sha1(f"{s3_key}\0{etag}".encode("utf-8")).hexdigest()
+    return os.path.join(VIDEO_BLOCK_CACHE_DIR, digest[:2], digest, f"{index}.blk")
+
+
+# Blocks stored by another worker since the last scan are adopted on sight
+def _is_cached(path):
+
+    global _total_bytes
+
+    with _lock:
+        _init()
+        if path in _lru:
+            return True
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        _lru[path] = size
+        _total_bytes += size
+        return True
+
+
+def _mark_used(path):
+
+    with _lock:
+        if path in _lru:
+            _lru.move_to_end(path)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _store_block(path, data):
+
+    global _total_bytes
+
+    # Unique across threads and worker processes, so two writers of the same
+    # block never share a temp file; whichever rename lands last wins
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    with _lock:
+        _init()
+        previous = _lru.pop(path, 0)
+        _lru[path] = len(data)
+        _total_bytes += len(data) - previous
+        _evict()
+
+
+def _slice_bounds(index, start, end, block_length):
+
+    block_start = index * BLOCK_SIZE
+    low = max(start, block_start) - block_start
+    high = min(end, block_start + block_length - 1) - block_start + 1
+    return low, high
+
+
+# Yield the requested part of a cached block straight from a memory map,
+# or None if the block was evicted in the meantime
+def _read_cached_block(path, index, start, end, chunk_size):
+
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        low, high = _slice_bounds(index, start, end, len(mm))
+        chunks = [mm[pos:min(pos + chunk_size, high)] for pos in range(low, high, chunk_size)]
+
+    _mark_used(path)
+    return chunks
+
+
+# Fetch blocks first..last with one ranged GET, store each block as it
+# completes and yield the requested bytes from it. The GET is pinned to the
+# indexed ETag; a changed object raises StaleObjectError.
+def _fetch_blocks(s3_client, s3_key, etag, file_size, first, last, start, end, chunk_size):
+    from api.utils.s3_utils import _get_indexed_object
+
+    range_start = first * BLOCK_SIZE
+    range_end = min((last + 1) * BLOCK_SIZE, file_size) - 1
+    _stats["fetches"] += 1
+
+    response = _get_indexed_object(s3_client, s3_key, etag, Range=f"bytes={range_start}-{range_end}")
+
+    index = first
+    buffer = bytearray()
+    # A full or read-only cache directory must not break delivery: the rest
+    # of the fetch is passed through uncached
+    caching = True
+
+    def emit(block):
+        nonlocal caching
+        if caching:
+            try:
+                _store_block(_block_path(s3_key, etag, index), bytes(block))
+            except OSError as e:
+                logger.warning(f"Could not cache blocks of {s3_key}, streaming them uncached: {str(e)}")
+                caching = False
+        low, high = _slice_bounds(index, start, end, len(block))
+        view = memoryview(block)
+        for pos in range(low, high, chunk_size):
+            yield bytes(view[pos:min(pos + chunk_size, high)])
+
+    for chunk in response["Body"].iter_chunks(chunk_size=max(chunk_size, 64 * 1024)):
+        add_upstream_bytes("s3", "get_object", received=len(chunk))
+        buffer += chunk
+        while len(buffer) >= BLOCK_SIZE:
+            block = buffer[:BLOCK_SIZE]
+            del buffer[:BLOCK_SIZE]
+            yield from emit(block)
+            index += 1
+
+    # Final, shorter block at the end of the object
+    if buffer:
+        yield from emit(buffer)
+
+
+# Bytes start..end (inclusive) of an object, served from cached blocks where
+# possible. Runs of missing blocks are fetched with one coalesced range each.
+def iter_cached_range(s3_client, s3_key, etag, file_size, start, end, chunk_size=8192):
+    from api.utils.s3_utils import _get_indexed_object
+
+    first = start // BLOCK_SIZE
+    last = end // BLOCK_SIZE
+    cached_last = min(last, first + MAX_REQUEST_BLOCKS - 1)
+
+    # Anything past the cached window is streamed straight from S3. It is
+    # requested before the first byte is yielded, so a changed object is
+    # noticed while the response headers can still be corrected.
+    tail = None
+    if cached_last < last:
+        range_start = (cached_last + 1) * BLOCK_SIZE
+        tail = _get_indexed_object(s3_client, s3_key, etag, Range=f"bytes={range_start}-{end}")
+
+    try:
+        index = first
+        while index <= cached_last:
+            path = _block_path(s3_key, etag, index)
+            if _is_cached(path):
+                chunks = _read_cached_block(path, index, start, end, chunk_size)
+                if chunks is not None:
+                    _stats["hits"] += 1
+                    record_cache("video_block", True)
+                    yield from chunks
+                    index += 1
+                    continue
+
+            run_end = index
+            while run_end < cached_last and not _is_cached(_block_path(s3_key, etag, run_end + 1)):
+                run_end += 1
+            _stats["misses"] += run_end - index + 1
+            record_cache("video_block", False, run_end - index + 1)
+            yield from _fetch_blocks(s3_client, s3_key, etag, file_size, index, run_end, start, end, chunk_size)
+            index = run_end + 1
+
+        if tail is not None:
+            for chunk in tail["Body"].iter_chunks(chunk_size=chunk_size):
+                add_upstream_bytes("s3", "get_object", received=len(chunk))
+                yield chunk
+    finally:
+        if tail is not None:
+            tail["Body"].close()
+
+
+def get_block_cache_stats():
+
+    with _lock:
+        _init()
+        return {
+            "blocks": len(_lru),
+            "bytes": _total_bytes,
+            "max_bytes": MAX_BYTES,
+            "block_size": BLOCK_SIZE,
+            **_stats
+        }
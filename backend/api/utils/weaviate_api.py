@@ -1,56 +1,241 @@
-import weaviate
-from weaviate.auth import AuthApiKey
-from weaviate.classes.config import Configure, Property, DataType, VectorDistances
-from weaviate.util import generate_uuid5
+import time
 import logging
+import threading
 import traceback
 
-from config.settings import WEAVIATE_URL, WEAVIATE_API_KEY
+from config.settings import WEAVIATE_URL, WEAVIATE_API_KEY, WEAVIATE_RETRY_SECONDS
+from api.utils.catalog_index import build_catalog_row, FACETS
+from api.utils.startup_status import set_component_status
+from api.utils.metrics import track_upstream
 
 logger = logging.getLogger(__name__)
 
+# Analysis text stored on each object for BM25, keyed by the catalog column it comes from
+ANALYSIS_TEXT_PROPERTIES = {
+    "summary": "summary",
+    "subject": "subject",
+    "action": "action",
+    "environment": "environment",
+    "narrative": "narrative_flow",
+    "details": "additional_details",
+}
+
+# Analysis facets (shot, species, position, ...) stored as filterable text with the catalog's names
+FILTER_PROPERTIES = FACETS
+
+# Properties searched by the keyword half of hybrid search; the summary counts double
+HYBRID_QUERY_PROPERTIES = ["summary^2"] + [
+    name for name in ANALYSIS_TEXT_PROPERTIES.values() if name != "summary"
+] + list(FILTER_PROPERTIES)
+
+SEARCH_RETURN_PROPERTIES = ["video_id", "filename", "embedding_type", "scope", "summary"] + list(FILTER_PROPERTIES)
+
 
 weaviate_client = None
+# Serializes connecting, so a request arriving during the background connect waits for it
+_client_lock = threading.RLock()
+# Time of the last failed connect. After a failure requests no longer connect
+# themselves; a background thread retries every WEAVIATE_RETRY_SECONDS.
+_failed_at = None
+_reconnect_thread = None
+# Guards _reconnect_thread only. Never _client_lock, which is held for the
+# whole of a connect: requests must not wait on it once a connect has failed.
+_reconnect_lock = threading.Lock()
 
 def init_weaviate_client():
 
-    global weaviate_client
+    global weaviate_client, _failed_at
     
     if not WEAVIATE_URL or not WEAVIATE_API_KEY:
         logger.error("WEAVIATE_URL or WEAVIATE_API_KEY environment variables not set")
+        set_component_status("weaviate", "failed", "WEAVIATE_URL or WEAVIATE_API_KEY not set")
+        _failed_at = time.time()
         return False
     
-    try:
-        weaviate_client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=WEAVIATE_URL,
-            auth_credentials=AuthApiKey(WEAVIATE_API_KEY),
-        )
-        
-        if not weaviate_client.is_ready():
-            logger.error("Weaviate client is not ready")
-            return False
+    # The SDK is imported here rather than with the routes; it is the slowest import by far
+    import weaviate
+    from weaviate.auth import AuthApiKey
+    
+    with _client_lock:
+        try:
+            with track_upstream("weaviate", "connect"):
+                weaviate_client = weaviate.connect_to_weaviate_cloud(
+                    cluster_url=WEAVIATE_URL,
+                    auth_credentials=AuthApiKey(WEAVIATE_API_KEY),
+                )
             
-        logger.info("Weaviate client initialized successfully")
-        return True
-    except Exception as e:
-        logger.error(f"Error initializing Weaviate client: {str(e)}")
-        logger.error(traceback.format_exc())
-        return False
+            if not weaviate_client.is_ready():
+                logger.error("Weaviate client is not ready")
+                set_component_status("weaviate", "failed", "Weaviate is not ready")
+                close_weaviate_client()
+                _failed_at = time.time()
+                return False
+                
+            logger.info("Weaviate client initialized successfully")
+            set_component_status("weaviate", "ready")
+            _failed_at = None
+            return True
+        except Exception as e:
+            logger.error(f"Error initializing Weaviate client: {str(e)}")
+            logger.error(traceback.format_exc())
+            set_component_status("weaviate", "failed", str(e))
+            weaviate_client = None
+            _failed_at = time.time()
+            return False
 
+# The client, connecting on first use if startup has not connected it yet.
+# Once a connect has failed this never blocks: it returns None and leaves
+# the retry to the background reconnect thread.
 def get_weaviate_client():
 
-    global weaviate_client
-    
     if weaviate_client is None:
-        init_weaviate_client()
+        if _failed_at is not None:
+            _schedule_reconnect()
+            return None
+        with _client_lock:
+            if weaviate_client is None and _failed_at is None:
+                init_weaviate_client()
         
     return weaviate_client
 
+def _schedule_reconnect():
+
+    global _reconnect_thread
+    
+    if not WEAVIATE_URL or not WEAVIATE_API_KEY:
+        return
+    with _reconnect_lock:
+        if _reconnect_thread is not None and _reconnect_thread.is_alive():
+            return
+        _reconnect_thread = threading.Thread(target=_reconnect, name="weaviate-reconnect", daemon=True)
+        _reconnect_thread.start()
+
+# Wait out the rest of the retry window, connect, and finish the schema check
+# that startup could not do without a client
+def _reconnect():
+
+    from api.utils.startup_status import get_startup_status
+    
+    failed_at = _failed_at
+    if failed_at is not None:
+        time.sleep(max(0.0, failed_at + WEAVIATE_RETRY_SECONDS - time.time()))
+    if weaviate_client is None and init_weaviate_client():
+        schema = get_startup_status()["components"].get("weaviate_schema", {})
+        if schema.get("status") != "ready":
+            create_videos_schema()
+
+# Forget a client inherited from the parent process after a fork. Its gRPC
+# channel belongs to the parent, so it is dropped without being closed and
+# the worker connects again on first use.
+def reset_weaviate_client():
+
+    global weaviate_client, _failed_at, _reconnect_thread, _reconnect_lock
+    weaviate_client = None
+    _failed_at = None
+    _reconnect_thread = None
+    # The parent may have held it at the fork
+    _reconnect_lock = threading.Lock()
+
+def close_weaviate_client():
+
+    global weaviate_client
+    
+    if weaviate_client is not None:
+        try:
+            weaviate_client.close()
+            logger.info("Weaviate client closed")
+        except Exception as e:
+            logger.error(f"Error closing Weaviate client: {str(e)}")
+        weaviate_client = None
+
+def video_properties():
+
+    from weaviate.classes.config import Property, DataType
+
+    return [
+        Property(name="video_id", data_type=DataType.TEXT, description="Twelve Labs video ID"),
+        Property(name="filename", data_type=DataType.TEXT, description="Original filename"),
+        Property(name="duration", data_type=DataType.NUMBER, description="Video duration in seconds"),
+        Property(name="embedding_type", data_type=DataType.TEXT, description="Type of embedding (visual-text, audio)"),
+        Property(name="scope", data_type=DataType.TEXT, description="Scope of embedding (clip, video)"),
+        Property(name="start_time", data_type=DataType.NUMBER, description="Start time of the clip"),
+        Property(name="end_time", data_type=DataType.NUMBER, description="End time of the clip"),
+    ] + analysis_properties()
+
+
+def analysis_properties():
+
+    from weaviate.classes.config import Property, DataType, Tokenization
+
+    properties = [
+        Property(
+            name=name, data_type=DataType.TEXT, tokenization=Tokenization.WORD,
+            index_searchable=True, index_filterable=False, description=f"Analysis {name.replace('_', ' ')}"
+        )
+        for name in ANALYSIS_TEXT_PROPERTIES.values()
+    ]
+    properties += [
+        Property(
+            name=name, data_type=DataType.TEXT, tokenization=Tokenization.WORD,
+            index_searchable=True, index_filterable=True, description=f"Analysis {name.replace('_', ' ')} facet"
+        )
+        for name in FILTER_PROPERTIES
+    ]
+    return properties
+
+
+# Collections created before the analysis properties existed get them added in place
+def ensure_analysis_properties(collection):
+
+    existing = {prop.name for prop in collection.config.get().properties}
+    for prop in analysis_properties():
+        if prop.name not in existing:
+            collection.config.add_property(prop)
+            logger.info(f"Added property {prop.name} to NatureVideo collection")
+
+
+# Object properties for the analysis fields in a video's user_metadata
+def build_analysis_properties(user_metadata):
+
+    if not user_metadata or not user_metadata.get("analysis_complete"):
+        return {}
+
+    row = build_catalog_row(None, user_metadata)
+    properties = {name: row[column] or "" for column, name in ANALYSIS_TEXT_PROPERTIES.items()}
+    properties.update({name: row[name] or "" for name in FILTER_PROPERTIES})
+    return properties
+
+
+# Property filters ({"position": "underwater", ...}) as a Weaviate filter, or None.
+# Facets are word tokenized, so "underwater" matches "Underwater" and
+# "monkey" matches "Capuchin Monkey".
+def build_property_filters(filters, exclude_video_id=None):
+
+    from weaviate.classes.query import Filter
+
+    conditions = [
+        Filter.by_property(name).equal(value)
+        for name, value in (filters or {}).items()
+        if name in FILTER_PROPERTIES and value
+    ]
+    if exclude_video_id:
+        conditions.append(Filter.by_property("video_id").not_equal(exclude_video_id))
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return Filter.all_of(conditions)
+
+
 def create_videos_schema():
 
+    from weaviate.classes.config import Configure, VectorDistances
+
     client = get_weaviate_client()
     if not client:
         logger.error("Weaviate client not initialized")
+        set_component_status("weaviate_schema", "failed", "Weaviate client not initialized")
         return False
 
     try:
@@ -66,27 +251,24 @@ def create_videos_schema():
                     max_connections=16,
                     vector_cache_max_objects=1000000
                 ),
-                properties=[
-                    Property(name="video_id", data_type=DataType.TEXT, description="Twelve Labs video ID"),
-                    Property(name="filename", data_type=DataType.TEXT, description="Original filename"),
-                    Property(name="duration", data_type=DataType.NUMBER, description="Video duration in seconds"),
-                    Property(name="embedding_type", data_type=DataType.TEXT, description="Type of embedding (visual-text, audio)"),
-                    Property(name="scope", data_type=DataType.TEXT, description="Scope of embedding (clip, video)"),
-                    Property(name="start_time", data_type=DataType.NUMBER, description="Start time of the clip"),
-                    Property(name="end_time", data_type=DataType.NUMBER, description="End time of the clip"),
-                ]
+                properties=video_properties()
             )
             logger.info("Created NatureVideo collection in Weaviate")
         else:
             logger.info("NatureVideo collection already exists in Weaviate")
+            ensure_analysis_properties(client.collections.get("NatureVideo"))
+        set_component_status("weaviate_schema", "ready")
         return True
     except Exception as e:
         logger.error(f"Failed to create collection: {str(e)}")
         logger.error(traceback.format_exc())
+        set_component_status("weaviate_schema", "failed", str(e))
         return False
 
 def recreate_videos_schema(vector_dimensions=None):
 
+    from weaviate.classes.config import Configure, VectorDistances
+
     client = get_weaviate_client()
     if not client:
         logger.error("Weaviate client not initialized")
@@ -109,15 +291,7 @@ def recreate_videos_schema(vector_dimensions=None):
                 max_connections=16,
                 vector_cache_max_objects=1000000
             ),
-            properties=[
-                Property(name="video_id", data_type=DataType.TEXT, description="Twelve Labs video ID"),
-                Property(name="filename", data_type=DataType.TEXT, description="Original filename"),
-                Property(name="duration", data_type=DataType.NUMBER, description="Video duration in seconds"),
-                Property(name="embedding_type", data_type=DataType.TEXT, description="Type of embedding (visual-text, audio)"),
-                Property(name="scope", data_type=DataType.TEXT, description="Scope of embedding (clip, video)"),
-                Property(name="start_time", data_type=DataType.NUMBER, description="Start time of the clip"),
-                Property(name="end_time", data_type=DataType.NUMBER, description="End time of the clip"),
-            ]
+            properties=video_properties()
         )
         
         dimensions_info = f" with {vector_dimensions} dimensions" if vector_dimensions else ""
@@ -129,6 +303,7 @@ def recreate_videos_schema(vector_dimensions=None):
         return False
 
 def store_video_embedding(video_id, embedding_data, video_metadata=None):
+    from weaviate.util import generate_uuid5
     client = get_weaviate_client()
     if not client:
         logger.error("Weaviate client not initialized")
@@ -182,11 +357,13 @@ def store_video_embedding(video_id, embedding_data, video_metadata=None):
             "start_time": start_time,
             "end_time": end_time
         }
+        properties.update(build_analysis_properties(video_metadata.get("user_metadata", {})))
 
         object_id = f"{video_id}_{embedding_type}_{scope}"
         object_uuid = generate_uuid5(object_id)
 
-        collection.data.insert(properties=properties, vector=vector, uuid=object_uuid)
+        with track_upstream("weaviate", "insert"):
+            collection.data.insert(properties=properties, vector=vector, uuid=object_uuid)
         logger.info(f"Stored visual embedding for video {video_id}")
 
         return True
@@ -197,9 +374,173 @@ def store_video_embedding(video_id, embedding_data, video_metadata=None):
         return False
 
 
+# Write a video's analysis fields onto its objects, called after each analysis
+def update_analysis_properties(video_id, user_metadata):
 
+    from weaviate.classes.query import Filter
+
+    properties = build_analysis_properties(user_metadata)
+    if not properties:
+        return False
 
-def find_similar_videos(video_id, embedding_vector=None, limit=10):
+    client = get_weaviate_client()
+    if not client:
+        logger.error("Weaviate client not initialized")
+        return False
+
+    collection = client.collections.get("NatureVideo")
+    with track_upstream("weaviate", "fetch_objects"):
+        response = collection.query.fetch_objects(
+            filters=Filter.by_property("video_id").equal(video_id),
+            limit=10,
+            return_properties=["video_id"]
+        )
+
+    for obj in response.objects:
+        with track_upstream("weaviate", "update"):
+            collection.data.update(uuid=obj.uuid, properties=properties)
+
+    logger.info(f"Updated analysis properties on {len(response.objects)} Weaviate objects for video {video_id}")
+    return len(response.objects) > 0
+
+
+# Copy the analysis fields of every video in the local catalog onto its Weaviate objects
+def sync_analysis_properties():
+
+    from weaviate.classes.query import Filter
+    from api.utils.catalog_index import iter_catalog_rows
+
+    client = get_weaviate_client()
+    if not client:
+        return {"error": "Weaviate client not initialized"}
+
+    collection = client.collections.get("NatureVideo")
+    ensure_analysis_properties(collection)
+
+    updated = 0
+    missing = 0
+    for row in iter_catalog_rows():
+        properties = {name: row[column] or "" for column, name in ANALYSIS_TEXT_PROPERTIES.items()}
+        properties.update({name: row[name] or "" for name in FILTER_PROPERTIES})
+
+        with track_upstream("weaviate", "fetch_objects"):
+            response = collection.query.fetch_objects(
+                filters=Filter.by_property("video_id").equal(row["video_id"]),
+                limit=10,
+                return_properties=["video_id"]
+            )
+        if not response.objects:
+            missing += 1
+            continue
+        for obj in response.objects:
+            with track_upstream("weaviate", "update"):
+                collection.data.update(uuid=obj.uuid, properties=properties)
+        updated += 1
+
+    logger.info(f"Synced analysis properties for {updated} videos ({missing} not in Weaviate)")
+    return {"updated": updated, "not_in_weaviate": missing}
+
+
+def _format_search_object(obj, score_key, score):
+
+    props = obj.properties
+    return {
+        "video_id": props.get("video_id"),
+        "filename": props.get("filename"),
+        "embedding_type": props.get("embedding_type"),
+        "scope": props.get("scope"),
+        "summary": props.get("summary") or None,
+        "facets": {name: props.get(name) or None for name in FILTER_PROPERTIES},
+        score_key: score
+    }
+
+
+# Hybrid BM25 + vector search over the analysis text. alpha=0 is pure keyword,
+# alpha=1 pure vector. The collection has no vectorizer, so the query vector is
+# a Marengo text embedding; if it cannot be created the search runs as BM25 only.
+def hybrid_search(query_text, alpha=0.5, limit=10, filters=None):
+
+    from weaviate.classes.query import MetadataQuery
+
+    client = get_weaviate_client()
+    if not client:
+        logger.error("Weaviate client not initialized")
+        return None
+
+    vector = None
+    if alpha > 0:
+        from api.utils.query_embeddings import get_query_embedding
+        vector = get_query_embedding(query_text)
+        if vector is None:
+            logger.warning("Falling back to keyword-only hybrid search")
+            alpha = 0
+
+    collection = client.collections.get("NatureVideo")
+    with track_upstream("weaviate", "hybrid"):
+        response = collection.query.hybrid(
+            query=query_text,
+            alpha=alpha,
+            vector=vector,
+            query_properties=HYBRID_QUERY_PROPERTIES,
+            filters=build_property_filters(filters),
+            limit=limit,
+            return_properties=SEARCH_RETURN_PROPERTIES,
+            return_metadata=MetadataQuery(score=True)
+        )
+
+    results = []
+    seen = set()
+    for obj in response.objects:
+        video_id = obj.properties.get("video_id")
+        if video_id in seen:
+            continue
+        seen.add(video_id)
+        results.append(_format_search_object(obj, "score", obj.metadata.score))
+
+    return {"alpha": alpha, "results": results}
+
+
+# Nearest videos to a query vector, one result per video, best first
+def search_by_vector(vector, limit=15, offset=0, filters=None):
+
+    from weaviate.classes.query import MetadataQuery
+
+    client = get_weaviate_client()
+    if not client:
+        logger.error("Weaviate client not initialized")
+        return None
+
+    collection = client.collections.get("NatureVideo")
+    with track_upstream("weaviate", "near_vector"):
+        response = collection.query.near_vector(
+            near_vector=vector,
+            limit=limit,
+            offset=offset,
+            filters=build_property_filters(filters),
+            return_properties=["video_id", "filename", "scope", "start_time", "end_time"],
+            return_metadata=MetadataQuery(certainty=True)
+        )
+
+    results = []
+    seen = set()
+    for obj in response.objects:
+        props = obj.properties
+        if props.get("video_id") in seen:
+            continue
+        seen.add(props.get("video_id"))
+        results.append({
+            "video_id": props.get("video_id"),
+            "filename": props.get("filename"),
+            "scope": props.get("scope"),
+            "start_time": props.get("start_time"),
+            "end_time": props.get("end_time"),
+            "certainty": obj.metadata.certainty
+        })
+
+    return results
+
+
+def find_similar_videos(video_id, embedding_vector=None, limit=10, filters=None):
     client = get_weaviate_client()
     if not client:
         logger.error("Weaviate client not initialized")
@@ -243,14 +584,17 @@ def find_similar_videos(video_id, embedding_vector=None, limit=10):
     
         collection = client.collections.get("NatureVideo")
         
-        # Search for similar videos 
-        logger.info(f"Searching Weaviate for similar videos (limit: {limit + 1})")
-        results = collection.query.near_vector(
-            near_vector=embedding_vector,
-            limit=limit + 1,
-            return_properties=["video_id", "filename", "embedding_type", "scope"],
-            return_metadata=["certainty"]
-        )
+        # Search for similar videos; the source video and any property filters
+        # are applied inside the vector search
+        logger.info(f"Searching Weaviate for similar videos (limit: {limit}, filters: {filters})")
+        with track_upstream("weaviate", "near_vector"):
+            results = collection.query.near_vector(
+                near_vector=embedding_vector,
+                limit=limit,
+                filters=build_property_filters(filters, exclude_video_id=video_id),
+                return_properties=["video_id", "filename", "embedding_type", "scope"],
+                return_metadata=["certainty"]
+            )
         
         similar_videos = []
         for obj in results.objects:
@@ -293,17 +637,19 @@ def get_collection_stats():
         
         collection = client.collections.get("NatureVideo")
         try:
-            aggregate_response = collection.aggregate.over_all(total_count=True)
+            with track_upstream("weaviate", "aggregate"):
+                aggregate_response = collection.aggregate.over_all(total_count=True)
             total_count = aggregate_response.total_count
         except Exception as e:
             logger.error(f"Error getting aggregate count: {str(e)}")
             total_count = 0
         
         try:
-            response = collection.query.fetch_objects(
-                limit=2000,
-                return_properties=["video_id", "embedding_type", "scope"]
-            )
+            with track_upstream("weaviate", "fetch_objects"):
+                response = collection.query.fetch_objects(
+                    limit=2000,
+                    return_properties=["video_id", "embedding_type", "scope"]
+                )
             
             objects = []
             for obj in response.objects:
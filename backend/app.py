@@ -1,4 +1,6 @@
 import os
+import fcntl
+import threading
 from flask import Flask
 from flask_cors import CORS
 import logging
@@ -8,7 +10,9 @@ from datetime import datetime
 
 from config.settings import (
     DEBUG, PORT, APP_URL, LOG_LEVEL, LOG_FILE,
-    SCHEDULER_ENABLED, PING_INTERVAL_MINUTES
+    SCHEDULER_ENABLED, PING_INTERVAL_MINUTES,
+    QUERY_EMBEDDING_PREWARM_COUNT, S3_KEY_INDEX_REFRESH_MINUTES,
+    PRIMARY_LOCK_FILE
 )
 
 
@@ -22,7 +26,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def create_app():
+_scheduler = None
+_primary_lock = None
+
+# With start_background=False (gunicorn preload) nothing that holds a
+# connection or a thread is created; each worker calls init_worker after the fork
+def create_app(start_background=True):
 
     app = Flask(__name__)
     CORS(app, resources={r"/*": {"origins": "*"}})
@@ -34,6 +43,10 @@ def create_app():
     from api.routes.analysis import analysis_bp
     from api.routes.embedding import embedding_bp
     from api.routes.weaviate import weaviate_bp
+    from api.routes.catalog import catalog_bp
+    from api.routes.health import health_bp
+    from api.routes.metrics import metrics_bp
+    from api.utils.metrics import instrument_app
     
     app.register_blueprint(index_bp, url_prefix='/api')
     app.register_blueprint(video_bp, url_prefix='/api')
@@ -41,21 +54,136 @@ def create_app():
     app.register_blueprint(analysis_bp, url_prefix='/api')
     app.register_blueprint(embedding_bp, url_prefix='/api')
     app.register_blueprint(weaviate_bp, url_prefix='/api')
+    app.register_blueprint(catalog_bp, url_prefix='/api')
+    app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
+    
+    # Per-route request timing for /metrics
+    instrument_app(app)
     
     @app.route('/')
     def home():
         return "Nature Footage Platform API is running! Current time - " + str(datetime.now())
     
-    # Initialize Weaviate client
-    from api.utils.weaviate_api import init_weaviate_client, create_videos_schema
-    if init_weaviate_client():
+    if start_background:
+        # Single-process server: metric files of an earlier run are stale
+        # (gunicorn clears them in its on_starting hook instead)
+        from api.utils.metrics import clear_shared_metrics
+        clear_shared_metrics()
+        start_background_tasks()
+    
+    return app
+
+# Drop clients inherited from the preloading parent and start this worker's own tasks
+def init_worker():
+
+    from api.utils.s3_utils import reset_s3_client
+    from api.utils.generate_analysis import reset_lambda_client
+    from api.utils.weaviate_api import reset_weaviate_client
+    from api.utils.metrics import reset_metrics
+    
+    reset_s3_client()
+    reset_lambda_client()
+    reset_weaviate_client()
+    reset_metrics()
+    start_background_tasks()
+
+# Nothing here blocks serving: connections and the schema check run on a
+# background thread, and requests that need Weaviate before it is done wait
+# for the connect (or make it themselves) through get_weaviate_client. If
+# that connect fails, they go without Weaviate while it is retried in the background.
+def start_background_tasks():
+
+    from api.utils.startup_status import set_component_status
+    
+    set_component_status("weaviate", "pending")
+    set_component_status("weaviate_schema", "pending")
+    primary = acquire_primary_lock()
+    
+    # Write this process's metrics where /metrics in any worker can sum them
+    from api.utils.metrics import start_metrics_flush
+    start_metrics_flush()
+    
+    threading.Thread(target=_deferred_startup, args=(primary,), name="deferred-startup", daemon=True).start()
+    
+    # Embed the most frequent logged search queries in the background. The
+    # disk store is shared, so one process does it and the others read it
+    if primary and QUERY_EMBEDDING_PREWARM_COUNT > 0:
+        from api.utils.query_embeddings import start_prewarm
+        start_prewarm()
+    
+    # Build the search suggestion index before the first keystroke needs it
+    from api.utils.suggest_index import start_build
+    start_build()
+    
+    # Probe S3, Weaviate and TwelveLabs periodically so /api/test answers from
+    # memory; one process probes and shares the result with the others
+    if primary:
+        from api.utils.health_monitor import start_health_monitor
+        start_health_monitor()
+
+def _deferred_startup(primary):
+
+    # Connect the Weaviate client, unless a request already has, and check the schema
+    from api.utils.weaviate_api import get_weaviate_client, create_videos_schema
+    if get_weaviate_client() is not None:
         create_videos_schema()
+    else:
+        from api.utils.startup_status import set_component_status
+        set_component_status("weaviate_schema", "failed", "Weaviate client not initialized")
     
-    # Set up scheduler
-    if SCHEDULER_ENABLED:
-        setup_scheduler()
+    # Work shared through files runs in one process only
+    if primary:
+        # Crawl the bucket for the filename -> S3 key index if it has never been built
+        from api.utils.s3_key_index import ensure_s3_key_index
+        ensure_s3_key_index()
+        
+        # Set up scheduler
+        if SCHEDULER_ENABLED:
+            setup_scheduler()
+
+# Non-blocking exclusive lock held for the life of the process; the first
+# worker to start wins, and another one takes over when it exits
+def acquire_primary_lock():
+
+    global _primary_lock
     
-    return app
+    if _primary_lock is not None:
+        return True
+    
+    directory = os.path.dirname(PRIMARY_LOCK_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(PRIMARY_LOCK_FILE, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    
+    _primary_lock = lock_file
+    logger.info(f"Process {os.getpid()} is the primary process (scheduler, S3 key crawl)")
+    return True
+
+# Stop the scheduler, write out queued metadata updates and close the Weaviate connection
+def shutdown_app():
+
+    global _scheduler
+    
+    from api.utils.metadata_writer import flush_metadata_updates
+    from api.utils.weaviate_api import close_weaviate_client
+    from api.utils.metrics import flush_metrics
+    
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+    
+    result = flush_metadata_updates()
+    if result["flushed"] or result["failed"]:
+        logger.info(f"Flushed pending metadata on shutdown: {result}")
+    
+    close_weaviate_client()
+    flush_metrics()
 
 def wake_up_app():
     try:
@@ -73,16 +201,24 @@ def wake_up_app():
 def setup_scheduler():
     from apscheduler.schedulers.background import BackgroundScheduler
     
+    global _scheduler
+    
     scheduler = BackgroundScheduler()
     scheduler.add_job(wake_up_app, 'interval', minutes=PING_INTERVAL_MINUTES)
     
+    # Pick up new and changed objects in the S3 key index
+    if S3_KEY_INDEX_REFRESH_MINUTES > 0:
+        from api.utils.s3_key_index import start_crawl
+        scheduler.add_job(start_crawl, 'interval', minutes=S3_KEY_INDEX_REFRESH_MINUTES)
+    
     # schedular for the embedding job creation
     # scheduler.add_job(update_embeddings, 'interval', hours=EMBEDDING_UPDATE_HOURS)
     
     scheduler.start()
-    atexit.register(lambda: scheduler.shutdown())
+    _scheduler = scheduler
     logger.info("Background scheduler started.")
 
 if __name__ == '__main__':
     app = create_app()
+    atexit.register(shutdown_app)
     app.run(debug=DEBUG, port=PORT)
\ No newline at end of file
@@ -11,19 +11,95 @@ AWS_SECRET_ACCESS_KEY = os.getenv("TL_AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("TL_AWS_REGION", "us-east-1")
 S3_BUCKET_NAME = os.getenv("TL_S3_BUCKET_NAME")
 
+# Filename -> S3 key index built by crawling the bucket
+S3_KEY_INDEX_FILE = os.getenv("S3_KEY_INDEX_FILE", "cache/s3_key_index.json")
+S3_KEY_INDEX_PREFIX = os.getenv("S3_KEY_INDEX_PREFIX", "")
+S3_KEY_INDEX_REFRESH_MINUTES = int(os.getenv("S3_KEY_INDEX_REFRESH_MINUTES", "60"))
+
+# How /api/video delivers bytes: "proxy" (through Flask), "redirect" (302 to a
+# presigned S3 URL) or "json" (presigned URL in a JSON body)
+VIDEO_DELIVERY_MODE = os.getenv("VIDEO_DELIVERY_MODE", "proxy")
+PRESIGNED_URL_EXPIRY_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRY_SECONDS", "900"))
+
+# Proxied video chunks start at the minimum size and double up to the maximum
+VIDEO_STREAM_MIN_CHUNK_KB = int(os.getenv("VIDEO_STREAM_MIN_CHUNK_KB", "256"))
+VIDEO_STREAM_MAX_CHUNK_KB = int(os.getenv("VIDEO_STREAM_MAX_CHUNK_KB", "1024"))
+
+# Disk cache of proxied video bytes in aligned blocks, keyed by (key, etag, block)
+VIDEO_BLOCK_CACHE_ENABLED = os.getenv("VIDEO_BLOCK_CACHE_ENABLED", "True").lower() == "true"
+VIDEO_BLOCK_CACHE_DIR = os.getenv("VIDEO_BLOCK_CACHE_DIR", "cache/video_blocks")
+VIDEO_BLOCK_SIZE_KB = int(os.getenv("VIDEO_BLOCK_SIZE_KB", "1024"))
+VIDEO_BLOCK_CACHE_MAX_MB = int(os.getenv("VIDEO_BLOCK_CACHE_MAX_MB", "1024"))
+VIDEO_BLOCK_CACHE_MAX_REQUEST_MB = int(os.getenv("VIDEO_BLOCK_CACHE_MAX_REQUEST_MB", "16"))
+
+# Browser/CDN lifetime of proxied video responses (objects are revalidated by ETag)
+VIDEO_CACHE_MAX_AGE = int(os.getenv("VIDEO_CACHE_MAX_AGE", "86400"))
+
+# Seconds TwelveLabs JSON responses are reused server-side and by clients
+API_CACHE_TTL_VIDEOS = int(os.getenv("API_CACHE_TTL_VIDEOS", "30"))
+API_CACHE_TTL_VIDEO_INFO = int(os.getenv("API_CACHE_TTL_VIDEO_INFO", "60"))
+API_CACHE_TTL_INDEX = int(os.getenv("API_CACHE_TTL_INDEX", "300"))
+
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
+# After a failed connect, requests skip Weaviate and a background retry runs this often
+WEAVIATE_RETRY_SECONDS = int(os.getenv("WEAVIATE_RETRY_SECONDS", "30"))
 
 LAMBDA_FUNCTION_NAME = os.getenv("LAMBDA_FUNCTION_NAME", "pegasus-video-analysis")
 
+# Analysis cache. ANALYSIS_MODEL_NAME only labels cache entries (the model is
+# set on the TwelveLabs index); update it when the index's model changes.
+ANALYSIS_MODEL_NAME = os.getenv("ANALYSIS_MODEL_NAME", "pegasus1.2")
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "cache/analysis")
+
+# Resumable batch analysis checkpoints
+BATCH_ANALYSIS_CHECKPOINT_DIR = os.getenv("BATCH_ANALYSIS_CHECKPOINT_DIR", "cache/batch_analysis")
+
+# Marengo model used to embed search text into the same space as the video embeddings
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "Marengo-retrieval-2.7")
+
+# Query embedding cache (SQLite, evicted by size, pre-warmed from past queries)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1000"))
+QUERY_EMBEDDING_CACHE_FILE = os.getenv("QUERY_EMBEDDING_CACHE_FILE", "cache/query_embeddings.db")
+QUERY_EMBEDDING_CACHE_MAX_MB = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_MB", "64"))
+QUERY_EMBEDDING_PREWARM_COUNT = int(os.getenv("QUERY_EMBEDDING_PREWARM_COUNT", "50"))
+
+# Default text search engine: "twelvelabs" (TwelveLabs search API) or "local" (query embedding + Weaviate)
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "twelvelabs")
+
+# Parallel TwelveLabs requests when hydrating a page of search results
+TWELVELABS_MAX_CONCURRENCY = int(os.getenv("TWELVELABS_MAX_CONCURRENCY", "8"))
+
+# Upper bound on index entries examined per /api/suggest prefix lookup
+SUGGEST_MAX_SCAN = int(os.getenv("SUGGEST_MAX_SCAN", "500"))
+
+# Metadata write-behind (coalesces metadata PUTs per video)
+METADATA_WRITE_BEHIND = os.getenv("METADATA_WRITE_BEHIND", "False").lower() == "true"
+METADATA_WRITE_BEHIND_WINDOW = float(os.getenv("METADATA_WRITE_BEHIND_WINDOW", "2"))
+METADATA_WRITE_BEHIND_RETRIES = int(os.getenv("METADATA_WRITE_BEHIND_RETRIES", "3"))
+
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 PORT = int(os.getenv("PORT", "5000"))
 APP_URL = os.getenv("APP_URL", "http://localhost:5000")
 
+# Async serving mode (serve_async.py): concurrent connections handled by one process
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "2000"))
+
 EMBEDDING_STATUS_FILE = os.getenv("EMBEDDING_STATUS_FILE", "embedding_status.csv")
 ANALYSIS_RESULTS_FILE = os.getenv("ANALYSIS_RESULTS_FILE", "video_analysis_results.csv")
 DETAILED_ANALYSIS_RESULTS_FILE = os.getenv("DETAILED_ANALYSIS_RESULTS_FILE", "video_analysis_detailed_results.csv")
 
+# Batch analysis reports
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+REPORT_RETENTION_COUNT = int(os.getenv("REPORT_RETENTION_COUNT", "20"))
+REPORT_RETENTION_DAYS = int(os.getenv("REPORT_RETENTION_DAYS", "30"))
+
+# Columnar (Parquet / Arrow) exports
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+
+# Local catalog index over analysis metadata (SQLite)
+CATALOG_DB_FILE = os.getenv("CATALOG_DB_FILE", "cache/catalog.db")
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = os.getenv("LOG_FILE", "tracking/nature_footage.log")
@@ -31,4 +107,23 @@ LOG_FILE = os.getenv("LOG_FILE", "tracking/nature_footage.log")
 # Scheduler settings
 SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "True").lower() == "true"
 PING_INTERVAL_MINUTES = int(os.getenv("PING_INTERVAL_MINUTES", "9"))
-EMBEDDING_UPDATE_HOURS = int(os.getenv("EMBEDDING_UPDATE_HOURS", "24"))
\ No newline at end of file
+EMBEDDING_UPDATE_HOURS = int(os.getenv("EMBEDDING_UPDATE_HOURS", "24"))
+
+# Background dependency probes answering /api/test
+HEALTH_CHECK_INTERVAL_SECONDS = int(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "60"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+# Last probe round, shared with the workers that do not run the monitor
+HEALTH_STATUS_FILE = os.getenv("HEALTH_STATUS_FILE", "cache/health.json")
+
+# Per-process metric files summed by /metrics, and how often each process writes its own
+METRICS_DIR = os.getenv("METRICS_DIR", "cache/metrics")
+METRICS_FLUSH_SECONDS = int(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Only the process holding this lock runs the scheduler and the S3 key crawl
+PRIMARY_LOCK_FILE = os.getenv("PRIMARY_LOCK_FILE", "cache/primary.lock")
+
+# Production server (gunicorn.conf.py)
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", "4"))
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+GUNICORN_TIMEOUT = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+GUNICORN_GRACEFUL_TIMEOUT = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
\ No newline at end of file
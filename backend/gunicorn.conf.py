@@ -0,0 +1,41 @@
+# gunicorn settings, picked up automatically by `gunicorn wsgi:app` run from backend/
+from config.settings import (
+    PORT,
+    GUNICORN_WORKERS,
+    GUNICORN_THREADS,
+    GUNICORN_TIMEOUT,
+    GUNICORN_GRACEFUL_TIMEOUT
+)
+
+bind = f"0.0.0.0:{PORT}"
+workers = GUNICORN_WORKERS
+worker_class = "gthread"
+threads = GUNICORN_THREADS
+timeout = GUNICORN_TIMEOUT
+graceful_timeout = GUNICORN_GRACEFUL_TIMEOUT
+
+# Import the app once in the master, shared copy-on-write by the workers
+preload_app = True
+
+
+# Runs once in the master before any worker starts: metric files left by the
+# previous server would otherwise be summed into this one's totals
+def on_starting(server):
+
+    from api.utils.metrics import clear_shared_metrics
+    clear_shared_metrics()
+
+
+# S3/Lambda connection pools and the Weaviate gRPC channel must not be shared
+# across processes, so each worker creates its own after the fork
+def post_fork(server, worker):
+
+    from app import init_worker
+    init_worker()
+
+
+# Runs in the worker on graceful shutdown (SIGTERM, max_requests, reload)
+def worker_exit(server, worker):
+
+    from app import shutdown_app
+    shutdown_app()
@@ -0,0 +1,73 @@
+import argparse
+import logging
+
+from config.settings import API_KEY, INDEX_ID
+from api.utils.batch_analysis import run_batch_analysis, reset_checkpoint, acquire_job_lock, release_job_lock
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("batch_analysis.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Analyze every video in the index with Pegasus, resuming from the last checkpoint')
+    parser.add_argument('--page-size', type=int, default=50, help='Number of videos per page')
+    parser.add_argument('--prompt', type=str, default=None, help='Prompt to use instead of config/prompt.txt')
+    parser.add_argument('--no-lambda', action='store_true', help='Call Pegasus directly instead of through the Lambda function')
+    parser.add_argument('--delay', type=float, default=0, help='Delay in seconds between processing videos')
+    parser.add_argument('--force', action='store_true', help='Bypass the analysis cache and re-run Pegasus')
+    parser.add_argument('--reanalyze', action='store_true', help='Also re-analyze videos whose metadata is already marked as analyzed')
+    parser.add_argument('--no-prioritize', action='store_true', help='Do not analyze never-analyzed videos first')
+    parser.add_argument('--restart', action='store_true', help='Discard the checkpoint and start from the first page')
+    
+    args = parser.parse_args()
+    
+    if not API_KEY or not INDEX_ID:
+        logger.error("API_KEY and INDEX_ID must be set in environment variables")
+        print("Error, API_KEY and INDEX_ID must be set in environment variables")
+        return 1
+    
+    # The API may be running a batch over the same checkpoint
+    lock_file = acquire_job_lock()
+    if lock_file is None:
+        logger.error("Another batch analysis is already running")
+        print("Error, another batch analysis is already running (API job or CLI)")
+        return 1
+    
+    try:
+        if args.restart:
+            reset_checkpoint()
+        
+        state = run_batch_analysis(
+            prompt=args.prompt,
+            use_lambda=not args.no_lambda,
+            force=args.force,
+            page_size=args.page_size,
+            prioritize_unanalyzed=not args.no_prioritize,
+            skip_analyzed=not args.reanalyze,
+            delay_seconds=args.delay,
+            resume=not args.restart
+        )
+    finally:
+        release_job_lock(lock_file)
+    
+    print("\nBatch Analysis Summary")
+    print(f"Status: {state['status']}")
+    print(f"Videos processed: {state['counts']['processed']}")
+    print(f"Videos successful: {state['counts']['successful']}")
+    print(f"Videos failed: {state['counts']['failed']}")
+    print(f"Videos skipped: {state['counts']['skipped']}")
+    if state.get('error'):
+        print(f"Error: {state['error']}")
+    print("\nSee batch_analysis.log for detailed logs")
+    
+    return 0 if state['status'] == 'completed' else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,185 @@
+import csv
+import sys
+import json
+import time
+import random
+import argparse
+
+from api.utils.analysis_parser import parse_unstructured_response, normalize_structured_data
+
+csv.field_size_limit(sys.maxsize)
+
+# Stand-ins shaped like plain-text Pegasus responses, used when no corpus is given
+SAMPLE_RESPONSES = [
+    "Shot: Wide Shot\nSubject: single brown primate mammal animal, a capuchin monkey perched in the upper canopy\n"
+    "Action: groom\nEnvironment: day forest sunny ground tropical, dense vegetation with hanging vines\n"
+    "Narrative Flow: The monkey sits on a branch and grooms its fur, pausing now and then to look around. "
+    "A second monkey climbs into frame from below and settles beside it. The pair continue grooming as the "
+    "camera holds steady, and the light shifts as clouds pass overhead.\n"
+    "Additional Details: Dappled light through the canopy highlights the texture of the fur. Insects are "
+    "visible in the air and birdsong can be inferred from the other animals' reactions.",
+    "1. Shot: Close Up\n2. Subject: pair of grey fish swimming near a coral head\n3. Action: swim\n"
+    "4. Environment: underwater ocean clear tropical day, shallow reef with strong sunlight\n"
+    "5. Narrative Flow: Two fish circle a coral head, dart away when a larger shadow passes and return a "
+    "moment later. Small particles drift through the water column and catch the light.",
+    "Shot: aerial drone shot\nSubject: multiple white bird group, a flock of snow geese\nAction: fly\n"
+    "Environment: dawn lake cloudy aerial temperate, mist lying low over the water\n"
+    "Narrative Flow: The flock rests on the lake, then lifts off in waves, circling once before heading "
+    "north in a loose formation while the camera tracks alongside.\n"
+    "Additional Details: A flock lifts off the water at first light; the wingbeats create ripples on the surface.",
+    "The clip opens on a rocky coast. Shot: Medium Shot\nSubject: single black bear\nAction: forage\n"
+    "Environment: evening river rainy topside temperate\nNarrative Flow: The bear wades into the shallows, "
+    "turns over stones with its paw and eventually catches a fish, which it carries back to the bank.",
+]
+
+
+# Parser as it was before the single-pass rewrite, kept here as the baseline
+def legacy_parse_unstructured_response(text):
+
+    result = {
+        "Shot": "",
+        "Subject": {"Type": "", "Classification": "", "Species": "", "Count": "", "Identification": "", "Color": ""},
+        "Action": "",
+        "Environment": {"Time": "", "Location": "", "Weather": "", "Position": "", "Climate": ""},
+        "Narrative Flow": "",
+        "Additional Details": ""
+    }
+
+    if not text:
+        return result
+
+    if "shot:" in text.lower():
+        result["Shot"] = text.lower().split("shot:")[1].split("\n")[0].strip()
+
+    if "subject:" in text.lower():
+        subject_section = text.lower().split("subject:")[1].split("\n")[0]
+        parts = subject_section.split()
+        for type_key in ["animal", "human", "object"]:
+            if type_key in parts:
+                result["Subject"]["Type"] = type_key.capitalize()
+        for class_key in ["mammal", "bird", "reptile", "amphibian", "fish", "insect"]:
+            if class_key in parts:
+                result["Subject"]["Classification"] = class_key.capitalize()
+        for species_key in ["primate", "feline", "canine", "bovine", "equine"]:
+            if species_key in parts:
+                result["Subject"]["Species"] = species_key.capitalize()
+        for count_key in ["single", "multiple", "pair", "group"]:
+            if count_key in parts:
+                result["Subject"]["Count"] = count_key.capitalize()
+        result["Subject"]["Identification"] = subject_section.strip()
+        for color in ["black", "white", "brown", "grey", "gray", "red", "blue", "green", "yellow"]:
+            if color in parts:
+                result["Subject"]["Color"] = color.capitalize()
+
+    if "action:" in text.lower():
+        result["Action"] = text.lower().split("action:")[1].split("\n")[0].strip()
+
+    if "environment:" in text.lower():
+        parts = text.lower().split("environment:")[1].split("\n")[0].split()
+        for time_key in ["day", "night", "dusk", "dawn", "morning", "evening"]:
+            if time_key in parts:
+                result["Environment"]["Time"] = time_key.capitalize()
+        for loc_key in ["forest", "urban", "indoor", "outdoor", "rural", "jungle", "desert", "mountain",
+                        "beach", "ocean", "river", "lake", "rainforest"]:
+            if loc_key in parts:
+                result["Environment"]["Location"] = loc_key.capitalize()
+        for weather_key in ["sunny", "rainy", "cloudy", "snowy", "foggy", "clear"]:
+            if weather_key in parts:
+                result["Environment"]["Weather"] = weather_key.capitalize()
+        for pos_key in ["topside", "underwater", "aerial", "ground"]:
+            if pos_key in parts:
+                result["Environment"]["Position"] = pos_key.capitalize()
+        for climate_key in ["tropical", "temperate", "arctic", "desert", "mediterranean"]:
+            if climate_key in parts:
+                result["Environment"]["Climate"] = climate_key.capitalize()
+
+    if "narrative flow:" in text.lower():
+        result["Narrative Flow"] = text.lower().split("narrative flow:")[1].split("\n")[0].strip()
+
+    if "additional details:" in text.lower():
+        result["Additional Details"] = text.lower().split("additional details:")[1].split("\n")[0].strip()
+
+    return result
+
+
+# Raw responses from analysis reports (the "Raw Analysis" column) or a JSONL file with a "data" field
+def load_corpus(paths):
+
+    corpus = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".csv"):
+                for row in csv.DictReader(f):
+                    raw = row.get("Raw Analysis")
+                    if raw and raw != "No analysis data":
+                        corpus.append(raw)
+            else:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        corpus.append(json.loads(line).get("data") or "")
+    return corpus
+
+
+def time_parser(parser, corpus, repeat):
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            parser(text)
+    return time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark the Pegasus response parser against the previous implementation')
+    parser.add_argument('corpus', nargs='*', help='Report CSVs (all_analyses_*.csv) or JSONL files with raw responses')
+    parser.add_argument('--size', type=int, default=5000, help='Number of responses when using the built-in samples')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of passes over the corpus')
+
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else []
+    source = "files"
+    if not corpus:
+        random.seed(0)
+        corpus = [random.choice(SAMPLE_RESPONSES) for _ in range(args.size)]
+        source = "built-in samples"
+
+    # JSON responses go through normalize_structured_data, the rest through the text parser
+    json_corpus = []
+    text_corpus = []
+    for text in corpus:
+        try:
+            data = json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            data = None
+        if isinstance(data, dict):
+            json_corpus.append(data)
+        else:
+            text_corpus.append(text)
+
+    mismatches = sum(1 for text in text_corpus if parse_unstructured_response(text) != legacy_parse_unstructured_response(text))
+
+    if not text_corpus:
+        print("No plain-text responses in the corpus")
+        return 1
+
+    legacy_time = time_parser(legacy_parse_unstructured_response, text_corpus, args.repeat)
+    new_time = time_parser(parse_unstructured_response, text_corpus, args.repeat)
+
+    parsed = len(text_corpus) * args.repeat
+    print(f"\nParser Benchmark ({len(corpus)} responses from {source}, {args.repeat} passes)")
+    print(f"Legacy parser: {legacy_time:.3f}s ({parsed / legacy_time:,.0f} responses/s)")
+    print(f"Single-pass parser: {new_time:.3f}s ({parsed / new_time:,.0f} responses/s)")
+    print(f"Speedup: {legacy_time / new_time:.2f}x")
+    print(f"Output mismatches: {mismatches}")
+
+    if json_corpus:
+        normalize_time = time_parser(normalize_structured_data, json_corpus, args.repeat)
+        print(f"normalize_structured_data: {len(json_corpus) * args.repeat / normalize_time:,.0f} responses/s")
+
+    return 0 if mismatches == 0 else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter per sample. "lazy" is the current startup;
+# "eager" reproduces the previous one: the SDKs imported with the routes and
+# the Weaviate connect and schema check completed before the first request.
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+mode = sys.argv[1]
+if mode == "eager":
+    import boto3, twelvelabs, weaviate
+from app import create_app
+app = create_app(start_background=(mode == "lazy"))
+if mode == "eager":
+    from api.utils.s3_utils import get_s3_client
+    from api.utils.generate_analysis import get_lambda_client
+    from api.utils.weaviate_api import init_weaviate_client, create_videos_schema
+    get_s3_client()
+    get_lambda_client()
+    if init_weaviate_client():
+        create_videos_schema()
+created = time.perf_counter()
+response = app.test_client().get("/healthz")
+answered = time.perf_counter()
+print(json.dumps({
+    "create_app_ms": (created - started) * 1000,
+    "first_response_ms": (answered - started) * 1000,
+    "status": response.status_code,
+    "sdks_loaded": sorted(m for m in ("boto3", "twelvelabs", "weaviate") if m in sys.modules)
+}))
+"""
+
+
+def sample(mode):
+
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, mode],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, "SCHEDULER_ENABLED": "False", "QUERY_EMBEDDING_PREWARM_COUNT": "0"}
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Measure cold start: time from process start to the first served request')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per mode')
+
+    args = parser.parse_args()
+
+    print(f"\nStartup Benchmark ({args.runs} fresh processes per mode)")
+    for mode in ("eager", "lazy"):
+        results = [sample(mode) for _ in range(args.runs)]
+        print(f"\n{mode.capitalize()}")
+        print(f"  create_app:          {statistics.median(r['create_app_ms'] for r in results):8.1f} ms")
+        print(f"  first response:      {statistics.median(r['first_response_ms'] for r in results):8.1f} ms")
+        print(f"  whole process:       {statistics.median(r['process_ms'] for r in results):8.1f} ms")
+        print(f"  SDKs loaded by then: {', '.join(results[-1]['sdks_loaded']) or 'none'}")
+
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
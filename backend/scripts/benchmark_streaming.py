@@ -0,0 +1,169 @@
+import io
+import re
+import time
+import argparse
+
+from flask import Flask, Response, request, stream_with_context
+
+import api.utils.s3_utils as s3_utils
+
+LEGACY_RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class StandInBody:
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read(amt)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self._stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+# In-process stand-in for the S3 client: one object, a fixed delay per request
+# to model the round trip, and the Range/Content-Range behaviour of GetObject
+class StandInS3:
+
+    def __init__(self, data, latency):
+        self.data = data
+        self.latency = latency
+        self.requests = 0
+
+    def _round_trip(self):
+        self.requests += 1
+        time.sleep(self.latency)
+
+    def head_object(self, Bucket, Key):
+        self._round_trip()
+        return {"ContentLength": len(self.data), "ETag": '"standin"'}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self._round_trip()
+        size = len(self.data)
+        if Range is None:
+            return {"Body": StandInBody(self.data), "ContentLength": size, "ETag": '"standin"'}
+
+        first, last = re.match(r"bytes=(\d*)-(\d*)", Range).groups()
+        if first == "":
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        return {
+            "Body": StandInBody(self.data[start:end + 1]),
+            "ContentLength": end - start + 1,
+            "ContentRange": f"bytes {start}-{end}/{size}",
+            "ETag": '"standin"'
+        }
+
+
+# stream_video_from_s3 as it was before the single-round-trip rewrite, kept here as the baseline
+def legacy_stream_video_from_s3(s3_key):
+
+    s3_client = s3_utils.s3_client
+    head = s3_client.head_object(Bucket="bucket", Key=s3_key)
+    file_size = head['ContentLength']
+
+    range_header = request.headers.get('Range', None)
+    if range_header:
+        match = LEGACY_RANGE_PATTERN.match(range_header)
+        start, end = 0, file_size - 1
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else file_size - 1, file_size - 1)
+        data = s3_client.get_object(Bucket="bucket", Key=s3_key, Range=f"bytes={start}-{end}")['Body']
+        rv = Response(stream_with_context(data.iter_chunks(chunk_size=8192)), status=206, mimetype='video/mp4')
+        rv.headers.add('Content-Length', str(end - start + 1))
+        return rv
+
+    data = s3_client.get_object(Bucket="bucket", Key=s3_key)['Body']
+    rv = Response(stream_with_context(data.iter_chunks(chunk_size=8192)), mimetype='video/mp4')
+    rv.headers.add('Content-Length', str(file_size))
+    return rv
+
+
+def create_benchmark_app():
+
+    app = Flask(__name__)
+
+    @app.route('/legacy/<path:key>')
+    def legacy(key):
+        return legacy_stream_video_from_s3(key)
+
+    @app.route('/current/<path:key>')
+    def current(key):
+        return s3_utils.stream_video_from_s3(key)
+
+    return app
+
+
+def run(client, stand_in, path, headers, requests_count):
+
+    stand_in.requests = 0
+    transferred = 0
+    first_byte_total = 0.0
+
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        request_start = time.perf_counter()
+        response = client.get(path, headers=headers, buffered=False)
+        iterator = iter(response.response)
+        first = next(iterator, b"")
+        first_byte_total += time.perf_counter() - request_start
+        transferred += len(first) + sum(len(chunk) for chunk in iterator)
+        response.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mb_per_second": transferred / elapsed / (1024 * 1024),
+        "first_byte_ms": first_byte_total / requests_count * 1000,
+        "s3_requests": stand_in.requests / requests_count,
+        "mb_per_response": transferred / requests_count / (1024 * 1024)
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark proxied video streaming against an in-process S3 stand-in')
+    parser.add_argument('--size-mb', type=int, default=64, help='Size of the stand-in object')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Simulated S3 round trip per request')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per scenario')
+
+    args = parser.parse_args()
+
+    data = bytes(range(256)) * (args.size_mb * 4096)
+    stand_in = StandInS3(data, args.latency_ms / 1000)
+    s3_utils.s3_client = stand_in
+
+    client = create_benchmark_app().test_client()
+
+    scenarios = [
+        ("Full download", {}),
+        ("First 2 MB (preview)", {"Range": "bytes=0-2097151"}),
+        ("Open-ended from middle", {"Range": f"bytes={len(data) // 2}-"}),
+        ("Last 1 MB (suffix)", {"Range": "bytes=-1048576"}),
+    ]
+
+    print(f"\nStreaming Benchmark ({args.size_mb} MB object, {args.latency_ms:.0f} ms simulated latency, "
+          f"{args.requests} requests per scenario)")
+    for name, headers in scenarios:
+        legacy = run(client, stand_in, "/legacy/video.mp4", headers, args.requests)
+        current = run(client, stand_in, "/current/video.mp4", headers, args.requests)
+        print(f"\n{name}")
+        print(f"  Legacy:  {legacy['mb_per_second']:8.1f} MB/s, first byte {legacy['first_byte_ms']:6.1f} ms, "
+              f"{legacy['s3_requests']:.0f} S3 requests, {legacy['mb_per_response']:.1f} MB sent")
+        print(f"  Current: {current['mb_per_second']:8.1f} MB/s, first byte {current['first_byte_ms']:6.1f} ms, "
+              f"{current['s3_requests']:.0f} S3 requests, {current['mb_per_response']:.1f} MB sent")
+
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,35 @@
+# Async serving mode: the same Flask app on a gevent event loop. Sockets,
+# threads and sleeps are patched to be cooperative before anything else is
+# imported, so requests, boto3 and the Weaviate gRPC channel wait on I/O
+# without holding an OS thread, and one process can keep thousands of slow
+# video streams and fan-out requests in flight.
+from gevent import monkey
+monkey.patch_all()
+
+import grpc.experimental.gevent as grpc_gevent
+grpc_gevent.init_gevent()
+
+import logging
+
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from app import create_app, shutdown_app
+from config.settings import PORT, ASYNC_MAX_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+
+    app = create_app()
+    server = WSGIServer(("0.0.0.0", PORT), app, spawn=Pool(ASYNC_MAX_CONNECTIONS), log=None)
+    logger.info(f"Serving asynchronously on port {PORT} (up to {ASYNC_MAX_CONNECTIONS} connections)")
+    try:
+        server.serve_forever()
+    finally:
+        shutdown_app()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# WSGI entry point for production: `gunicorn wsgi:app` (settings in gunicorn.conf.py).
+# The app is imported once in the gunicorn master and shared by the forked
+# workers; clients and background tasks are started per worker in post_fork.
+from app import create_app
+
+app = create_app(start_background=False)